@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Nightly delta packages vs. full rebuilds on a tree with small daily edits.
+
+    python bench/bench_delta.py --files 200 --size-kb 512 --days 5 --edit-pct 2
+
+Each simulated day edits --edit-pct of the files in place (a few bytes
+overwritten, inserted or deleted), adds one file and removes one. The
+delta column packages the day against the previous package; the full
+column packages the whole tree from scratch with the same settings. The
+last day is restored and compared with the tree.
+"""
+
+from __future__ import annotations
+
+import argparse
+import filecmp
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from common import make_corpus
+
+import compression_backbone as cb
+
+
+def edit_tree(root: Path, rng: random.Random, pct: float, day: int) -> int:
+    """Apply one day of small edits under ``root``; returns the number of files touched."""
+    files = sorted(p for p in root.rglob("*") if p.is_file())
+    edited = rng.sample(files, max(1, int(len(files) * pct / 100)))
+    for path in edited:
+        data = bytearray(path.read_bytes())
+        pos = rng.randrange(max(1, len(data)))
+        kind = rng.choice(("overwrite", "insert", "delete"))
+        if kind == "overwrite":
+            data[pos : pos + 16] = rng.randbytes(16)
+        elif kind == "insert":
+            data[pos:pos] = rng.randbytes(rng.randint(1, 64))
+        else:
+            del data[pos : pos + rng.randint(1, 64)]
+        path.write_bytes(bytes(data))
+    (root / f"added_{day:03d}.txt").write_bytes(cb.text_bytes(rng, 64 * 1024))
+    removed = rng.choice([f for f in files if f not in edited])
+    removed.unlink()
+    return len(edited) + 2
+
+
+def package(src: Path, root: Path, config: cb.AlgoConfig, args: argparse.Namespace) -> Dict[str, float]:
+    entries = cb.scan_files(src, min_size=0)
+    return cb.pack_delta(entries, src, root, args.algo, config, workers=args.workers)["stats"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=512, help="Bytes per generated file")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--edit-pct", type=float, default=2.0, help="Files edited per day (percent)")
+    parser.add_argument("--algo", choices=cb.SOLID_ALGOS, default="zstd" if cb.has_zstd() else "xz")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    config = cb.AlgoConfig(zstd_level=3, xz_preset=6, xz_extreme=False, frame_size=cb.DELTA_FRAME_SIZE)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        src = tmp_path / "tree"
+        make_corpus(src, files=args.files, size=args.size_kb * 1024, kinds=("text", "raster", "json"), seed=args.seed)
+        base = package(src, tmp_path / "delta", config, args)
+        print(f"{base['files']} files, {base['orig'] / 1e6:.1f} MB; day 0 package {base['pack_size'] / 1e6:.1f} MB")
+        print(
+            f"{'day':>4s} {'edited':>7s} {'delta s':>8s} {'delta MB':>9s} {'read MB':>8s} "
+            f"{'full s':>7s} {'full MB':>8s}"
+        )
+        for day in range(1, args.days + 1):
+            edited = edit_tree(src, rng, args.edit_pct, day)
+            delta = package(src, tmp_path / "delta", config, args)
+            full_root = tmp_path / "full"
+            full = package(src, full_root, config, args)
+            shutil.rmtree(full_root)
+            print(
+                f"{day:4d} {edited:7d} {delta['seconds']:8.2f} {delta['pack_size'] / 1e6:9.3f} "
+                f"{delta['read'] / 1e6:8.1f} {full['seconds']:7.2f} {full['pack_size'] / 1e6:8.1f}"
+            )
+
+        restored = tmp_path / "restored"
+        result = cb.restore_delta(tmp_path / "delta", restored)
+        names = sorted(p.relative_to(src).as_posix() for p in src.rglob("*") if p.is_file())
+        same = not result["failed"] and all(filecmp.cmp(src / n, restored / n, shallow=False) for n in names)
+        print(f"Restore of day {args.days}: {'identical' if same else 'MISMATCH'} ({result['files']} files)")
+
+
+if __name__ == "__main__":
+    main()
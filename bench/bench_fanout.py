@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Bytes read per file: one read per codec (legacy loop) vs. the single-read fan-out.
+
+    python bench/bench_fanout.py --files 6 --size-mb 8
+
+Uses fast codec levels so the run is dominated by I/O rather than CPU.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from common import make_corpus, read_bytes, timed
+
+import compression_backbone as cb
+
+
+def legacy(files, out_dir: Path, algos, config) -> None:
+    funcs = cb.ensure_algo_map(config, algos)
+    for src in files:
+        for name, func in funcs.items():
+            func(src, out_dir / f"{src.name}.{name}")
+
+
+def fanout(files, out_dir: Path, algos, config) -> None:
+    for src in files:
+        sinks = {name: cb.open_codec_writer(name, out_dir / f"{src.name}.{name}", config, src) for name in algos}
+        cb.fan_out(src, sinks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=6)
+    parser.add_argument("--size-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    algos = [a for a in cb.STREAMING_ALGOS if a != "zstd" or cb.has_zstd()]
+    config = cb.AlgoConfig(zip_level=1, gzip_level=1, xz_preset=0, xz_extreme=False, zstd_level=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        files = make_corpus(tmp_path / "in", files=args.files, size=args.size_mb * 1024 * 1024)
+        total = sum(f.stat().st_size for f in files)
+        print(f"{len(files)} files, {total / 1e6:.1f} MB, codecs: {', '.join(algos)}")
+        for label, fn in (("legacy", legacy), ("fan-out", fanout)):
+            out = tmp_path / label
+            out.mkdir()
+            before = read_bytes()
+            _, secs = timed(lambda: fn(files, out, algos, config))
+            after = read_bytes()
+            read = f"{(after - before) / total:.2f}x size" if before is not None and after is not None else "n/a"
+            print(f"{label:8s} bytes read: {read:>12s}   wall: {secs:6.2f}s   {total / secs / 1e6:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
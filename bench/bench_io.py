@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Per-file latency: the old write-to-/tmp-then-move path vs. the overlapped I/O pipeline.
+
+    python bench/bench_io.py --files 6 --size-mb 8 --read-mbps 100 --write-mbps 40 --latency-ms 1
+
+Input and output live on a simulated slow disk: every read and write made
+by the backbone sleeps for ``--latency-ms`` plus the transfer time at the
+given MB/s, like a blocking call on a USB disk or network share. The old
+path is modelled as /tmp being a separate, fast local disk: outputs are
+written there at full speed and then copied onto the slow output disk,
+which is what ``shutil.move`` does across filesystems. It also runs
+without readahead hints or write-behind threads. The new path is
+``compress_one`` itself: ``.tmp`` files next to the outputs, renamed into
+place. Each run is also repeated with no simulated latency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import builtins
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from common import make_corpus
+
+import compression_backbone as cb
+
+
+class SlowFile:
+    """Passes reads and writes through to ``f`` after sleeping as a slow disk would."""
+
+    def __init__(self, f, mbps: float, latency_ms: float) -> None:
+        self._f = f
+        self._rate = mbps * 1e6
+        self._latency = latency_ms / 1000
+
+    def _wait(self, n: int) -> None:
+        time.sleep(self._latency + (n / self._rate if self._rate else 0.0))
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._f.read(n)
+        self._wait(len(data))
+        return data
+
+    def write(self, data) -> int:
+        self._wait(len(data))
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._f.close()
+
+
+def slow_disk(root: Path, read_mbps: float, write_mbps: float, latency_ms: float):
+    """An ``open`` that throttles files under ``root``; installed as the backbone's ``open``."""
+
+    def slow_open(path, mode="r", *args, **kwargs):
+        f = builtins.open(path, mode, *args, **kwargs)
+        if latency_ms <= 0 and read_mbps <= 0 and write_mbps <= 0:
+            return f
+        if root not in Path(path).resolve().parents:
+            return f
+        return SlowFile(f, read_mbps if "r" in mode else write_mbps, latency_ms)
+
+    return slow_open
+
+
+def legacy(src: Path, input_dir: Path, out_dir: Path, algos, config) -> None:
+    """compress_one's streaming path as it was: a fresh system temp dir, then a cross-disk move."""
+    rel = str(src.relative_to(input_dir))
+    with tempfile.TemporaryDirectory() as tmp:
+        sinks = {a: cb.open_codec_writer(a, Path(tmp) / f"{src.name}.{a}", config, src) for a in algos}
+        cb.fan_out(src, sinks)
+        for a in algos:
+            final = cb.output_path(out_dir, a, rel)
+            final.parent.mkdir(parents=True, exist_ok=True)
+            with open(Path(tmp) / f"{src.name}.{a}", "rb") as fin, cb.open(final, "wb") as fout:
+                shutil.copyfileobj(fin, fout, cb.CHUNK_SIZE)
+
+
+def pipeline(src: Path, input_dir: Path, out_dir: Path, algos, config) -> None:
+    cb.compress_one(src, input_dir, out_dir, algos, config, force=True)
+
+
+def measure(label: str, fn, files, input_dir: Path, out_dir: Path, algos, config) -> float:
+    latencies = []
+    for src in files:
+        start = time.perf_counter()
+        fn(src, input_dir, out_dir, algos, config)
+        latencies.append(time.perf_counter() - start)
+    total = sum(f.stat().st_size for f in files)
+    wall = sum(latencies)
+    print(
+        f"  {label:9s} per file: mean {statistics.mean(latencies):6.3f}s  p50 {statistics.median(latencies):6.3f}s"
+        f"  max {max(latencies):6.3f}s   total {wall:6.2f}s  {total / wall / 1e6:7.1f} MB/s"
+    )
+    return wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=6)
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--read-mbps", type=float, default=100.0, help="Simulated read bandwidth")
+    parser.add_argument("--write-mbps", type=float, default=40.0, help="Simulated write bandwidth")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Simulated latency per read/write call")
+    args = parser.parse_args()
+
+    algos = [a for a in ("gzip", "xz", "zstd") if a != "zstd" or cb.has_zstd()]
+    config = cb.AlgoConfig(gzip_level=1, xz_preset=0, xz_extreme=False, zstd_level=1)
+    readahead, depth = cb.READAHEAD_SIZE, cb.WRITE_BEHIND_DEPTH
+    with tempfile.TemporaryDirectory() as tmp:
+        slow_root = Path(tmp).resolve() / "slow"
+        input_dir = slow_root / "in"
+        files = make_corpus(input_dir, files=args.files, size=args.size_mb * 1024 * 1024)
+        total = sum(f.stat().st_size for f in files)
+        print(f"{len(files)} files, {total / 1e6:.1f} MB, codecs: {', '.join(algos)}")
+        profiles = (
+            ("local disk", 0.0, 0.0, 0.0),
+            (
+                f"slow disk ({args.read_mbps:g} MB/s read, {args.write_mbps:g} MB/s write, {args.latency_ms:g} ms/call)",
+                args.read_mbps,
+                args.write_mbps,
+                args.latency_ms,
+            ),
+        )
+        try:
+            for name, read_mbps, write_mbps, latency_ms in profiles:
+                print(name)
+                cb.open = slow_disk(slow_root, read_mbps, write_mbps, latency_ms)  # shadows the builtin in the backbone
+                cb.READAHEAD_SIZE, cb.WRITE_BEHIND_DEPTH = 0, 0
+                before = measure("old", legacy, files, input_dir, slow_root / "out_old", algos, config)
+                cb.READAHEAD_SIZE, cb.WRITE_BEHIND_DEPTH = readahead, depth
+                after = measure("pipeline", pipeline, files, input_dir, slow_root / "out_new", algos, config)
+                print(f"  speedup {before / after:.2f}x")
+        finally:
+            del cb.open
+            cb.READAHEAD_SIZE, cb.WRITE_BEHIND_DEPTH = readahead, depth
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Discovery speed: the old os.walk + Path + stat loop vs. scan_files.
+
+    python bench/bench_scan.py --depth 4 --fanout 6 --files-per-dir 20 --latency-ms 2
+
+Builds a synthetic deep tree of empty-ish files. ``--latency-ms`` adds a
+sleep to every directory listing to mimic a network share, where listing
+subtrees in parallel pays off most. Also reports time to the first file,
+which is when compression can start.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import common  # noqa: F401  (puts the repo root on sys.path)
+
+import compression_backbone as cb
+
+
+def make_tree(root: Path, depth: int, fanout: int, files_per_dir: int) -> int:
+    count = 0
+    level = [root]
+    for d in range(depth + 1):
+        next_level = []
+        for directory in level:
+            directory.mkdir(parents=True, exist_ok=True)
+            for i in range(files_per_dir):
+                (directory / f"tile_{i:04d}.{'tif' if i % 3 else 'json'}").write_bytes(b"x" * (1 + i))
+                count += 1
+            if d < depth:
+                next_level += [directory / f"d{j}" for j in range(fanout)]
+        level = next_level
+    return count
+
+
+def legacy_discover(input_dir: Path, out_dir: Path):
+    """discover_files as it was before scan_files."""
+    for root, _, filenames in os.walk(input_dir):
+        for name in filenames:
+            src = Path(root) / name
+            if out_dir in src.parents:
+                continue
+            if src.stat().st_size == 0:
+                continue
+            yield src
+
+
+def measure(label: str, iterator) -> None:
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in iterator:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    secs = time.perf_counter() - start
+    print(f"{label:18s} {count:8d} files  {secs:7.2f}s  {count / secs:10.0f} files/s  first after {first or 0:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files-per-dir", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated per-listing latency")
+    parser.add_argument("--threads", type=int, default=cb.SCAN_THREADS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "tree"
+        total = make_tree(root, args.depth, args.fanout, args.files_per_dir)
+        out_dir = root / "_compression_test"
+        print(f"{total} files, depth {args.depth}, fanout {args.fanout}, latency {args.latency_ms} ms/listing")
+
+        if args.latency_ms > 0:
+            real_scandir = os.scandir
+
+            def slow_scandir(path="."):
+                time.sleep(args.latency_ms / 1000)
+                return real_scandir(path)
+
+            os.scandir = slow_scandir  # os.walk and scan_files both list through os.scandir
+        measure("os.walk (old)", legacy_discover(root, out_dir))
+        measure("scan_files x1", cb.scan_files(root, exclude=[out_dir], threads=1))
+        measure(f"scan_files x{args.threads}", cb.scan_files(root, exclude=[out_dir], threads=args.threads))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Makespan of walk-order dispatch vs. the largest-first (LPT) planner.
+
+    python bench/bench_schedule.py --workers 8 --small 2000 --large 3
+    python bench/bench_schedule.py --workers 2 --real
+
+The default mode simulates both schedules on a synthetic size distribution
+(many small files, a few huge ones discovered last) using the planner's own
+cost model as the job durations, so it is deterministic and instant. With
+--real, a small generated corpus is compressed for real both ways.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List
+
+from common import make_corpus
+
+import compression_backbone as cb
+
+ALGOS = ["zip", "gzip", "xz", "zstd"]
+
+
+def simulate_walk_order(jobs: List[cb.Job], workers: int, config: cb.AlgoConfig) -> float:
+    """One job per file, handed to the next free worker in discovery order.
+
+    Each worker owns one core and runs the file's codecs back to back, which
+    is what the original as_completed loop did.
+    """
+    free = [0.0] * workers
+    for job in jobs:
+        start = heapq.heappop(free)
+        heapq.heappush(free, start + sum(job.size / 1e6 / cb.estimate_mbps(config, a) for a in job.algos))
+    return max(free)
+
+
+def simulate_planned(jobs: List[cb.Job], workers: int, cpu_budget: int) -> float:
+    """Replays run_budgeted's admission rule in virtual time."""
+    pending = list(jobs)
+    running: List[tuple] = []  # (end, seq, cores)
+    now = 0.0
+    cores_in_use = 0
+    seq = 0
+    while pending or running:
+        admitted = True
+        while admitted and pending and len(running) < workers:
+            admitted = False
+            for i in range(min(len(pending), cb.SCHEDULE_LOOKAHEAD)):
+                cores = min(pending[i].cores, cpu_budget)
+                if not running or cores_in_use + cores <= cpu_budget:
+                    job = pending.pop(i)
+                    heapq.heappush(running, (now + job.seconds, seq, cores))
+                    seq += 1
+                    cores_in_use += cores
+                    admitted = True
+                    break
+        now, _, cores = heapq.heappop(running)
+        cores_in_use -= cores
+    return now
+
+
+def synthetic(small: int, large: int, seed: int) -> List[tuple]:
+    rng = random.Random(seed)
+    entries = [(Path(f"small_{i}.json"), rng.randint(4_000, 4_000_000), ALGOS, i) for i in range(small)]
+    entries += [(Path(f"huge_{i}.tif"), rng.randint(2, 8) * 1024**3, ALGOS, small + i) for i in range(large)]
+    return entries
+
+
+def run_real(workers: int) -> None:
+    config = cb.AlgoConfig(zip_level=6, gzip_level=6, xz_preset=6, xz_extreme=False, zstd_level=9)
+    algos = [a for a in ALGOS if a != "zstd" or cb.has_zstd()]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        files = make_corpus(root / "in" / "a", files=12, size=256 * 1024, seed=1)
+        files += make_corpus(root / "in" / "z", files=2, size=12 * 1024 * 1024, kinds=("text", "raster"), seed=2)
+        for label in ("walk-order", "planned"):
+            out = root / label
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                if label == "walk-order":
+                    futures = [
+                        ex.submit(cb.compress_one, f, root / "in", out, algos, config, True) for f in files
+                    ]
+                    for fut in as_completed(futures):
+                        fut.result()
+                else:
+                    planned = cb.plan_jobs(((f, f.stat().st_size, algos, i) for i, f in enumerate(files)), config, workers)
+
+                    def submit(ex, job):
+                        return ex.submit(cb.compress_one, job.src, root / "in", out, job.algos, config, True)
+
+                    for _, fut in cb.run_budgeted(ex, planned, submit, workers):
+                        fut.result()
+            print(f"{label:10s} makespan: {time.perf_counter() - start:7.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--small", type=int, default=2000)
+    parser.add_argument("--large", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--real", action="store_true", help="Compress a generated corpus instead of simulating")
+    args = parser.parse_args()
+
+    if args.real:
+        run_real(args.workers)
+        return
+
+    config = cb.AlgoConfig()
+    entries = synthetic(args.small, args.large, args.seed)
+    walk = [cb.make_job(src, size, algos, config, tag) for src, size, algos, tag in entries]
+    planned = cb.plan_jobs(entries, config, args.workers)
+    before = simulate_walk_order(walk, args.workers, config)
+    after = simulate_planned(planned, args.workers, args.workers)
+    print(f"{len(entries)} files, {len(planned)} jobs after splitting, {args.workers} cores")
+    print(f"walk-order makespan: {before / 3600:8.2f} h (estimated)")
+    print(f"planned    makespan: {after / 3600:8.2f} h (estimated)  {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Random-read latency vs. frame size for seekable zstd/xz output.
+
+    python bench/bench_seekable.py --size-mb 64 --reads 200 --algo zstd
+
+Frame size "stream" is the regular single-stream output, where a read at
+offset N has to decompress everything before it. Smaller frames read
+faster but compress slightly worse.
+"""
+
+from __future__ import annotations
+
+import argparse
+import lzma
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from common import make_corpus
+
+import compression_backbone as cb
+
+
+def stream_read(path: Path, algo: str, offset: int, length: int) -> bytes:
+    if algo == "xz":
+        f = lzma.open(path)
+    else:
+        f = cb.zstd.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    with f:
+        f.seek(offset)  # forward seek = decompress and discard
+        return f.read(length)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--read-kb", type=int, default=64, help="Bytes per random read")
+    parser.add_argument("--algo", choices=cb.SOLID_ALGOS, default="zstd")
+    parser.add_argument("--frames-kb", default="64,256,1024,4096,16384", help="Comma-separated frame sizes")
+    args = parser.parse_args()
+
+    if args.algo == "zstd" and not cb.has_zstd():
+        raise SystemExit("zstandard module not available (pip install zstandard)")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        src = make_corpus(tmp_path / "in", files=1, size=args.size_mb * 1024 * 1024, kinds=("raster",))[0]
+        size = src.stat().st_size
+        rng = random.Random(42)
+        length = args.read_kb * 1024
+        offsets = [rng.randrange(max(1, size - length)) for _ in range(args.reads)]
+        print(f"{size / 1e6:.1f} MB raster, {args.algo}, {args.reads} random {args.read_kb} KiB reads")
+        print(f"{'frame':>8s} {'ratio':>7s} {'p50 ms':>9s} {'p95 ms':>9s}")
+        for frame_kb in [0] + [int(x) for x in args.frames_kb.split(",")]:
+            config = cb.AlgoConfig(zstd_level=3, xz_preset=6, xz_extreme=False, frame_size=frame_kb * 1024)
+            dst = tmp_path / f"out_{frame_kb}.{args.algo}"
+            cb.fan_out(src, {args.algo: cb.open_codec_writer(args.algo, dst, config, src)})
+            # A full-stream read takes seconds, so sample fewer of them.
+            sample = offsets if frame_kb else offsets[: max(5, args.reads // 20)]
+            latencies = []
+            if frame_kb:
+                with cb.SeekableReader(dst) as reader:
+                    for offset in sample:
+                        reader._cached = (-1, b"")  # measure cold reads
+                        start = time.perf_counter()
+                        reader.read(offset, length)
+                        latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                for offset in sample:
+                    start = time.perf_counter()
+                    stream_read(dst, args.algo, offset, length)
+                    latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            label = f"{frame_kb}K" if frame_kb else "stream"
+            print(
+                f"{label:>8s} {dst.stat().st_size / size:7.1%} {statistics.median(latencies):9.2f} {p95:9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Start-up cost of the compression entry points, from ``python -X importtime``.
+
+    python bench/bench_startup.py --runs 5 --max-ms 60
+
+Each run imports the module in a fresh interpreter and reads the
+cumulative import time the interpreter reports for it, so the number
+excludes interpreter start-up itself. The slowest imports of the median
+run are listed, and codec modules that were imported at start-up (they
+should load on first use) are flagged. With --max-ms the script exits
+non-zero when the median is over budget, so it can gate a change.
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from common import ROOT
+
+CODEC_MODULES = ("zstandard", "py7zr", "lzma", "bz2", "gzip", "zipfile", "tarfile", "sqlite3")
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module loaded by ``import module``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["compression_backbone", "compress", "compress_worker"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports listed per module")
+    parser.add_argument("--max-ms", type=float, default=0, help="Fail if a module's median import exceeds this")
+    args = parser.parse_args()
+
+    over: List[Tuple[str, float]] = []
+    for module in args.modules:
+        import_times(module)  # compile to bytecode first, so every run measures a warm start
+        runs = sorted((import_times(module) for _ in range(max(1, args.runs))), key=lambda t: t[module])
+        median = runs[len(runs) // 2]
+        total_ms = median[module] / 1000
+        print(
+            f"{module}: median {total_ms:.1f} ms "
+            f"(min {runs[0][module] / 1000:.1f}, max {runs[-1][module] / 1000:.1f}, {len(runs)} runs)"
+        )
+        for name, us in sorted(median.items(), key=lambda kv: -kv[1])[1 : args.top + 1]:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        eager = [m for m in CODEC_MODULES if m in median]
+        if eager:
+            print(f"  imported at start-up: {', '.join(eager)}")
+        if args.max_ms and total_ms > args.max_ms:
+            over.append((module, total_ms))
+    for module, total_ms in over:
+        print(f"OVER BUDGET: {module} {total_ms:.1f} ms > {args.max_ms:g} ms", file=sys.stderr)
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Job latency: a fresh `compress.py --stream` per job (cold) vs. jobs sent to
+an already running compress_worker.py (warm).
+
+    python bench/bench_worker.py --jobs 5
+
+The corpus is a handful of tiny files so the numbers are dominated by
+start-up cost, which is what the worker removes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import ROOT, make_corpus
+
+
+def cold_job(input_dir: Path, output_dir: Path) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(ROOT / "compress.py"), str(input_dir), str(output_dir), "--stream"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_corpus(root / "in", files=3, size=16 * 1024)
+
+        cold = [cold_job(root / "in", root / f"cold{i}") for i in range(args.jobs)]
+
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, str(ROOT / "compress_worker.py")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        assert json.loads(proc.stdout.readline()).get("ready")
+        startup = time.perf_counter() - start
+        warm = []
+        for i in range(args.jobs):
+            start = time.perf_counter()
+            request = {"id": i + 1, "method": "compress", "params": {"input_dir": str(root / "in"), "output_dir": str(root / f"warm{i}")}}
+            proc.stdin.write(json.dumps(request) + "\n")
+            proc.stdin.flush()
+            while "id" not in json.loads(proc.stdout.readline()):
+                pass
+            warm.append(time.perf_counter() - start)
+        proc.stdin.write(json.dumps({"id": 0, "method": "shutdown"}) + "\n")
+        proc.stdin.close()
+        proc.wait()
+
+    print(f"cold job latency: median {statistics.median(cold) * 1000:7.1f} ms  (new process per job)")
+    print(f"warm job latency: median {statistics.median(warm) * 1000:7.1f} ms  (worker start-up {startup * 1000:.0f} ms, paid once)")
+
+
+if __name__ == "__main__":
+    main()
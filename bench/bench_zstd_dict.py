@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Small-file zstd: plain per-file frames vs. frames against a trained dictionary.
+
+    python bench/bench_zstd_dict.py --files 2000 --dict-kb 112
+
+The corpus is a swarm of small, similarly shaped JSON sidecars, the case
+where per-file compression has too little history to find repeats.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from common import timed
+
+import compression_backbone as cb
+
+
+def make_sidecars(root: Path, files: int, seed: int = 1234) -> list:
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(files):
+        doc = {
+            "tile": f"N{rng.randint(0, 89):02d}E{rng.randint(0, 179):03d}",
+            "projection": rng.choice(["EPSG:4326", "EPSG:3857", "EPSG:32633"]),
+            "bands": [{"index": b, "nodata": -9999, "scale": 1.0, "offset": 0.0} for b in range(rng.randint(1, 4))],
+            "bounds": [round(rng.uniform(-180, 180), 6) for _ in range(4)],
+            "survey": {"sensor": rng.choice(["lidar", "sar", "optical"]), "meters": rng.randint(1, 30)},
+        }
+        path = root / f"tile_{i:05d}.json"
+        path.write_text(json.dumps(doc, indent=2))
+        paths.append(path)
+    return paths
+
+
+def compress_all(files, out_dir: Path, config) -> int:
+    total = 0
+    for src in files:
+        dst = out_dir / f"{src.name}.zstd"
+        writer = cb.open_codec_writer("zstd", dst, config, src)
+        writer.write(src.read_bytes())
+        writer.close()
+        total += dst.stat().st_size
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--dict-kb", type=int, default=cb.DICT_SIZE // 1024)
+    parser.add_argument("--level", type=int, default=19)
+    args = parser.parse_args()
+
+    if not cb.has_zstd():
+        raise SystemExit("zstandard module not available (pip install zstandard)")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        files = make_sidecars(tmp_path / "in", args.files)
+        orig = sum(f.stat().st_size for f in files)
+        print(f"{len(files)} files, {orig / 1e3:.1f} kB total, zstd level {args.level}")
+
+        plain = cb.AlgoConfig(zstd_level=args.level)
+        trained = cb.AlgoConfig(zstd_level=args.level)
+        dicts, train_secs = timed(
+            lambda: cb.train_zstd_dictionaries(
+                ((f, f.stat().st_size) for f in files), tmp_path / "dicts", trained, args.dict_kb * 1024
+            )
+        )
+        trained.zstd_dicts = {ext: str(info["path"]) for ext, info in dicts.items()}
+        dict_bytes = sum(int(info["bytes"]) for info in dicts.values())
+        print(f"trained {len(dicts)} dictionary ({dict_bytes / 1e3:.1f} kB) in {train_secs:.2f}s")
+
+        for label, config in (("plain", plain), ("dict", trained)):
+            out = tmp_path / label
+            out.mkdir()
+            size, secs = timed(lambda: compress_all(files, out, config))
+            print(
+                f"{label:6s} ratio: {size / orig:6.1%}   {len(files) / secs:8.0f} files/s"
+                + (f"   (with dictionary: {(size + dict_bytes) / orig:6.1%})" if label == "dict" else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
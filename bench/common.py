@@ -0,0 +1,64 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Benchmarks generate their own corpora from a fixed seed so numbers are
+comparable across machines; nothing here touches the network.
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from compression_backbone import CORPUS_KINDS  # noqa: E402
+
+T = TypeVar("T")
+
+# The generators live in the backbone so ``compression_backbone.py bench`` and
+# these scripts produce byte-identical data from the same seed.
+KINDS = CORPUS_KINDS
+
+
+def make_corpus(
+    root: Path,
+    *,
+    files: int = 6,
+    size: int = 4 * 1024 * 1024,
+    kinds: Tuple[str, ...] = ("text", "raster", "random"),
+    seed: int = 1234,
+) -> List[Path]:
+    """Write ``files`` deterministic files of ``size`` bytes under ``root``."""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    paths: List[Path] = []
+    for i in range(files):
+        kind = kinds[i % len(kinds)]
+        path = root / f"{kind}_{i:04d}.{'txt' if kind == 'text' else 'bin'}"
+        path.write_bytes(KINDS[kind](rng, size))
+        paths.append(path)
+    return paths
+
+
+def read_bytes() -> Optional[int]:
+    """Bytes read by this process so far (Linux ``rchar``), or None if unavailable."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def timed(fn: Callable[[], T]) -> Tuple[T, float]:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
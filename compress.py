@@ -4,186 +4,460 @@ File compression utility that tests multiple compression algorithms
 and compares their effectiveness.
 """
 
+import argparse
 import os
 import sys
-import gzip
-import zipfile
-import lzma
 import subprocess
 import json
+import itertools
+import time
 from pathlib import Path
 from typing import Dict, List, Tuple
-import shutil
 
-def ensure_dependencies():
-    """Check and install missing Python dependencies."""
-    required_packages = []
+from compression_backbone import (
+    POLICY_TARGETS,
+    PROBE_THRESHOLD,
+    STREAMING_ALGOS,
+    TIMING_KEYS,
+    AlgoConfig,
+    DuplicateIndex,
+    ReportWriter,
+    capabilities,
+    choose_codec,
+    compress_one,
+    config_with_level,
+    duplicate_row,
+    estimate_memory,
+    fit_memory,
+    output_path,
+    physical_memory,
+    scan_files,
+)
+
+# Seconds between progress lines in --stream mode
+PROGRESS_INTERVAL = 0.5
+
+# Maximum-compression settings; clamp_config lowers them per file to fit the memory limit
+GUI_CONFIG = AlgoConfig(zip_level=9, gzip_level=9, xz_preset=9, xz_extreme=False, zstd_level=22, sevenzip_level=9)
+
+# Default memory ceiling (MiB) shared by the compressors running at once
+DEFAULT_MEMORY_MB = 1024
+
+# GUI algorithm names -> compression_backbone codec names ('Store' only in policy mode)
+CODECS = {'ZIP': 'zip', 'GZIP': 'gzip', 'XZ': 'xz', 'Zstd': 'zstd', '7z': '7z', 'Store': 'store'}
+
+def install_dependencies():
+    """Install missing optional Python dependencies with pip.
     
-    try:
-        import zstandard
-    except ImportError:
+    Only run on request (compress.py --install-deps); compression never
+    installs anything, it reports missing codecs as failed results.
+    """
+    required_packages = []
+    if not capabilities()['zstd']:
         required_packages.append('zstandard')
-    
-    if required_packages:
-        print(f"Installing missing dependencies: {', '.join(required_packages)}")
+    if not required_packages:
+        print("All dependencies are installed.")
+        return
+    print(f"Installing missing dependencies: {', '.join(required_packages)}")
+    try:
+        # Try without --user first (works in venv)
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install'] + required_packages)
+        print("Dependencies installed successfully!")
+    except subprocess.CalledProcessError:
         try:
-            # Try without --user first (works in venv)
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install'] + required_packages)
+            # Fallback to --user if global install fails
+            subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--user'] + required_packages)
             print("Dependencies installed successfully!")
-        except subprocess.CalledProcessError:
-            try:
-                # Fallback to --user if global install fails
-                subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--user'] + required_packages)
-                print("Dependencies installed successfully!")
-            except subprocess.CalledProcessError as e:
-                print(f"Warning: Failed to install dependencies: {e}")
-                print("Please install manually: pip install " + " ".join(required_packages))
-                print("Continuing without Zstandard compression...")
+        except subprocess.CalledProcessError as e:
+            print(f"Warning: Failed to install dependencies: {e}")
+            print("Please install manually: pip install " + " ".join(required_packages))
 
 def check_7z_available():
-    """Check if 7z is available on PATH."""
-    try:
-        subprocess.run(['7z'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        return False
+    """Whether a 7z binary is available, from the cached capability probe."""
+    return bool(capabilities()['7z'])
 
 def get_file_size(filepath):
     """Get file size in bytes."""
     return os.path.getsize(filepath)
 
-def compress_zip(input_file, output_file):
-    """Compress file using ZIP with Deflate level 9."""
-    try:
-        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
-            zipf.write(input_file, os.path.basename(input_file))
-        return True
-    except Exception as e:
-        print(f"ZIP compression failed: {e}")
-        return False
-
-def compress_gzip(input_file, output_file):
-    """Compress file using GZIP level 9."""
-    try:
-        with open(input_file, 'rb') as f_in:
-            with gzip.open(output_file, 'wb', compresslevel=9) as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        return True
-    except Exception as e:
-        print(f"GZIP compression failed: {e}")
-        return False
-
-def compress_xz(input_file, output_file):
-    """Compress file using XZ with LZMA max compression."""
-    try:
-        with open(input_file, 'rb') as f_in:
-            with lzma.open(output_file, 'wb', preset=9) as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        return True
-    except Exception as e:
-        print(f"XZ compression failed: {e}")
-        return False
-
-def compress_zstd(input_file, output_file):
-    """Compress file using Zstandard."""
-    try:
-        import zstandard as zstd
-        with open(input_file, 'rb') as f_in:
-            with open(output_file, 'wb') as f_out:
-                cctx = zstd.ZstdCompressor(level=22)  # Max compression
-                f_out.write(cctx.compress(f_in.read()))
-        return True
-    except Exception as e:
-        print(f"Zstd compression failed: {e}")
-        return False
-
-def compress_7z(input_file, output_file):
-    """Compress file using 7z CLI if available."""
-    try:
-        result = subprocess.run(
-            ['7z', 'a', '-mx9', output_file, input_file],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=300
-        )
-        return result.returncode == 0
-    except Exception as e:
-        print(f"7z compression failed: {e}")
-        return False
-
-def scan_directory(directory):
-    """Scan directory and return list of files."""
-    files = []
-    for root, _, filenames in os.walk(directory):
-        for filename in filenames:
-            filepath = os.path.join(root, filename)
-            files.append(filepath)
-    return files
-
-def process_files(input_dir, output_dir):
-    """Process all files in input directory with multiple compression algorithms."""
-    ensure_dependencies()
+def default_memory_limit():
+    """Memory ceiling for all compressors together: a quarter of RAM, at most DEFAULT_MEMORY_MB."""
+    ram = physical_memory()
+    limit = DEFAULT_MEMORY_MB << 20
+    return min(limit, ram // 4) if ram else limit
+
+def clamp_config(algorithms, size, memory_limit, base=GUI_CONFIG):
+    """base (GUI_CONFIG) with windows/levels lowered so one file's codecs fit memory_limit bytes.
+    
+    The streaming codecs run side by side on one read (the backbone's
+    fan_out), so zip/gzip keep their small fixed footprint and xz/zstd split
+    the rest. 7z runs on its own afterwards and may use the whole limit.
+    """
+    codecs = [CODECS[name] for name in algorithms]
+    streaming = [c for c in codecs if c in STREAMING_ALGOS]
+    fixed = sum(estimate_memory(base, c, size) for c in streaming if c in ('zip', 'gzip'))
+    tunable = [c for c in streaming if c not in ('zip', 'gzip')]
+    config = base
+    for codec in tunable:
+        config = fit_memory(config, codec, size, max(0, memory_limit - fixed) // len(tunable))
+    if '7z' in codecs:
+        config = fit_memory(config, '7z', size, memory_limit)
+    return config
+
+def clamped_settings(algo_name, config):
+    """The settings clamp_config may change for algo_name."""
+    if algo_name == 'Zstd':
+        return {'level': config.zstd_level, 'window_log': config.zstd_window_log}
+    if algo_name == 'XZ':
+        return {'level': config.xz_preset}
+    if algo_name == '7z':
+        return {'level': config.sevenzip_level}
+    return {}
+
+def scan_directory(directory, exclude=()):
+    """Yield the paths of all files under directory as they are found."""
+    for entry in scan_files(directory, exclude=exclude, min_size=0):
+        yield entry.path
+
+def emit(stream, message):
+    """Write one NDJSON message and flush so the reader sees it immediately."""
+    stream.write(json.dumps(message) + '\n')
+    stream.flush()
+
+def get_algorithms():
+    """Return the names of the algorithms to run, in display order."""
+    algorithms = ['ZIP', 'GZIP', 'XZ', 'Zstd']
+    
+    # Add 7z if available
+    if check_7z_available():
+        algorithms.append('7z')
+    return algorithms
+
+def to_file_result(row, filepath, output_dir, algorithms, config, base=GUI_CONFIG):
+    """Convert a compression_backbone report row into the GUI's result dict.
+    
+    Settings that differ from base (the configuration before clamp_config)
+    are reported as 'clamped'.
+    """
+    file_result = {
+        'filename': os.path.basename(filepath),
+        'path': filepath,
+        'original_size': row['orig'],
+        'compressions': {}
+    }
+    if 'probe' in row:
+        file_result['probe'] = {'ratio': row['probe']['ratio'], 'entropy': row['probe']['entropy']}
+    if 'policy' in row:
+        file_result['policy'] = {'choice': row['policy']['choice'], 'reason': row['policy']['reason']}
+    
+    for algo_name in algorithms:
+        cell = row.get(CODECS[algo_name]) or {'error': 'Compression failed'}
+        if cell.get('skipped'):
+            compression = {'error': 'Skipped: predicted incompressible', 'skipped': True}
+        elif 'error' in cell:
+            compression = {'error': cell['error']}
+        else:
+            ratio = (1 - cell['ratio']) * 100 if row['orig'] > 0 else 0
+            compression = {
+                'compressed_size': cell['size'],
+                'ratio': ratio,
+                'output_file': str(output_path(Path(output_dir), CODECS[algo_name], row['file']))
+            }
+            for key in ('seconds', 'mbps', 'verified', 'verify_error', 'decompress_seconds', 'decompress_mbps'):
+                if key in cell:
+                    compression[key] = cell[key]
+            if clamped_settings(algo_name, config) != clamped_settings(algo_name, base):
+                compression['clamped'] = clamped_settings(algo_name, config)
+            if cell.get('verified') is False:
+                compression['error'] = 'Verification failed'
+        file_result['compressions'][algo_name] = compression
+    return file_result
+
+def duplicate_result(file_result, row, filepath, output_dir):
+    """GUI result dict for filepath, a duplicate of the file in file_result (row from duplicate_row)."""
+    result = {
+        'filename': os.path.basename(filepath),
+        'path': filepath,
+        'original_size': file_result['original_size'],
+        'dedup_of': file_result['path'],
+        'compressions': {}
+    }
+    if 'probe' in file_result:
+        result['probe'] = file_result['probe']
+    if 'policy' in file_result:
+        result['policy'] = file_result['policy']
+    for algo_name, compression in file_result['compressions'].items():
+        compression = {k: v for k, v in compression.items() if k not in TIMING_KEYS}
+        cell = row.get(CODECS[algo_name]) or {}
+        if 'compressed_size' in compression and 'error' in cell:
+            compression = {'error': cell['error']}
+        elif 'output_file' in compression:
+            compression['output_file'] = str(output_path(Path(output_dir), CODECS[algo_name], row['file']))
+            compression['dedup'] = cell.get('dedup')
+        result['compressions'][algo_name] = compression
+    return result
+
+def compress_file(filepath, input_dir, output_dir, algorithms, probe_threshold=None, verify=False, memory_limit=None,
+                  policy=None):
+    """Compress one file with every algorithm and return (report row, result dict).
+    
+    The work is done by compression_backbone.compress_one: one read feeds
+    every streaming codec, outputs are written to a temp file and moved to
+    output_dir/<codec>/<relative path>.<codec>, and with verify every output
+    is decompressed and checked against the source. Each codec's settings are
+    clamped to memory_limit bytes (default: default_memory_limit()); clamped
+    results carry the settings used. This is a top-level function so it can
+    run in a worker process.
+    
+    With policy ('size', 'speed' or 'balanced'), compression_backbone's
+    choose_codec picks one streaming codec and level instead, or 'Store' for
+    files not worth compressing, and only that result is returned.
+    """
+    if memory_limit is None:
+        memory_limit = default_memory_limit()
+    filepath = os.path.abspath(filepath)
+    input_dir = os.path.abspath(input_dir)
+    output_dir = os.path.abspath(output_dir)
+    size = os.path.getsize(filepath)
+    base = GUI_CONFIG
+    decision = None
+    if policy:
+        candidates = [CODECS[name] for name in algorithms if CODECS[name] in STREAMING_ALGOS]
+        decision = choose_codec(Path(filepath), size, candidates, GUI_CONFIG, policy,
+                                threshold=probe_threshold or PROBE_THRESHOLD)
+        algorithms = [next(name for name, codec in CODECS.items() if codec == decision.algo)]
+        if decision.level is not None:
+            base = config_with_level(GUI_CONFIG, decision.algo, decision.level)
+    config = clamp_config(algorithms, size, memory_limit, base)
+    row = compress_one(
+        Path(filepath),
+        Path(input_dir),
+        Path(output_dir),
+        [CODECS[name] for name in algorithms],
+        config,
+        force=True,
+        probe_threshold=None if decision else probe_threshold,
+        verify=verify,
+    )
+    if decision is not None:
+        row['policy'] = decision.report()
+    return row, to_file_result(row, filepath, output_dir, algorithms, config, base)
+
+def run_on_executor(executor, workers, files, cancel, on_done, args):
+    """Run compress_file(filepath, *args) for each of files on executor, calling on_done(row, file_result).
+    
+    A bounded window of in-flight files keeps memory flat and makes cancel
+    prompt. Returns True if cancel was set before every file was started.
+    """
+    window = 4 * workers
+    in_flight = []
+    cancelled = exhausted = False
+    while not exhausted or in_flight:
+        while not exhausted and len(in_flight) < window:
+            if cancel is not None and cancel.is_set():
+                cancelled = exhausted = True
+                break
+            filepath = next(files, None)
+            if filepath is None:
+                exhausted = True
+                break
+            in_flight.append(executor.submit(compress_file, filepath, *args))
+        if not in_flight:
+            break
+        on_done(*in_flight.pop(0).result())
+    return cancelled
+
+def process_files(input_dir, output_dir, probe_threshold=None, stream=None, executor=None, cancel=None, verify=False,
+                  memory_limit=None, workers=None, dedup=False, policy=None):
+    """Process all files in input directory with multiple compression algorithms.
+
+    This is a thin adapter over compression_backbone (see compress_file):
+    outputs keep their path relative to input_dir, rows go to report.ndjson
+    and report.csv in output_dir as files finish, and report.json is
+    written at the end.
+
+    If probe_threshold is given, each file is sampled first and files whose
+    predicted ratio is at or above it are reported as skipped, not compressed.
+    If verify is set, outputs that don't decompress back to the source are
+    reported with an error and left out of the averages.
+    
+    With dedup, byte-identical files are compressed once (the backbone's
+    DuplicateIndex: size, then a partial and a full hash). The copies'
+    results are filled from the first one, marked 'dedup_of', and their
+    outputs are hard links to its outputs (copies across filesystems).
+    
+    With policy ('size', 'speed' or 'balanced'), each file gets one codec and
+    level picked for it (see compress_file); results carry the 'policy'
+    choice and cover only that codec, or 'Store' for files copied as is.
+    
+    memory_limit (bytes, default default_memory_limit()) is shared by the
+    files compressing at once: each of the executor's workers gets an equal
+    share, and every codec's window/level is clamped to fit it.
+    
+    If stream is given, GUI result dicts are not collected: every (file,
+    algorithm) result is written to it as a {"type": "result"} NDJSON line as
+    soon as the file is done, {"type": "progress"} lines follow every
+    PROGRESS_INTERVAL seconds, and a final {"type": "summary"} line carries
+    the averages. The summary is also returned, with an empty 'results' list.
+    
+    Files are compressed on executor if given, otherwise on a process pool of
+    workers processes (default: one per CPU) created for this run; a few
+    files per worker are in flight at a time. If cancel (a threading.Event)
+    gets set, no new files are started and the summary is marked 'cancelled'.
+    """
+    # The scanner yields absolute paths, which compress_one makes relative to input_dir
+    input_dir = os.path.abspath(input_dir)
+    output_dir = os.path.abspath(output_dir)
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
-    # Get all files
-    files = scan_directory(input_dir)
+    # Files are compressed while the scan is still running; output_dir is
+    # skipped in case it lives inside input_dir
+    scan = {'found': 0, 'done': False}
     
-    if not files:
-        return {"error": "No files found in directory"}
+    def found_files():
+        for filepath in scan_directory(input_dir, exclude=[output_dir]):
+            scan['found'] += 1
+            yield filepath
+        scan['done'] = True
     
-    # Compression algorithms
-    algorithms = [
-        ('ZIP', 'zip', compress_zip),
-        ('GZIP', 'gz', compress_gzip),
-        ('XZ', 'xz', compress_xz),
-        ('Zstd', 'zst', compress_zstd),
-    ]
+    files = found_files()
+    first = next(files, None)
+    if first is None:
+        if stream is not None:
+            emit(stream, {'type': 'summary', 'error': 'No files found in directory'})
+        return {"error": "No files found in directory"}
+    files = itertools.chain([first], files)
     
-    # Add 7z if available
-    if check_7z_available():
-        algorithms.append(('7z', '7z', compress_7z))
+    algorithms = get_algorithms()
+    report_algorithms = algorithms + ['Store'] if policy else algorithms
+    if memory_limit is None:
+        memory_limit = default_memory_limit()
+    own_executor = None
+    if executor is None:
+        workers = workers or os.cpu_count() or 1
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing; see _LazyModule
+            executor = own_executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+    file_memory = memory_limit // workers
     
     results = []
-    algorithm_totals = {algo[0]: {'original': 0, 'compressed': 0, 'count': 0} for algo in algorithms}
-    
-    for filepath in files:
-        file_result = {
-            'filename': os.path.basename(filepath),
-            'path': filepath,
-            'original_size': get_file_size(filepath),
-            'compressions': {}
+    report = ReportWriter(Path(output_dir), [CODECS[a] for a in report_algorithms])
+    algorithm_totals = {algo: {'original': 0, 'compressed': 0, 'count': 0} for algo in report_algorithms}
+    started = time.monotonic()
+    last_progress = started
+    files_done = 0
+    bytes_done = 0
+    dedup_index = DuplicateIndex() if dedup else None
+    originals = {}  # path -> (row, file_result) of the files compressed so far, for their duplicates
+    waiting = {}  # original's path -> duplicates found before it finished
+    dedup_stats = {'duplicates': 0, 'bytes_not_compressed': 0}
+    
+    def emit_result(file_result, algo_name):
+        if stream is None:
+            return
+        message = {
+            'type': 'result',
+            'filename': file_result['filename'],
+            'path': file_result['path'],
+            'original_size': file_result['original_size'],
+            'algorithm': algo_name,
         }
+        if 'probe' in file_result:
+            message['probe'] = file_result['probe']
+        if 'dedup_of' in file_result:
+            message['dedup_of'] = file_result['dedup_of']
+        if 'policy' in file_result:
+            message['policy'] = file_result['policy']
+        message.update(file_result['compressions'][algo_name])
+        emit(stream, message)
+    
+    def progress():
+        nonlocal last_progress
+        last_progress = time.monotonic()
+        elapsed = last_progress - started
+        emit(stream, {
+            'type': 'progress',
+            'files_done': files_done,
+            'total_files': scan['found'],
+            'scanning': not scan['done'],
+            'bytes_done': bytes_done,
+            'elapsed': elapsed,
+            'mb_per_s': bytes_done / elapsed / 1e6 if elapsed > 0 else 0
+        })
+    
+    def finish_file(row, file_result):
+        nonlocal files_done, bytes_done
+        report.add(row)
+        files_done += 1
+        bytes_done += file_result['original_size']
         
-        for algo_name, ext, compress_func in algorithms:
-            # Create output filename
-            output_filename = f"{os.path.basename(filepath)}.{ext}"
-            output_filepath = os.path.join(output_dir, output_filename)
-            
-            # Try compression
-            success = compress_func(filepath, output_filepath)
-            
-            if success and os.path.exists(output_filepath):
-                compressed_size = get_file_size(output_filepath)
-                ratio = (1 - compressed_size / file_result['original_size']) * 100 if file_result['original_size'] > 0 else 0
-                
-                file_result['compressions'][algo_name] = {
-                    'compressed_size': compressed_size,
-                    'ratio': ratio,
-                    'output_file': output_filepath
-                }
-                
-                # Update totals
+        # Update totals
+        for algo_name, compression in file_result['compressions'].items():
+            if 'compressed_size' in compression and 'error' not in compression:
                 algorithm_totals[algo_name]['original'] += file_result['original_size']
-                algorithm_totals[algo_name]['compressed'] += compressed_size
+                algorithm_totals[algo_name]['compressed'] += compression['compressed_size']
                 algorithm_totals[algo_name]['count'] += 1
-            else:
-                file_result['compressions'][algo_name] = {
-                    'error': 'Compression failed'
-                }
         
-        results.append(file_result)
+        if stream is None:
+            results.append(file_result)
+        else:
+            for algo_name in file_result['compressions']:
+                emit_result(file_result, algo_name)
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                progress()
+        
+        if dedup_index is not None and 'dedup_of' not in file_result:
+            originals[file_result['path']] = (row, file_result)
+            for duplicate in waiting.pop(file_result['path'], []):
+                finish_duplicate(duplicate, file_result['path'])
+    
+    def finish_duplicate(filepath, original):
+        row, file_result = originals[original]
+        dedup_stats['duplicates'] += 1
+        dedup_stats['bytes_not_compressed'] += row['orig']
+        duplicate = duplicate_row(row, os.path.relpath(filepath, input_dir), Path(output_dir))
+        finish_file(duplicate, duplicate_result(file_result, duplicate, filepath, output_dir))
+    
+    def unique_files(paths):
+        # Duplicates are held back until their original is done, then filled from it
+        for filepath in paths:
+            original = dedup_index.add(Path(filepath), os.path.getsize(filepath))
+            if original is None:
+                yield filepath
+            elif str(original) in originals:
+                finish_duplicate(filepath, str(original))
+            else:
+                waiting.setdefault(str(original), []).append(filepath)
+    
+    if dedup_index is not None:
+        files = unique_files(files)
+    
+    cancelled = False
+    try:
+        if executor is None:
+            for filepath in files:
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    break
+                finish_file(*compress_file(filepath, input_dir, output_dir, algorithms, probe_threshold, verify, file_memory,
+                                           policy))
+        else:
+            cancelled = run_on_executor(
+                executor, workers, files, cancel, finish_file,
+                (input_dir, output_dir, algorithms, probe_threshold, verify, file_memory, policy)
+            )
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown(wait=True, cancel_futures=True)
+        report.flush()
+    if stream is not None:
+        progress()
+    
+    report.close()
     
     # Calculate average ratios
     averages = {}
@@ -197,30 +471,85 @@ def process_files(input_dir, output_dir):
                 'file_count': totals['count']
             }
     
-    return {
+    summary = {
         'results': results,
         'averages': averages,
-        'total_files': len(files)
+        'total_files': scan['found']
     }
+    if dedup:
+        summary['dedup'] = dedup_stats
+    if cancelled:
+        summary['cancelled'] = True
+    if stream is not None:
+        message = {'type': 'summary', 'averages': averages, 'total_files': scan['found']}
+        if dedup:
+            message['dedup'] = dedup_stats
+        if cancelled:
+            message['cancelled'] = True
+        emit(stream, message)
+    return summary
+
+def positive_int(value):
+    """argparse type for counts and sizes that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value!r}")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compress every file in a directory with each algorithm and print the results as JSON."
+    )
+    parser.add_argument('input_dir', nargs='?', help="Directory containing files to compress")
+    parser.add_argument('output_dir', nargs='?', help="Where outputs and report files go")
+    parser.add_argument('--probe', action='store_true', help="Skip files the sampled probe finds incompressible")
+    parser.add_argument('--stream', action='store_true', help="Print NDJSON result/progress/summary lines as files finish")
+    parser.add_argument('--verify', action='store_true', help="Decompress every output and check it against the source")
+    parser.add_argument('--dedup', action='store_true', help="Compress byte-identical files once")
+    parser.add_argument('--policy', choices=POLICY_TARGETS,
+                        help="Pick one codec and level per file (smallest, fastest or balanced) instead of running all")
+    parser.add_argument('--memory-mb', type=positive_int, default=None,
+                        help=f"Memory ceiling shared by the compressors (default: a quarter of RAM, at most {DEFAULT_MEMORY_MB})")
+    parser.add_argument('--workers', type=positive_int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--install-deps', action='store_true', help="Install missing optional dependencies with pip and exit")
+    args = parser.parse_args(argv)
+    if not args.install_deps and (args.input_dir is None or args.output_dir is None):
+        parser.error("input_dir and output_dir are required")
+    return args
 
 def main():
     """Main entry point."""
-    if len(sys.argv) < 3:
-        print("Usage: compress.py <input_directory> <output_directory>")
-        sys.exit(1)
-    
-    input_dir = sys.argv[1]
-    output_dir = sys.argv[2]
+    args = parse_args()
+    if args.install_deps:
+        install_dependencies()
+        return
+    input_dir = args.input_dir
+    output_dir = args.output_dir
+    memory_limit = args.memory_mb << 20 if args.memory_mb else None
+    probe_threshold = PROBE_THRESHOLD if args.probe else None
     
     if not os.path.isdir(input_dir):
         print(f"Error: Input directory '{input_dir}' does not exist")
         sys.exit(1)
     
+    if not capabilities()['zstd']:
+        print("Note: zstandard is not installed, Zstd results will fail (compress.py --install-deps)", file=sys.stderr)
+    
     print(f"Scanning directory: {input_dir}")
     print(f"Output directory: {output_dir}")
     print("-" * 80)
     
-    results = process_files(input_dir, output_dir)
+    if args.stream:
+        # NDJSON for the GUI: one line per result, progress lines, then a summary
+        process_files(input_dir, output_dir, probe_threshold, stream=sys.stdout, verify=args.verify,
+                      memory_limit=memory_limit, workers=args.workers, dedup=args.dedup, policy=args.policy)
+        return
+    
+    results = process_files(input_dir, output_dir, probe_threshold, verify=args.verify,
+                            memory_limit=memory_limit, workers=args.workers, dedup=args.dedup, policy=args.policy)
     
     # Print results as JSON for the GUI
     print(json.dumps(results, indent=2))
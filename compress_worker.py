@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Long-lived compression worker for the GUI.
+
+Speaks newline-delimited JSON-RPC on stdin/stdout so the Electron main
+process can start it once and send many jobs, instead of paying for a fresh
+Python start, the dependency check and 7z detection on every run.
+
+Requests (one JSON object per line):
+    {"id": 1, "method": "compress", "params": {"input_dir": "...", "output_dir": "...", "probe": false, "verify": false, "dedup": false, "memory_mb": 1024, "policy": null}}
+    {"id": 2, "method": "cancel", "params": {"job": 1}}
+    {"id": 3, "method": "capabilities"}
+    {"id": 4, "method": "ping"}
+    {"id": 5, "method": "shutdown"}
+
+Replies are {"id": ..., "result": ...} or {"id": ..., "error": "..."}. A
+compress job replies when it finishes (result = the summary). While it runs,
+every NDJSON line compress.py --stream would print is sent wrapped as
+{"job": <request id>, "message": {...}}. Several jobs may run at once.
+"""
+
+import json
+import os
+import sys
+import threading
+
+import compress
+from compression_backbone import POLICY_TARGETS, PROBE_THRESHOLD, capabilities
+
+
+def _noop(_):
+    return None
+
+
+class Channel:
+    """Serializes writes from several job threads onto one stdout."""
+
+    def __init__(self, out):
+        self._out = out
+        self._lock = threading.Lock()
+
+    def send_raw(self, line):
+        with self._lock:
+            self._out.write(line + '\n')
+            self._out.flush()
+
+    def send(self, message):
+        self.send_raw(json.dumps(message))
+
+
+class JobStream:
+    """File-like target for compress.emit() that tags each line with its job id."""
+
+    def __init__(self, channel, job_id):
+        self._channel = channel
+        self._prefix = '{"job": %s, "message": ' % json.dumps(job_id)
+        self._pending = ''
+
+    def write(self, text):
+        self._pending += text
+        *lines, self._pending = self._pending.split('\n')
+        for line in lines:
+            if line:
+                self._channel.send_raw(self._prefix + line + '}')
+
+    def flush(self):
+        pass
+
+
+class Worker:
+    def __init__(self, channel, workers=None):
+        self.channel = channel
+        self.jobs = {}
+        self.lock = threading.Lock()
+        # The probe runs once here, not per job, and is cached on disk across launches
+        caps = capabilities()
+        self.capabilities = {
+            'zstd': caps['zstd'],
+            'zstd_version': caps['zstd_version'],
+            '7z': caps['7z'],
+            '7z_path': caps['7z_path'],
+            '7z_version': caps['7z_version'],
+            'python': sys.version.split()[0],
+        }
+        from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing; see _LazyModule
+        self.executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        # Start the pool processes now so the first job doesn't pay for it
+        list(self.executor.map(_noop, range(self.executor._max_workers)))
+
+    def handle(self, request):
+        req_id = request.get('id')
+        method = request.get('method')
+        params = request.get('params') or {}
+        if method == 'compress':
+            self.start_job(req_id, params)
+        elif method == 'cancel':
+            with self.lock:
+                event = self.jobs.get(params.get('job'))
+            if event is not None:
+                event.set()
+            self.channel.send({'id': req_id, 'result': {'cancelled': event is not None}})
+        elif method == 'capabilities':
+            self.channel.send({'id': req_id, 'result': self.capabilities})
+        elif method == 'ping':
+            self.channel.send({'id': req_id, 'result': 'pong'})
+        elif method == 'shutdown':
+            self.channel.send({'id': req_id, 'result': 'bye'})
+            return False
+        else:
+            self.channel.send({'id': req_id, 'error': f'Unknown method: {method}'})
+        return True
+
+    def start_job(self, job_id, params):
+        input_dir = params.get('input_dir')
+        output_dir = params.get('output_dir')
+        if not input_dir or not os.path.isdir(input_dir):
+            self.channel.send({'id': job_id, 'error': f"Input directory '{input_dir}' does not exist"})
+            return
+        if not output_dir:
+            self.channel.send({'id': job_id, 'error': 'No output directory given'})
+            return
+        if params.get('policy') and params['policy'] not in POLICY_TARGETS:
+            self.channel.send({'id': job_id, 'error': f"Unknown policy: {params['policy']}"})
+            return
+        cancel = threading.Event()
+        with self.lock:
+            self.jobs[job_id] = cancel
+
+        def run():
+            try:
+                summary = compress.process_files(
+                    input_dir,
+                    output_dir,
+                    PROBE_THRESHOLD if params.get('probe') else None,
+                    stream=JobStream(self.channel, job_id),
+                    executor=self.executor,
+                    cancel=cancel,
+                    verify=bool(params.get('verify')),
+                    memory_limit=params['memory_mb'] << 20 if params.get('memory_mb') else None,
+                    dedup=bool(params.get('dedup')),
+                    policy=params.get('policy') or None,
+                )
+                summary.pop('results', None)
+                self.channel.send({'id': job_id, 'result': summary})
+            except Exception as e:
+                self.channel.send({'id': job_id, 'error': str(e)})
+            finally:
+                with self.lock:
+                    self.jobs.pop(job_id, None)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        with self.lock:
+            for event in self.jobs.values():
+                event.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main():
+    # Anything printed by library code (or by pool processes, which inherit
+    # fd 1) must not corrupt the protocol stream, so move it to stderr.
+    channel = Channel(os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8'))
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    worker = Worker(channel)
+    channel.send({'ready': True, 'capabilities': worker.capabilities})
+    try:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                channel.send({'id': None, 'error': f'Invalid JSON: {e}'})
+                continue
+            if not worker.handle(request):
+                break
+    finally:
+        worker.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,182 +8,3361 @@ Optimized by Warp: streaming compression, concurrency, reporting, and CLI tunabl
 from __future__ import annotations
 
 import argparse
+import bisect
+import contextlib
 import csv
-import gzip
+import functools
+import hashlib
+import importlib
+import importlib.util
+import itertools
 import json
-import lzma
+import math
 import os
-import shutil
+import queue
+import random
+import struct
 import subprocess
 import sys
-import tempfile
 import textwrap
-import zipfile
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from dataclasses import dataclass
+import threading
+import time
+import types
+import zlib
+from collections import Counter
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from shutil import which
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+
+@functools.lru_cache(maxsize=None)
+def _import_optional(name: str) -> Optional[types.ModuleType]:
+    try:
+        return importlib.import_module(name)
+    except Exception:  # pragma: no cover
+        return None
+
+
+class _LazyModule:
+    """A codec module that is imported on first attribute access, not at startup.
+
+    Short runs only pay for the codecs they use. A missing optional module
+    raises ImportError when it is first used; check has_zstd/has_py7zr first.
+    Standard modules that import codecs themselves (shutil and tempfile,
+    and multiprocessing through ProcessPoolExecutor) are deferred the same way.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        module = _import_optional(self._name)
+        if module is None:
+            raise ImportError(f"{self._name} module not available")
+        return getattr(module, attr)
+
+
+zstd: Any = _LazyModule("zstandard")
+py7zr: Any = _LazyModule("py7zr")
+sqlite3: Any = _LazyModule("sqlite3")
+tarfile: Any = _LazyModule("tarfile")
+zipfile: Any = _LazyModule("zipfile")
+gzip: Any = _LazyModule("gzip")
+lzma: Any = _LazyModule("lzma")
+# Not codecs, but both import bz2 and lzma at module level.
+shutil: Any = _LazyModule("shutil")
+tempfile: Any = _LazyModule("tempfile")
+
+
+def has_zstd() -> bool:
+    return _import_optional("zstandard") is not None
+
+
+def has_py7zr() -> bool:
+    return _import_optional("py7zr") is not None
+
 
 try:
-    import zstandard as zstd  # type: ignore
-    HAS_ZSTD = True
-except Exception:  # pragma: no cover
-    HAS_ZSTD = False
+    import resource  # POSIX only
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+PROBE_WINDOW = 64 * 1024  # bytes per sampled window
+PROBE_SAMPLES = 4
+PROBE_THRESHOLD = 0.97  # predicted ratio at or above this is "hopeless"
+FANOUT_QUEUE_DEPTH = 4  # chunks buffered per codec thread during fan-out
+READAHEAD_SIZE = 8 * CHUNK_SIZE  # input the OS is asked to prefetch ahead of the reader; 0 disables
+WRITE_BEHIND_DEPTH = 4  # output chunks queued for a file's writer thread; 0 writes inline
+STREAMING_ALGOS = ("zip", "gzip", "xz", "zstd")  # codecs fan_out can feed incrementally
+PARALLEL_ALGOS = ("gzip", "xz", "zstd")  # codecs that can split one file across threads
+CACHE_FILENAME = ".compression_cache.sqlite"
+CAPABILITIES_FILE = "capabilities.json"  # in capability_cache_dir()
+CACHE_MAX_ENTRIES = 5_000_000  # (file, codec) rows kept before LRU eviction
+DICT_MAX_FILE = 64 * 1024  # files at or below this use a trained zstd dictionary
+DICT_SIZE = 112 * 1024
+DICT_MAX_SAMPLES = 2000  # files sampled per extension group for training
+DICT_MIN_SAMPLES = 16  # smaller groups are not worth a dictionary
+SEVENZIP_BATCH_FILES = 1000  # files per 7z invocation in batch mode
+SCHEDULE_LOOKAHEAD = 64  # pending jobs scanned for one that fits the free budget
+SOLID_ALGOS = ("zstd", "xz")
+SOLID_FRAME_SIZE = 4 * 1024 * 1024  # seekable frame size of solid streams when --frame-size-kb is not given
+SCAN_THREADS = 8  # directory listings run in parallel; helps most on network shares
+SCAN_QUEUE_BATCHES = 256  # per-directory batches buffered ahead of the consumer
+ZSTD_MAGIC = 0xFD2FB528
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1  # seek table footer of the zstd seekable format
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# Same classification as repack_by_type.js
+COMPRESSIBLE_EXT = frozenset(
+    {
+        ".tif", ".tiff", ".vrt", ".dem", ".asc",
+        ".csv", ".txt", ".json", ".xml", ".ini",
+        ".cfg", ".log",
+        ".js", ".ts", ".py", ".ps1", ".bat", ".sh", ".md",
+        ".yaml", ".yml",
+        ".psd", ".psb",
+    }
+)
+ALREADY_COMPRESSED_EXT = frozenset(
+    {
+        ".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp",
+        ".mp4", ".mov", ".avi", ".mkv",
+        ".mp3", ".aac", ".ogg", ".wav", ".flac",
+        ".zip", ".7z", ".rar", ".gz", ".xz", ".zst", ".tgz",
+        ".sqlite", ".db",
+    }
+)
+
+# Rough single-core compression speed in MB/s, used only to order and size work.
+GZIP_MBPS = [100, 90, 80, 60, 45, 35, 28, 15, 12]  # levels 1-9 (also zip)
+XZ_MBPS = [30, 20, 13, 8, 5, 3.5, 2.5, 2.0, 1.8, 1.6]  # presets 0-9
+XZ_EXTREME_FACTOR = 0.6
+ZSTD_MBPS = {-5: 700, 1: 400, 3: 300, 5: 150, 9: 70, 12: 40, 15: 20, 17: 10, 19: 5, 20: 4, 22: 2}
+SEVENZIP_MBPS = {1: 30, 5: 6, 9: 2}
+# Compressor memory per preset from the xz(1) man page, in MiB.
+XZ_MEMORY_MIB = [3, 9, 17, 32, 48, 94, 94, 186, 370, 674]
+ZSTD_MIN_WINDOW_LOG = 20  # fit_memory never caps the zstd window below 1 MiB
+
+# Policy mode (see choose_codec): candidate (codec, level) pairs and their
+# typical size relative to zstd -1, the codec the probe runs. Averaged over
+# the text, raster and JSON corpora of `compression_backbone.py bench`.
+POLICY_TARGETS = ("size", "speed", "balanced")
+POLICY_TRADEOFF = 0.1  # balanced: ratio points one extra second per MB is worth
+RATIO_VS_ZSTD1 = {
+    ("zstd", 3): 0.95,
+    ("zstd", 9): 0.90,
+    ("zstd", 19): 0.78,
+    ("gzip", 6): 0.95,
+    ("gzip", 9): 0.93,
+    ("zip", 9): 0.93,
+    ("xz", 6): 0.75,
+    ("xz", 9): 0.74,
+}
+FORMAT_OVERHEAD = {"zip": 120, "gzip": 24, "xz": 64, "zstd": 12}  # container bytes, plus the name for zip/gzip
+
+
+def thread_cpu() -> Tuple[float, float]:
+    """(user, sys) CPU seconds of the calling thread; sys is 0 where the OS can't split them."""
+    if resource is not None and hasattr(resource, "RUSAGE_THREAD"):
+        ru = resource.getrusage(resource.RUSAGE_THREAD)
+        return ru.ru_utime, ru.ru_stime
+    return time.thread_time(), 0.0
+
+
+def process_usage() -> Tuple[float, float, int]:
+    """(user, sys, peak RSS bytes) of this process and its finished children (e.g. 7z)."""
+    if resource is None:
+        return time.process_time(), 0.0, 0
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    rss = me.ru_maxrss * (1 if sys.platform == "darwin" else 1024)  # bytes on macOS, KiB elsewhere
+    return me.ru_utime + kids.ru_utime, me.ru_stime + kids.ru_stime, rss
+
+
+def timing_cell(start: float, cpu: Tuple[float, float], read: int, written: int) -> Dict[str, float]:
+    """Measurements for one (file, codec) pair, from ``time.perf_counter()`` and ``thread_cpu()`` at its start.
+
+    ``t0`` and ``pid`` place the pair on the trace timeline; main() strips them before writing reports.
+    """
+    seconds = time.perf_counter() - start
+    user, system = thread_cpu()
+    return {
+        "seconds": round(seconds, 6),
+        "cpu_user": round(user - cpu[0], 6),
+        "cpu_sys": round(system - cpu[1], 6),
+        "read": read,
+        "written": written,
+        "mbps": round(read / seconds / 1e6, 3) if seconds > 0 else 0.0,
+        "t0": start,
+        "pid": os.getpid(),
+    }
+
+
+def human_size(num: int) -> str:
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if num < 1024:
+            return f"{num:.1f}{unit}"
+        num /= 1024
+    return f"{num:.1f}PB"
+
+
+@dataclass
+class AlgoConfig:
+    zip_level: int = 9
+    gzip_level: int = 9
+    xz_preset: int = 9
+    xz_extreme: bool = True
+    zstd_level: int = 19
+    zstd_window_log: int = 0  # >0: cap the zstd window below the level's default (see fit_memory)
+    sevenzip_level: int = 9
+    threads: int = 1  # threads per codec for files at or above parallel_threshold
+    parallel_threshold: int = 256 * 1024 * 1024
+    block_size: int = 16 * 1024 * 1024  # independent gzip member / xz stream size in parallel mode
+    frame_size: int = 0  # >0: seekable zstd/xz made of independent frames of this many input bytes
+    zstd_dicts: Optional[Dict[str, str]] = None  # extension -> trained dictionary file (see train_zstd_dictionaries)
+    dict_max_file: int = DICT_MAX_FILE
+
+    def threads_for(self, size: int) -> int:
+        return self.threads if self.threads > 1 and size >= self.parallel_threshold else 1
+
+    def cores_for(self, size: int, algos: Iterable[str]) -> int:
+        """Cores one file occupies while its codecs run side by side in fan_out."""
+        threads = self.threads_for(size)
+        return sum(threads if a in PARALLEL_ALGOS else 1 for a in algos)
+
+
+@dataclass
+class ProbeResult:
+    ratio: float  # predicted compressed/original ratio from the sampled windows
+    entropy: float  # order-0 Shannon entropy of the samples, bits per byte
+    sampled: int  # bytes actually read
+
+    def hopeless(self, threshold: float = PROBE_THRESHOLD) -> bool:
+        return self.ratio >= threshold
+
+
+def _sample_offsets(size: int, samples: int, window: int) -> List[int]:
+    if size <= samples * window:
+        return [0]
+    step = (size - window) / (samples - 1) if samples > 1 else 0
+    return [int(i * step) for i in range(samples)]
+
+
+def probe_file(src: Path, *, samples: int = PROBE_SAMPLES, window: int = PROBE_WINDOW) -> ProbeResult:
+    """Predict compressibility from a few evenly spaced windows of ``src``.
+
+    Each window is compressed with a fast codec (zstd -1, or deflate -1 without
+    zstandard) so the cost stays bounded no matter how large the file is.
+    """
+    size = src.stat().st_size
+    if size == 0:
+        return ProbeResult(ratio=1.0, entropy=0.0, sampled=0)
+    cctx = zstd.ZstdCompressor(level=1) if has_zstd() else None
+    counts: Counter = Counter()
+    sampled = 0
+    compressed = 0
+    read_size = size if size <= samples * window else window
+    with open(src, "rb") as fin:
+        for offset in _sample_offsets(size, samples, window):
+            fin.seek(offset)
+            data = fin.read(read_size)
+            if not data:
+                continue
+            sampled += len(data)
+            counts.update(data)
+            compressed += len(cctx.compress(data)) if cctx else len(zlib.compress(data, 1))
+    if not sampled:
+        return ProbeResult(ratio=1.0, entropy=0.0, sampled=0)
+    entropy = -sum((n / sampled) * math.log2(n / sampled) for n in counts.values())
+    return ProbeResult(ratio=compressed / sampled, entropy=entropy, sampled=sampled)
+
+
+def compress_zip(src: Path, dst: Path, *, level: int = 9) -> None:
+    with zipfile.ZipFile(dst, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+        zf.write(src, arcname=src.name)
+
+
+def compress_gzip(src: Path, dst: Path, *, level: int = 9) -> None:
+    with open(src, "rb") as fin, gzip.open(dst, "wb", compresslevel=level) as fout:
+        shutil.copyfileobj(fin, fout, length=CHUNK_SIZE)
+
+
+def compress_xz(src: Path, dst: Path, *, preset: int = 9, extreme: bool = True) -> None:
+    xz_level = preset | (lzma.PRESET_EXTREME if extreme else 0)
+    with open(src, "rb") as fin, lzma.open(dst, "wb", preset=xz_level) as fout:
+        shutil.copyfileobj(fin, fout, length=CHUNK_SIZE)
+
+
+def compress_zstd(src: Path, dst: Path, *, level: int = 19) -> None:
+    if not has_zstd():
+        raise RuntimeError("zstandard module not available")
+    cctx = zstd.ZstdCompressor(level=level)
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        cctx.copy_stream(fin, fout, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+
+
+def _which(name: str) -> Optional[str]:
+    """``shutil.which`` for an exact file name, without importing shutil (and through it lzma and bz2)."""
+    for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        candidate = os.path.join(directory or os.curdir, name)
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def find_7z() -> Optional[str]:
+    candidates = [_which("7z"), _which("7z.exe")]
+    # Common Windows install path
+    candidates.append(str(Path(os.environ.get("ProgramFiles", "C:/Program Files")) / "7-Zip" / "7z.exe"))
+    for c in candidates:
+        if c and Path(c).exists():
+            return c
+    return None
+
+
+def compress_7z(src: Path, dst: Path, *, level: int = 9) -> None:
+    sevenzip = find_7z()
+    if not sevenzip:
+        raise RuntimeError("7z executable not found. Install 7‑Zip and ensure 7z.exe is on PATH.")
+    cmd = [sevenzip, "a", "-t7z", f"-mx={level}", str(dst), str(src)]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"7z failed: {result.stderr.decode(errors='ignore')}")
+
+
+def compress_7z_py(src: Path, dst: Path, *, level: int = 9) -> None:
+    """In-process 7z (LZMA2) via py7zr, for machines without a 7z binary."""
+    if not has_py7zr():
+        raise RuntimeError("py7zr module not available")
+    with py7zr.SevenZipFile(dst, "w", filters=[{"id": py7zr.FILTER_LZMA2, "preset": level}]) as archive:
+        archive.write(src, arcname=src.name)
+
+
+def sevenzip_backend() -> Optional[str]:
+    """``"cli"`` when a 7z binary is available, ``"py7zr"`` as the in-process fallback, else None."""
+    if find_7z():
+        return "cli"
+    if has_py7zr():
+        return "py7zr"
+    return None
+
+
+def capability_cache_dir() -> Path:
+    """Per-user cache directory: ``%LOCALAPPDATA%`` on Windows, else ``$XDG_CACHE_HOME`` or ``~/.cache``."""
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else os.environ.get("XDG_CACHE_HOME")
+    return Path(base or Path.home() / ".cache") / "formatnpackage"
+
+
+def _capability_key() -> Dict[str, object]:
+    """What a probe result depends on; computing it imports and launches nothing."""
+    modules: Dict[str, Optional[str]] = {}
+    for name in ("zstandard", "py7zr"):
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            spec = None
+        modules[name] = spec.origin if spec is not None else None
+    sevenzip = find_7z()
+    try:
+        sevenzip_mtime = os.stat(sevenzip).st_mtime_ns if sevenzip else None
+    except OSError:
+        sevenzip_mtime = None
+    return {
+        "python": sys.executable,
+        "version": sys.version,
+        "path": os.environ.get("PATH", ""),
+        "modules": modules,
+        "7z": [sevenzip, sevenzip_mtime],
+    }
+
+
+def probe_capabilities() -> Dict[str, object]:
+    """Import the optional codec modules and run the 7z binary once to report what is usable."""
+    zstd_module = _import_optional("zstandard")
+    py7zr_module = _import_optional("py7zr")
+    sevenzip = find_7z()
+    sevenzip_version = None
+    if sevenzip:
+        try:
+            banner = subprocess.run([sevenzip], capture_output=True, timeout=30).stdout.decode(errors="ignore")
+            sevenzip_version = next((line.strip() for line in banner.splitlines() if line.strip()), None)
+        except (OSError, subprocess.SubprocessError):
+            sevenzip = None
+    return {
+        "zstd": zstd_module is not None,
+        "zstd_version": getattr(zstd_module, "__version__", None),
+        "py7zr": py7zr_module is not None,
+        "py7zr_version": getattr(py7zr_module, "__version__", None),
+        "7z": sevenzip is not None,
+        "7z_path": sevenzip,
+        "7z_version": sevenzip_version,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def capabilities(cache_file: Optional[Path] = None) -> Dict[str, object]:
+    """probe_capabilities(), cached on disk across runs.
+
+    The cached result (``capability_cache_dir()/capabilities.json`` by
+    default) is reused while the interpreter, PATH, the location of the
+    optional modules and the 7z binary's mtime are unchanged, so a hit
+    neither imports a codec module nor starts 7z.
+    """
+    path = cache_file or capability_cache_dir() / CAPABILITIES_FILE
+    key = _capability_key()
+    try:
+        cached = json.loads(path.read_text(encoding="utf-8"))
+        if cached.get("key") == key:
+            return cached["capabilities"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    caps = probe_capabilities()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"key": key, "capabilities": caps}, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass  # read-only home: probe again next time
+    return caps
+
+
+def _parse_7z_listing(text: str, field: str = "Packed Size") -> Dict[str, int]:
+    """Map member path -> ``field`` (packed size by default) from ``7z l -slt`` output, in archive order."""
+    sizes: Dict[str, int] = {}
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        fields = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+        if "Path" in fields and fields.get(field, "").isdigit() and fields.get("Folder") != "+":
+            sizes[fields["Path"].replace("\\", "/")] = int(fields[field])
+    return sizes
+
+
+def compress_7z_batch(files: List[Path], root: Path, dst: Path, *, level: int = 9, threads: int = 1) -> Dict[str, int]:
+    """Add many files to one non-solid 7z archive with a single 7z invocation.
+
+    Paths are stored relative to ``root``. Because the archive is not solid,
+    every member keeps its own packed size, which ``7z l -slt`` reports; that
+    is what is returned, keyed by the member's ``/``-separated relative path.
+    An existing ``dst`` is never replaced: cache and report rows of earlier
+    runs point into it (see batch_archive_name).
+    """
+    sevenzip = find_7z()
+    if not sevenzip:
+        raise RuntimeError("7z executable not found. Install 7‑Zip and ensure 7z.exe is on PATH.")
+    dst = dst.resolve()  # 7z runs with cwd=root
+    if dst.exists():
+        raise FileExistsError(f"7z batch archive already exists: {dst}")
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dst = dst.with_name(dst.name + ".tmp.7z")
+    if tmp_dst.exists():
+        tmp_dst.unlink()
+    with tempfile.NamedTemporaryFile("w", suffix=".lst", encoding="utf-8", delete=False) as lst:
+        for f in files:
+            lst.write(str(f.relative_to(root)) + "\n")
+    try:
+        cmd = [sevenzip, "a", "-t7z", f"-mx={level}", "-ms=off", f"-mmt={threads}", "-scsUTF-8", str(tmp_dst), f"@{lst.name}"]
+        result = subprocess.run(cmd, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"7z failed: {result.stderr.decode(errors='ignore')}")
+        listing = subprocess.run([sevenzip, "l", "-slt", str(tmp_dst)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if listing.returncode != 0:
+            raise RuntimeError(f"7z listing failed: {listing.stderr.decode(errors='ignore')}")
+        os.replace(tmp_dst, dst)
+    finally:
+        os.unlink(lst.name)
+        if tmp_dst.exists():
+            tmp_dst.unlink()
+    return _parse_7z_listing(listing.stdout.decode("utf-8", errors="replace"))
+
+
+def batch_archive_name(run: str, index: int) -> str:
+    """File name of the ``index``-th 7z batch archive of run ``run``, under ``<out_dir>/7z``.
+
+    The run stamp keeps archives of earlier runs, which cached and resumed
+    rows still refer to, from being overwritten by a later run's batches.
+    """
+    return f"batch_{run}_{index:05d}.7z"
+
+
+@functools.lru_cache(maxsize=None)
+def _archive_members(path: str, mtime_ns: int) -> Dict[str, int]:
+    """Packed size of every member of a 7z archive; keyed on mtime so a rewritten archive is listed again."""
+    sevenzip = find_7z()
+    if not sevenzip:
+        return {}
+    listing = subprocess.run([sevenzip, "l", "-slt", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if listing.returncode != 0:
+        return {}
+    return _parse_7z_listing(listing.stdout.decode("utf-8", errors="replace"))
+
+
+def archive_member_size(archive: Path, member: str) -> Optional[int]:
+    """Packed size of ``member`` (``/``-separated) in a 7z batch archive, or None if either is missing."""
+    try:
+        mtime_ns = archive.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _archive_members(str(archive), mtime_ns).get(member)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_zstd_dict(path: str) -> "zstd.ZstdCompressionDict":
+    return zstd.ZstdCompressionDict(Path(path).read_bytes())
+
+
+def zstd_dict_for(config: AlgoConfig, src: Path, size: int) -> Optional["zstd.ZstdCompressionDict"]:
+    """The trained dictionary for ``src``'s extension group, if it is small enough to use one."""
+    if not has_zstd() or not config.zstd_dicts or size > config.dict_max_file:
+        return None
+    path = config.zstd_dicts.get(src.suffix.lower())
+    return _load_zstd_dict(path) if path else None
+
+
+def zstd_output_dict(config: AlgoConfig, src: Path, output: Path) -> Optional["zstd.ZstdCompressionDict"]:
+    """The dictionary an existing zstd ``output`` of ``src`` was made with, found by the id in its frame header.
+
+    Earlier runs may have used an older dictionary for the same extension;
+    it is still next to the current one as ``<ext>-<dict_id>.dict``.
+    """
+    if not has_zstd():
+        return None
+    with open(output, "rb") as f:
+        dict_id = zstd.get_frame_parameters(f.read(18)).dict_id
+    if not dict_id:
+        return None
+    current = (config.zstd_dicts or {}).get(src.suffix.lower())
+    if current is None:
+        raise RuntimeError(f"{output} needs zstd dictionary {dict_id}, but no dictionary is configured")
+    path = Path(current).with_name(f"{dict_group_name(src.suffix.lower())}-{dict_id}.dict")
+    if not path.exists():
+        raise RuntimeError(f"{output} needs zstd dictionary {path.name}, which is missing")
+    return _load_zstd_dict(str(path))
+
+
+def dict_group_name(ext: str) -> str:
+    """File name stem used for an extension's dictionaries."""
+    return ext.lstrip(".") or "_noext"
+
+
+def train_zstd_dictionaries(
+    files: Iterable[Tuple[Path, int]], dict_dir: Path, config: AlgoConfig, dict_size: int = DICT_SIZE
+) -> Dict[str, Dict[str, object]]:
+    """Train one zstd dictionary per extension over the small files in ``files``.
+
+    Up to ``DICT_MAX_SAMPLES`` files per extension are sampled at even
+    intervals. Groups with fewer than ``DICT_MIN_SAMPLES`` small files are
+    skipped. Dictionaries are written to ``dict_dir/<ext>-<dict_id>.dict``
+    and never overwritten, so outputs made with an earlier dictionary stay
+    decodable after a retrain; the returned map describes each one for the
+    report.
+    """
+    if not has_zstd():
+        raise RuntimeError("zstandard module not available")
+    groups: Dict[str, List[Path]] = {}
+    for src, size in files:
+        if 0 < size <= config.dict_max_file:
+            groups.setdefault(src.suffix.lower(), []).append(src)
+    trained: Dict[str, Dict[str, object]] = {}
+    for ext, members in sorted(groups.items()):
+        if len(members) < DICT_MIN_SAMPLES:
+            continue
+        step = max(1, len(members) // DICT_MAX_SAMPLES)
+        samples = [p.read_bytes() for p in members[::step][:DICT_MAX_SAMPLES]]
+        try:
+            dictionary = zstd.train_dictionary(dict_size, samples, level=config.zstd_level)
+        except zstd.ZstdError:
+            continue  # too little or too uniform data to train on
+        dict_dir.mkdir(parents=True, exist_ok=True)
+        path = dict_dir / f"{dict_group_name(ext)}-{dictionary.dict_id()}.dict"
+        if not path.exists():
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(dictionary.as_bytes())
+            os.replace(tmp, path)
+        trained[ext] = {
+            "path": str(path),
+            "dict_id": dictionary.dict_id(),
+            "bytes": len(dictionary.as_bytes()),
+            "samples": len(samples),
+            "files": len(members),
+        }
+    return trained
+
+
+class _ZipMemberWriter:
+    """Write-only file object that streams a single member into a new zip archive."""
+
+    def __init__(self, dst: Path, src: Path, level: int) -> None:
+        self._zf = zipfile.ZipFile(dst, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level)
+        try:
+            info = zipfile.ZipInfo.from_file(src, arcname=src.name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # zip64 has to be decided before the first byte is written; leave headroom for expansion.
+            self._member = self._zf.open(info, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT // 2)
+        except Exception:
+            self._zf.close()
+            raise
+
+    def write(self, data: bytes) -> int:
+        return self._member.write(data)
+
+    def close(self) -> None:
+        try:
+            self._member.close()
+        finally:
+            self._zf.close()
+
+
+class _BlockParallelWriter:
+    """Split a stream into ``block_size`` blocks and compress them on a thread pool.
+
+    Each block becomes a self-contained gzip member, xz stream or zstd frame;
+    all three formats allow concatenation, so the output decompresses with
+    the stock tools (this is how pigz and ``xz -T`` stay compatible). At most
+    ``2 * threads`` blocks are in flight, which bounds memory to a few blocks
+    per codec. ``trailer`` receives the ``(compressed, uncompressed)`` size
+    of every block and returns bytes appended before closing (a seek table).
+    """
+
+    def __init__(
+        self,
+        fout: BinaryIO,
+        compress_block: Callable[[bytes], bytes],
+        block_size: int,
+        threads: int,
+        trailer: Optional[Callable[[List[Tuple[int, int]]], bytes]] = None,
+    ) -> None:
+        self._fout = fout
+        self._compress_block = compress_block
+        self._block_size = block_size
+        self._threads = threads
+        self._trailer = trailer
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+        self._pending: Deque[Tuple[Future, int]] = deque()
+        self._buf = bytearray()
+        self._blocks = 0
+        self.frames: List[Tuple[int, int]] = []
+
+    def _emit(self) -> None:
+        fut, raw = self._pending.popleft()
+        data = fut.result()
+        self._fout.write(data)
+        self.frames.append((len(data), raw))
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append((self._pool.submit(self._compress_block, block), len(block)))
+        self._blocks += 1
+        while len(self._pending) > 2 * self._threads:
+            self._emit()
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        while len(self._buf) >= self._block_size:
+            self._submit(bytes(self._buf[: self._block_size]))
+            del self._buf[: self._block_size]
+        return len(data)
+
+    def close(self) -> None:
+        try:
+            if self._buf or not self._blocks:
+                self._submit(bytes(self._buf))
+                self._buf = bytearray()
+            while self._pending:
+                self._emit()
+            if self._trailer is not None:
+                self._fout.write(self._trailer(self.frames))
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._fout.close()
+
+
+class _WriteBehind:
+    """Write-only file object that hands writes to a background thread.
+
+    The compressor keeps going while the previous output is still on its
+    way to disk; at most ``depth`` writes are queued. A write error is
+    raised from the next ``write()``, ``flush()`` or ``close()``.
+    """
+
+    def __init__(self, fout: BinaryIO, depth: int) -> None:
+        self._fout = fout
+        self.name = getattr(fout, "name", None)
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=depth)
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    return
+                if self._error is None:
+                    self._fout.write(data)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self._check()
+        data = bytes(data)  # callers may reuse their buffer once we return
+        self._queue.put(data)
+        return len(data)
+
+    def flush(self) -> None:
+        self._queue.join()
+        self._check()
+        self._fout.flush()
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        try:
+            self._check()
+        finally:
+            self._fout.close()
+
+
+class _Layered:
+    """A codec file object over ``base``; closing it closes both."""
+
+    def __init__(self, codec: BinaryIO, base: BinaryIO) -> None:
+        self._codec = codec
+        self._base = base
+
+    def write(self, data: bytes) -> int:
+        return self._codec.write(data)
+
+    def close(self) -> None:
+        try:
+            self._codec.close()
+        finally:
+            self._base.close()
+
+
+def open_output(dst: Path) -> BinaryIO:
+    """Open ``dst`` for writing, behind a writer thread unless ``WRITE_BEHIND_DEPTH`` is 0."""
+    fout = open(dst, "wb")
+    return _WriteBehind(fout, WRITE_BEHIND_DEPTH) if WRITE_BEHIND_DEPTH > 0 else fout  # type: ignore[return-value]
+
+
+def zstd_seek_table(frames: List[Tuple[int, int]]) -> bytes:
+    """Seek table in the zstd seekable format, stored as a trailing skippable frame.
+
+    Entries are (compressed size, decompressed size) pairs without per-frame
+    checksums, followed by the frame count, a descriptor byte and the
+    seekable magic. Regular zstd decoders skip the whole frame.
+    """
+    body = b"".join(struct.pack("<II", c, d) for c, d in frames)
+    body += struct.pack("<IBI", len(frames), 0, ZSTD_SEEKABLE_MAGIC)
+    return struct.pack("<II", ZSTD_SKIPPABLE_MAGIC, len(body)) + body
+
+
+def zstd_params(level: int, size: int, window_log: int = 0, threads: int = 0) -> "zstd.ZstdCompressionParameters":
+    """Parameters for ``level`` on a ``size``-byte input, with the window capped at ``window_log`` if set.
+
+    The hash and chain tables are shrunk with the window, since they are
+    what a capped window would otherwise leave oversized.
+    """
+    base = zstd.ZstdCompressionParameters.from_level(level, source_size=size)
+    if not window_log or window_log >= base.window_log:
+        window_log = base.window_log
+    return zstd.ZstdCompressionParameters(
+        window_log=window_log,
+        chain_log=min(base.chain_log, window_log + 1),
+        hash_log=min(base.hash_log, window_log),
+        search_log=base.search_log,
+        min_match=base.min_match,
+        target_length=base.target_length,
+        strategy=base.strategy,
+        threads=threads,
+    )
+
+
+def _zstd_frame_compressor(
+    level: int, dict_data: Optional["zstd.ZstdCompressionDict"], params: Optional["zstd.ZstdCompressionParameters"] = None
+) -> Callable[[bytes], bytes]:
+    # ZstdCompressor is not thread-safe, so each pool thread keeps its own.
+    local = threading.local()
+
+    def compress(block: bytes) -> bytes:
+        cctx = getattr(local, "cctx", None)
+        if cctx is None:
+            if params is not None:
+                cctx = local.cctx = zstd.ZstdCompressor(compression_params=params, dict_data=dict_data)
+            else:
+                cctx = local.cctx = zstd.ZstdCompressor(level=level, dict_data=dict_data)
+        return cctx.compress(block)
+
+    return compress
+
+
+def open_codec_writer(algo: str, dst: Path, config: AlgoConfig, src: Path, size: Optional[int] = None) -> BinaryIO:
+    """Open an incremental compressor for ``algo`` writing the contents of ``src`` to ``dst``.
+
+    The returned object accepts ``write(chunk)`` calls and finalizes the
+    output on ``close()``. Only codecs in ``STREAMING_ALGOS`` are supported.
+    ``size`` overrides the input size used for thread and dictionary
+    decisions when ``src`` is not a real file (e.g. a solid tar stream).
+    Except for zip, the file is written through ``open_output``.
+    """
+    exact = size is None  # only a real file's size can be pledged to zstd
+    if size is None:
+        size = src.stat().st_size
+    threads = config.threads_for(size)
+    if algo == "zip":
+        return _ZipMemberWriter(dst, src, config.zip_level)  # type: ignore[return-value]
+    if algo == "gzip":
+        if threads > 1:
+            level = config.gzip_level
+            return _BlockParallelWriter(  # type: ignore[return-value]
+                open_output(dst), lambda b: gzip.compress(b, compresslevel=level, mtime=0), config.block_size, threads
+            )
+        fout = open_output(dst)
+        # The header records the source name, not the temp file being written.
+        return _Layered(gzip.GzipFile(src.name, "wb", config.gzip_level, fout), fout)  # type: ignore[return-value]
+    if algo == "xz":
+        xz_level = config.xz_preset | (lzma.PRESET_EXTREME if config.xz_extreme else 0)
+        if config.frame_size > 0:
+            # One xz stream per frame; SeekableReader finds them through each stream's index.
+            return _BlockParallelWriter(  # type: ignore[return-value]
+                open_output(dst), lambda b: lzma.compress(b, preset=xz_level), config.frame_size, threads
+            )
+        if threads > 1:
+            return _BlockParallelWriter(  # type: ignore[return-value]
+                open_output(dst), lambda b: lzma.compress(b, preset=xz_level), config.block_size, threads
+            )
+        fout = open_output(dst)
+        return _Layered(lzma.LZMAFile(fout, "wb", preset=xz_level), fout)  # type: ignore[return-value]
+    if algo == "zstd":
+        if not has_zstd():
+            raise RuntimeError("zstandard module not available")
+        if config.frame_size > 0:
+            params = zstd_params(config.zstd_level, config.frame_size, config.zstd_window_log) if config.zstd_window_log else None
+            compress = _zstd_frame_compressor(config.zstd_level, zstd_dict_for(config, src, size), params)
+            return _BlockParallelWriter(  # type: ignore[return-value]
+                open_output(dst), compress, config.frame_size, threads, trailer=zstd_seek_table
+            )
+        # zstd splits the input into jobs on its own worker threads when threads > 1.
+        if config.zstd_window_log:
+            cctx = zstd.ZstdCompressor(
+                compression_params=zstd_params(
+                    config.zstd_level, size, config.zstd_window_log, threads if threads > 1 else 0
+                ),
+                dict_data=zstd_dict_for(config, src, size),
+            )
+        else:
+            cctx = zstd.ZstdCompressor(
+                level=config.zstd_level,
+                dict_data=zstd_dict_for(config, src, size),
+                threads=threads if threads > 1 else 0,
+            )
+        # A pledged size lets zstd size its tables for small inputs instead of the level's maximum.
+        return cctx.stream_writer(open_output(dst), size=size if exact else -1, write_size=CHUNK_SIZE, closefd=True)
+    raise ValueError(f"{algo} cannot be streamed")
+
+
+def _xz_multibyte(buf: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _xz_streams(f: BinaryIO, end: int) -> List[Tuple[int, int, int]]:
+    """``(offset, length, uncompressed)`` of each concatenated xz stream, found from the end backwards."""
+    streams: List[Tuple[int, int, int]] = []
+    pos = end
+    while pos > 0:
+        f.seek(pos - 4)
+        if f.read(4) == b"\0\0\0\0":
+            pos -= 4  # stream padding
+            continue
+        f.seek(pos - 12)
+        footer = f.read(12)
+        if footer[10:] != b"YZ":
+            raise ValueError("not an xz file (bad stream footer)")
+        index_size = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+        f.seek(pos - 12 - index_size)
+        index = f.read(index_size)
+        count, i = _xz_multibyte(index, 1)
+        blocks = uncompressed = 0
+        for _ in range(count):
+            unpadded, i = _xz_multibyte(index, i)
+            size, i = _xz_multibyte(index, i)
+            blocks += -(-unpadded // 4) * 4
+            uncompressed += size
+        start = pos - 12 - index_size - blocks - 12
+        streams.append((start, pos - start, uncompressed))
+        pos = start
+    streams.reverse()
+    return streams
+
+
+class SeekableReader:
+    """Random access into seekable zstd (trailing seek table) or concatenated-stream xz output.
+
+    ``read(offset, length)`` decompresses only the frames overlapping the
+    range. The most recently used frame is kept, so nearby small reads don't
+    decompress it again. An xz file written as a single stream is one big
+    frame, which still works but gives no speedup.
+    """
+
+    def __init__(self, path: Path, dict_data: Optional["zstd.ZstdCompressionDict"] = None) -> None:
+        self._f = open(path, "rb")
+        self._dict_data = dict_data
+        self._cached: Tuple[int, bytes] = (-1, b"")
+        end = self._f.seek(0, os.SEEK_END)
+        self._f.seek(0)
+        magic = self._f.read(6)
+        # (compressed offset, compressed length, uncompressed offset, uncompressed length)
+        self.frames: List[Tuple[int, int, int, int]] = []
+        if magic.startswith(XZ_MAGIC):
+            self.format = "xz"
+            layout = _xz_streams(self._f, end)
+        elif len(magic) >= 4 and struct.unpack("<I", magic[:4])[0] == ZSTD_MAGIC:
+            self.format = "zstd"
+            layout = self._zstd_frames(end)
+        else:
+            raise ValueError(f"{path} is neither zstd nor xz")
+        uncompressed = 0
+        for offset, length, size in layout:
+            self.frames.append((offset, length, uncompressed, size))
+            uncompressed += size
+        self.size = uncompressed
+        self._starts = [frame[2] for frame in self.frames]
+
+    def _zstd_frames(self, end: int) -> List[Tuple[int, int, int]]:
+        self._f.seek(end - 9)
+        count, descriptor, magic = struct.unpack("<IBI", self._f.read(9))
+        if magic != ZSTD_SEEKABLE_MAGIC:
+            raise ValueError("zstd file has no seek table (write it with frame_size > 0)")
+        entry = 12 if descriptor & 0x80 else 8
+        self._f.seek(end - 9 - count * entry)
+        table = self._f.read(count * entry)
+        frames: List[Tuple[int, int, int]] = []
+        offset = 0
+        for i in range(count):
+            comp, size = struct.unpack_from("<II", table, i * entry)
+            frames.append((offset, comp, size))
+            offset += comp
+        return frames
+
+    def _frame(self, index: int) -> bytes:
+        if self._cached[0] == index:
+            return self._cached[1]
+        offset, length, _, size = self.frames[index]
+        self._f.seek(offset)
+        raw = self._f.read(length)
+        if self.format == "xz":
+            data = lzma.LZMADecompressor(format=lzma.FORMAT_XZ).decompress(raw)
+        else:
+            data = zstd.ZstdDecompressor(dict_data=self._dict_data).decompress(raw, max_output_size=size)
+        self._cached = (index, data)
+        return data
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Up to ``length`` uncompressed bytes starting at ``offset``."""
+        end = min(offset + length, self.size)
+        out = bytearray()
+        index = bisect.bisect_right(self._starts, offset) - 1
+        while offset < end and 0 <= index < len(self.frames):
+            start = self.frames[index][2]
+            data = self._frame(index)
+            chunk = data[offset - start : end - start]
+            out += chunk
+            offset += len(chunk)
+            index += 1
+        return bytes(out)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "SeekableReader":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _drain_into(
+    sink: BinaryIO,
+    chunks: "queue.Queue[Optional[bytes]]",
+    errors: Dict[str, str],
+    name: str,
+    stats: Optional[Dict[str, Dict[str, float]]] = None,
+) -> None:
+    start, cpu = time.perf_counter(), thread_cpu()
+    consumed = 0
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        if name in errors:
+            continue  # keep draining so the reader never blocks on a dead sink
+        try:
+            sink.write(chunk)
+            consumed += len(chunk)
+        except Exception as e:
+            errors[name] = str(e)
+    try:
+        sink.close()
+    except Exception as e:
+        errors.setdefault(name, str(e))
+    if stats is not None:
+        # Output size is filled in by the caller once the file is in place.
+        stats[name] = timing_cell(start, cpu, consumed, 0)
+
+
+class _Tee:
+    """Feeds every ``write()`` to several sinks, each on its own thread behind a bounded queue."""
+
+    def __init__(
+        self,
+        sinks: Dict[str, BinaryIO],
+        queue_depth: int = FANOUT_QUEUE_DEPTH,
+        stats: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> None:
+        self.errors: Dict[str, str] = {}
+        self.bytes_written = 0
+        self._queues: Dict[str, "queue.Queue[Optional[bytes]]"] = {
+            name: queue.Queue(maxsize=queue_depth) for name in sinks
+        }
+        self._threads = [
+            threading.Thread(target=_drain_into, args=(sinks[name], q, self.errors, name, stats), daemon=True)
+            for name, q in self._queues.items()
+        ]
+        for t in self._threads:
+            t.start()
+
+    def write(self, chunk: bytes) -> int:
+        chunk = bytes(chunk)  # callers may reuse their buffer once we return
+        self.bytes_written += len(chunk)
+        for q in self._queues.values():
+            q.put(chunk)
+        return len(chunk)
+
+    def fail(self, error: str) -> None:
+        for name in self._queues:
+            self.errors.setdefault(name, error)
+
+    def close(self) -> Dict[str, str]:
+        """Close every sink and return a ``{name: error}`` map for those that failed."""
+        for q in self._queues.values():
+            q.put(None)
+        for t in self._threads:
+            t.join()
+        return self.errors
+
+
+def read_ahead(fin: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield ``fin`` in ``chunk_size`` pieces while the OS prefetches the next ``READAHEAD_SIZE`` bytes.
+
+    The hints (``posix_fadvise`` sequential + will-need) let the kernel read
+    the next window while the current one is being compressed. Where they
+    are unavailable this is a plain read loop.
+    """
+    fadvise = getattr(os, "posix_fadvise", None)
+    fd: Optional[int] = None
+    if fadvise is not None and READAHEAD_SIZE > 0:
+        try:
+            fd = fin.fileno()
+            fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError, ValueError):
+            fd = None
+    pos = hinted = 0
+    while True:
+        if fd is not None and hinted - pos <= READAHEAD_SIZE // 2:
+            try:
+                fadvise(fd, hinted, READAHEAD_SIZE, os.POSIX_FADV_WILLNEED)  # type: ignore[misc]
+                hinted += READAHEAD_SIZE
+            except OSError:
+                fd = None
+        chunk = fin.read(chunk_size)
+        if not chunk:
+            return
+        pos += len(chunk)
+        yield chunk
+
+
+def fan_out(
+    src: Path,
+    sinks: Dict[str, BinaryIO],
+    queue_depth: int = FANOUT_QUEUE_DEPTH,
+    stats: Optional[Dict[str, Dict[str, float]]] = None,
+    digest: Optional[Any] = None,
+) -> Tuple[int, Dict[str, str]]:
+    """Read ``src`` once and feed every chunk to all ``sinks`` concurrently.
+
+    Each sink runs on its own thread behind a bounded queue, so at most about
+    ``queue_depth + 2`` chunks are alive at once regardless of file size. The
+    stdlib and zstandard compressors release the GIL while compressing.
+    Sinks are closed when the input is exhausted. Returns the number of bytes
+    read and a ``{name: error}`` map for sinks that failed. If ``stats`` is
+    given, each sink's wall and thread CPU time land in it (see timing_cell);
+    block-parallel writers' pool threads are not included in the CPU time.
+    ``digest`` (a hashlib object) is fed the source on the same read.
+    """
+    tee = _Tee(sinks, queue_depth, stats)
+    try:
+        with open(src, "rb") as fin:
+            for chunk in read_ahead(fin):
+                tee.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+    except Exception as e:
+        tee.fail(str(e))
+    finally:
+        errors = tee.close()
+    return tee.bytes_written, errors
+
+
+def new_digest() -> Any:
+    """Hash used to compare sources with decompressed outputs."""
+    return hashlib.blake2b(digest_size=32)
+
+
+def file_digest(path: Path) -> str:
+    h = new_digest()
+    with open(path, "rb") as f:
+        for chunk in read_ahead(f):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def open_decompressed(
+    algo: str, path: Path, dict_data: Optional["zstd.ZstdCompressionDict"] = None
+) -> Iterator[BinaryIO]:
+    """Readable stream of the content of one ``algo`` output (a single-member archive for zip/7z)."""
+    if algo == "gzip":
+        with gzip.open(path, "rb") as f:
+            yield f  # type: ignore[misc]
+    elif algo == "xz":
+        with lzma.open(path, "rb") as f:
+            yield f  # type: ignore[misc]
+    elif algo == "zstd":
+        dctx = zstd.ZstdDecompressor(dict_data=dict_data)
+        # read_across_frames covers seekable output (many frames plus a skippable seek table).
+        with dctx.stream_reader(open(path, "rb"), read_across_frames=True, closefd=True) as f:
+            yield f
+    elif algo == "zip":
+        with zipfile.ZipFile(path) as zf, zf.open(zf.namelist()[0]) as f:
+            yield f  # type: ignore[misc]
+    elif algo == "store":
+        with open(path, "rb") as f:
+            yield f
+    elif algo == "7z" and find_7z():
+        proc = subprocess.Popen([find_7z(), "e", "-so", str(path)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            yield proc.stdout  # type: ignore[misc]
+        finally:
+            proc.stdout.close()  # type: ignore[union-attr]
+            if proc.wait() != 0:
+                raise RuntimeError(f"7z could not extract {path}")
+    else:
+        raise ValueError(f"cannot stream {algo} output")
+
+
+def _py7zr_digests(path: Path) -> Dict[str, Tuple[str, int]]:
+    """Digest and size of every member of a 7z archive, hashed as py7zr extracts it."""
+
+    class HashWriter(py7zr.io.Py7zIO):
+        def __init__(self) -> None:
+            self.hash = new_digest()
+            self.length = 0
+
+        def write(self, data: bytes) -> int:  # type: ignore[override]
+            self.hash.update(data)
+            self.length += len(data)
+            return len(data)
+
+        def read(self, length: Optional[int] = None) -> bytes:  # type: ignore[override]
+            return b""
+
+        def seek(self, offset: int, whence: int = 0) -> int:  # type: ignore[override]
+            return 0
+
+        def flush(self) -> None:
+            pass
+
+        def size(self) -> int:
+            return self.length
+
+    class Factory(py7zr.io.WriterFactory):
+        def __init__(self) -> None:
+            self.products: Dict[str, HashWriter] = {}
+
+        def create(self, filename: str) -> HashWriter:  # type: ignore[override]
+            self.products[filename] = HashWriter()
+            return self.products[filename]
+
+    factory = Factory()
+    with py7zr.SevenZipFile(path, "r") as archive:
+        archive.extractall(factory=factory)
+    return {name.replace("\\", "/"): (w.hash.hexdigest(), w.length) for name, w in factory.products.items()}
+
+
+def decompressed_digest(
+    algo: str, path: Path, dict_data: Optional["zstd.ZstdCompressionDict"] = None
+) -> Tuple[str, int]:
+    """(digest, size) of the decompressed content of ``path``, read in fixed-size chunks."""
+    if algo == "7z" and not find_7z():
+        digest, size = next(iter(_py7zr_digests(path).values()))
+        return digest, size
+    h = new_digest()
+    size = 0
+    with open_decompressed(algo, path, dict_data) as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def verify_output(
+    algo: str, path: Path, expected: str, orig_size: int, dict_data: Optional["zstd.ZstdCompressionDict"] = None
+) -> Dict[str, object]:
+    """Decompress ``path`` and compare it with the source's digest; returns cells for the report."""
+    start = time.perf_counter()
+    try:
+        digest, size = decompressed_digest(algo, path, dict_data)
+    except Exception as e:
+        return {"verified": False, "verify_error": str(e)}
+    seconds = time.perf_counter() - start
+    return {
+        "verified": digest == expected and size == orig_size,
+        "decompress_seconds": round(seconds, 6),
+        "decompress_mbps": round(size / seconds / 1e6, 3) if seconds > 0 else 0.0,
+    }
+
+
+def verify_7z_batch(archive: Path, expected: Dict[str, Tuple[str, int]]) -> Dict[str, Dict[str, object]]:
+    """Verify the members of a batch archive against ``{relpath: (digest, size)}``.
+
+    With the 7z binary, one ``7z x -so`` streams every member back to back
+    and the stream is cut at the sizes from ``7z l -slt``, so memory stays
+    constant. Decompress speed is the whole archive's, shared by its members.
+    """
+    start = time.perf_counter()
+    actual: Dict[str, Tuple[str, int]] = {}
+    try:
+        sevenzip = find_7z()
+        if not sevenzip:
+            actual = _py7zr_digests(archive)
+        else:
+            listing = subprocess.run([sevenzip, "l", "-slt", str(archive)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            sizes = _parse_7z_listing(listing.stdout.decode("utf-8", errors="replace"), field="Size")
+            proc = subprocess.Popen([sevenzip, "x", "-so", str(archive)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                for name, size in sizes.items():
+                    h = new_digest()
+                    left = size
+                    while left:
+                        chunk = proc.stdout.read(min(CHUNK_SIZE, left))  # type: ignore[union-attr]
+                        if not chunk:
+                            break
+                        h.update(chunk)
+                        left -= len(chunk)
+                    actual[name] = (h.hexdigest(), size - left)
+            finally:
+                proc.stdout.close()  # type: ignore[union-attr]
+                proc.wait()
+    except Exception as e:
+        return {name: {"verified": False, "verify_error": str(e)} for name in expected}
+    seconds = time.perf_counter() - start
+    total = sum(size for _, size in actual.values())
+    mbps = round(total / seconds / 1e6, 3) if seconds > 0 else 0.0
+    return {
+        name: {"verified": actual.get(name) == want, "decompress_mbps": mbps} for name, want in expected.items()
+    }
+
+
+def ext_group(path: Path) -> str:
+    """``compressible``, ``compressed`` or ``other``, using the repack_by_type.js extension sets."""
+    ext = path.suffix.lower()
+    if ext in COMPRESSIBLE_EXT:
+        return "compressible"
+    if ext in ALREADY_COMPRESSED_EXT:
+        return "compressed"
+    return "other"
+
+
+def solid_order(files: Iterable[Path], root: Path) -> List[Path]:
+    """Order files so similar ones sit next to each other in a solid stream.
+
+    Sorting by extension, then directory, then name keeps same-typed
+    neighbours (e.g. adjacent raster tiles) within the compressor window.
+    """
+    return sorted(files, key=lambda f: (f.suffix.lower(), f.parent.relative_to(root).as_posix(), f.name))
+
+
+def pack_solid(
+    files: List[Path], root: Path, out_dir: Path, group: str, algos: List[str], config: AlgoConfig
+) -> Dict[str, object]:
+    """Stream ``files`` as one tar into a solid ``<group>.tar.<algo>`` per codec in ``out_dir``.
+
+    The tar is generated once and fanned out to every codec. Already
+    compressed groups are stored as a plain ``<group>.tar`` instead. Streams
+    are always seekable, in frames of ``config.frame_size`` or else
+    SOLID_FRAME_SIZE. A ``<group>.index.json`` sidecar maps each member to
+    its data offset and size inside the uncompressed tar and, per codec, to
+    the frames and compressed byte range holding it, so one member can be
+    read without unpacking the rest (see read_solid_member). Returns sizes
+    and throughput for the report.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    config = replace(config, frame_size=config.frame_size or SOLID_FRAME_SIZE)
+    algos = [] if group == "compressed" else list(algos)
+    names = {a: f"{group}.tar.{a}" for a in algos} or {"tar": f"{group}.tar"}
+    total = sum(f.stat().st_size for f in files)
+    sinks: Dict[str, BinaryIO] = {
+        a: open_codec_writer(a, out_dir / f"{name}.tmp", config, Path(name), size=total) if a != "tar"
+        else open(out_dir / f"{name}.tmp", "wb")
+        for a, name in names.items()
+    }
+    members: List[Dict[str, object]] = []
+    start = time.perf_counter()
+    tee = _Tee(sinks)
+    try:
+        with tarfile.open(fileobj=tee, mode="w|", format=tarfile.PAX_FORMAT, bufsize=CHUNK_SIZE) as tar:  # type: ignore[call-overload]
+            for f in files:
+                arcname = f.relative_to(root).as_posix()
+                info = tar.gettarinfo(str(f), arcname)
+                with open(f, "rb") as fin:
+                    tar.addfile(info, fin)
+                padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                members.append(
+                    {"path": arcname, "offset": tar.offset - padded, "size": info.size, "mtime": int(info.mtime)}
+                )
+    except Exception as e:
+        tee.fail(str(e))
+    finally:
+        errors = tee.close()
+    seconds = time.perf_counter() - start
+
+    result: Dict[str, object] = {"files": len(files), "orig": total, "seconds": seconds, "algos": {}}
+    for a, name in names.items():
+        tmp = out_dir / f"{name}.tmp"
+        if a in errors:
+            tmp.unlink(missing_ok=True)
+            result["algos"][a] = {"error": errors[a]}  # type: ignore[index]
+            continue
+        os.replace(tmp, out_dir / name)
+        size = (out_dir / name).stat().st_size
+        result["algos"][a] = {"archive": name, "size": size, "ratio": size / total if total else 1.0}  # type: ignore[index]
+        frames = getattr(sinks[a], "frames", None)  # (compressed, uncompressed) per frame
+        if frames:
+            starts = [0, *itertools.accumulate(comp for comp, _ in frames)]
+            for member in members:
+                offset, length = int(member["offset"]), max(1, int(member["size"]))  # type: ignore[call-overload]
+                first = offset // config.frame_size
+                last = min(len(frames), (offset + length - 1) // config.frame_size + 1)
+                member.setdefault("frames", {})[a] = {  # type: ignore[union-attr]
+                    "first": first,
+                    "count": last - first,
+                    "offset": starts[first],
+                    "length": starts[last] - starts[first],
+                }
+    index = {
+        "format": "tar",
+        "archives": {a: n for a, n in names.items() if a not in errors},
+        "frame_size": config.frame_size,
+        "members": members,
+    }
+    with open(out_dir / f"{group}.index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    result["index"] = f"{group}.index.json"
+    result["mbps"] = total / seconds / 1e6 if seconds > 0 else 0.0
+    return result
+
+
+def read_solid_member(solid_dir: Path, group: str, member: str, algo: str) -> bytes:
+    """Content of ``member`` (its ``/``-separated path) from ``group``'s solid ``algo`` stream.
+
+    Only the frames holding the member are decompressed (see SeekableReader).
+    """
+    index = json.loads((solid_dir / f"{group}.index.json").read_text(encoding="utf-8"))
+    entry = next((m for m in index["members"] if m["path"] == member), None)
+    if entry is None:
+        raise KeyError(f"{member} is not in the {group} solid stream")
+    path = solid_dir / index["archives"][algo]
+    if algo == "tar":
+        with open(path, "rb") as f:
+            f.seek(entry["offset"])
+            return f.read(entry["size"])
+    with SeekableReader(path) as reader:
+        return reader.read(entry["offset"], entry["size"])
+
+
+def _from_table(table: Dict[int, float], level: int) -> float:
+    keys = sorted(table)
+    best = keys[0]
+    for k in keys:
+        if k <= level:
+            best = k
+    return table[best]
+
+
+def estimate_mbps(config: AlgoConfig, algo: str) -> float:
+    """Single-core compression throughput we expect from ``algo`` at its configured level."""
+    if algo in ("zip", "gzip"):
+        level = config.zip_level if algo == "zip" else config.gzip_level
+        return GZIP_MBPS[max(1, min(9, level)) - 1]
+    if algo == "xz":
+        return XZ_MBPS[config.xz_preset] * (XZ_EXTREME_FACTOR if config.xz_extreme else 1.0)
+    if algo == "zstd":
+        return _from_table(ZSTD_MBPS, config.zstd_level)
+    if algo == "7z":
+        return _from_table(SEVENZIP_MBPS, config.sevenzip_level)
+    return 50.0
+
+
+def estimate_memory(config: AlgoConfig, algo: str, size: int) -> int:
+    """Approximate peak bytes one compressor for ``algo`` needs on a ``size``-byte file."""
+    threads = config.threads_for(size) if algo in PARALLEL_ALGOS else 1
+    buffers = FANOUT_QUEUE_DEPTH * CHUNK_SIZE
+    if algo in ("zip", "gzip"):
+        per_thread = 1 << 20
+    elif algo == "xz":
+        per_thread = XZ_MEMORY_MIB[config.xz_preset] << 20
+    elif algo == "zstd":
+        if has_zstd():
+            params = zstd_params(config.zstd_level, size, config.zstd_window_log)
+            per_thread = params.estimated_compression_context_size()
+        else:
+            per_thread = (8 if config.zstd_level <= 3 else 100 if config.zstd_level <= 19 else 700) << 20
+    elif algo == "7z":
+        per_thread = (700 if config.sevenzip_level >= 7 else 200 if config.sevenzip_level >= 5 else 64) << 20
+    else:
+        per_thread = 64 << 20
+    if threads > 1 and algo in ("gzip", "xz"):
+        buffers += 4 * threads * config.block_size  # raw + compressed blocks in flight
+    return per_thread * threads + buffers
+
+
+def fit_memory(config: AlgoConfig, algo: str, size: int, limit: int) -> AlgoConfig:
+    """Lower ``algo``'s window, then its level, until ``estimate_memory`` fits in ``limit`` bytes.
+
+    zstd keeps its level (and so its search strategy) while the window can
+    shrink down to 2^ZSTD_MIN_WINDOW_LOG; xz and 7z only have presets. The
+    result may still be over ``limit`` at the lowest setting; gzip and zip
+    need about a megabyte whatever the level.
+    """
+    if estimate_memory(config, algo, size) <= limit:
+        return config
+    if algo == "zstd" and has_zstd():
+        window = zstd_params(config.zstd_level, size, config.zstd_window_log).window_log
+        for window_log in range(window - 1, ZSTD_MIN_WINDOW_LOG - 1, -1):
+            candidate = replace(config, zstd_window_log=window_log)
+            if estimate_memory(candidate, algo, size) <= limit:
+                return candidate
+        config = replace(config, zstd_window_log=ZSTD_MIN_WINDOW_LOG)
+        for level in range(config.zstd_level - 1, 0, -1):
+            candidate = replace(config, zstd_level=level)
+            if estimate_memory(candidate, algo, size) <= limit:
+                return candidate
+        return replace(config, zstd_level=1)
+    if algo == "xz":
+        for preset in range(config.xz_preset - 1, -1, -1):
+            candidate = config_with_level(config, "xz", preset)
+            if estimate_memory(candidate, algo, size) <= limit:
+                return candidate
+        return config_with_level(config, "xz", 0)
+    if algo == "7z":
+        for level in range(config.sevenzip_level - 1, 0, -1):
+            candidate = replace(config, sevenzip_level=level)
+            if estimate_memory(candidate, algo, size) <= limit:
+                return candidate
+        return replace(config, sevenzip_level=1)
+    return config
+
+
+def physical_memory() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def config_with_level(config: AlgoConfig, algo: str, level: int) -> AlgoConfig:
+    """Copy of ``config`` with ``algo`` set to ``level`` (xz keeps --extreme only at preset 9)."""
+    if algo == "zip":
+        return replace(config, zip_level=level)
+    if algo == "gzip":
+        return replace(config, gzip_level=level)
+    if algo == "xz":
+        return replace(config, xz_preset=level, xz_extreme=config.xz_extreme and level == 9)
+    if algo == "zstd":
+        return replace(config, zstd_level=level)
+    return config
+
+
+@dataclass
+class PolicyDecision:
+    algo: str  # codec to run, or "store" to copy the file as is
+    level: Optional[int]
+    reason: str  # "extension", "probe", "overhead" or the policy target
+    predicted: Dict[str, Dict[str, float]] = field(default_factory=dict)  # "algo:level" -> ratio, mbps
+
+    def report(self) -> Dict[str, object]:
+        choice = self.algo if self.level is None else f"{self.algo}:{self.level}"
+        return {"choice": choice, "reason": self.reason, "predicted": self.predicted}
+
+
+def choose_codec(
+    src: Path,
+    size: int,
+    algos: Iterable[str],
+    config: AlgoConfig,
+    target: str = "balanced",
+    *,
+    tradeoff: float = POLICY_TRADEOFF,
+    min_mbps: float = 0.0,
+    threshold: float = PROBE_THRESHOLD,
+) -> PolicyDecision:
+    """Pick one codec and level for ``src`` among ``algos``.
+
+    Already-compressed extensions are stored without reading the file.
+    Otherwise the probe ratio is scaled by ``RATIO_VS_ZSTD1`` for every
+    candidate, container overhead is added (it dominates tiny files), and
+    speed comes from ``estimate_mbps``. ``target`` then picks the smallest
+    output (``size``), the fastest codec (``speed``) or the lowest
+    ``ratio + tradeoff * seconds_per_MB`` (``balanced``). Candidates slower
+    than ``min_mbps`` are dropped unless nothing is left.
+    """
+    if ext_group(src) == "compressed":
+        return PolicyDecision("store", None, "extension")
+    probe = probe_file(src)
+    if probe.hopeless(threshold):
+        return PolicyDecision("store", None, "probe")
+    enabled = set(algos)
+    scored: List[Tuple[str, int, float, float]] = []
+    for algo, level in RATIO_VS_ZSTD1:
+        if algo not in enabled:
+            continue
+        overhead = FORMAT_OVERHEAD[algo] + (len(src.name) if algo in ("zip", "gzip") else 0)
+        ratio = min(1.0, probe.ratio * RATIO_VS_ZSTD1[(algo, level)]) + overhead / max(1, size)
+        scored.append((algo, level, ratio, estimate_mbps(config_with_level(config, algo, level), algo)))
+    if not scored:
+        raise ValueError("policy mode needs at least one of zip, gzip, xz, zstd")
+    predicted = {f"{a}:{lv}": {"ratio": round(r, 4), "mbps": m} for a, lv, r, m in scored}
+    if min(r for _, _, r, _ in scored) >= 1.0:
+        return PolicyDecision("store", None, "overhead", predicted)
+    fast_enough = [c for c in scored if c[3] >= min_mbps] or [max(scored, key=lambda c: c[3])]
+    if target == "size":
+        algo, level, _, _ = min(fast_enough, key=lambda c: (c[2], -c[3]))
+    elif target == "speed":
+        algo, level, _, _ = max((c for c in fast_enough if c[2] < 1.0), key=lambda c: (c[3], -c[2]))
+    else:
+        algo, level, _, _ = min(fast_enough, key=lambda c: c[2] + tradeoff / c[3])
+    return PolicyDecision(algo, level, target, predicted)
+
+
+@dataclass
+class Job:
+    """One unit of scheduled work: some or all codecs for one file."""
+
+    src: Path
+    size: int
+    algos: List[str]
+    cores: int
+    memory: int
+    seconds: float  # estimated wall time
+    tag: Any = None
+
+
+def make_job(src: Path, size: int, algos: List[str], config: AlgoConfig, tag: Any = None) -> Job:
+    threads = config.threads_for(size)
+    # Codecs run side by side in fan_out, so wall time is the slowest codec's.
+    seconds = max(
+        size / 1e6 / (estimate_mbps(config, a) * (threads if a in PARALLEL_ALGOS else 1)) for a in algos
+    )
+    return Job(
+        src=src,
+        size=size,
+        algos=list(algos),
+        cores=config.cores_for(size, algos),
+        memory=sum(estimate_memory(config, a, size) for a in algos),
+        seconds=seconds,
+        tag=tag,
+    )
+
+
+def plan_jobs(
+    entries: Iterable[Tuple[Path, int, List[str], Any]],
+    config: AlgoConfig,
+    cpu_budget: int,
+    overrides: Optional[Dict[Any, AlgoConfig]] = None,
+) -> List[Job]:
+    """Turn ``(src, size, algos, tag)`` entries into jobs ordered longest-first (LPT).
+
+    A file whose estimated wall time exceeds half the ideal makespan is split
+    into one job per codec: it gives up the shared read, but the cheap codecs
+    stop holding cores while the expensive one finishes, and the long codec
+    starts first instead of forming the tail. ``overrides`` maps a tag to
+    the config its file is compressed with, when that differs per file.
+    """
+    overrides = overrides or {}
+    jobs = [make_job(src, size, algos, overrides.get(tag, config), tag) for src, size, algos, tag in entries]
+    total = sum(j.seconds * j.cores for j in jobs)
+    ideal = total / max(1, cpu_budget)
+    planned: List[Job] = []
+    for job in jobs:
+        if len(job.algos) > 1 and job.seconds > ideal / 2:
+            planned += [make_job(job.src, job.size, [a], overrides.get(job.tag, config), job.tag) for a in job.algos]
+        else:
+            planned.append(job)
+    planned.sort(key=lambda j: j.seconds, reverse=True)
+    return planned
+
+
+def run_budgeted(
+    ex: Executor,
+    jobs: Iterable[Job],
+    submit: Callable[[Executor, Job], Future],
+    cpu_budget: int,
+    memory_budget: Optional[int] = None,
+) -> Iterator[Tuple[Job, Future]]:
+    """Dispatch ``jobs`` in order while the cores and memory in flight fit the budgets.
+
+    When the next job does not fit, the following few (``SCHEDULE_LOOKAHEAD``)
+    are tried so smaller work can backfill free cores. A job wider than a
+    budget still runs, but alone. Yields ``(job, future)`` as jobs finish.
+    """
+    pending: Deque[Job] = deque(jobs)
+    running: Dict[Future, Job] = {}
+    cores_in_use = 0
+    memory_in_use = 0
+
+    def fits(job: Job) -> bool:
+        if not running:
+            return True
+        if cores_in_use + min(job.cores, cpu_budget) > cpu_budget:
+            return False
+        return memory_budget is None or memory_in_use + job.memory <= memory_budget
+
+    while pending or running:
+        while pending:
+            for i in range(min(len(pending), SCHEDULE_LOOKAHEAD)):
+                if fits(pending[i]):
+                    job = pending[i]
+                    del pending[i]
+                    break
+            else:
+                break
+            running[submit(ex, job)] = job
+            cores_in_use += min(job.cores, cpu_budget)
+            memory_in_use += job.memory
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for fut in done:
+            job = running.pop(fut)
+            cores_in_use -= min(job.cores, cpu_budget)
+            memory_in_use -= job.memory
+            yield job, fut
+
+
+@dataclass(frozen=True)
+class ScanEntry:
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def _list_dir(
+    path: str, skip: frozenset, ext_set: Optional[set], min_size: int
+) -> Tuple[List[ScanEntry], List[str]]:
+    files: List[ScanEntry] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path not in skip:
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    if ext_set is not None and os.path.splitext(entry.name)[1].lower() not in ext_set:
+                        continue
+                    st = entry.stat()  # cached by the listing on Windows, one stat() elsewhere
+                except OSError:
+                    continue  # vanished or unreadable, like os.walk
+                if st.st_size >= min_size:
+                    files.append(ScanEntry(entry.path, st.st_size, st.st_mtime_ns))
+    except OSError:
+        pass
+    return files, subdirs
+
+
+def scan_files(
+    root: Path,
+    *,
+    exclude: Iterable[Path] = (),
+    allowed_ext: Optional[Iterable[str]] = None,
+    min_size: int = 1,
+    threads: int = SCAN_THREADS,
+) -> Iterator[ScanEntry]:
+    """Yield the files under ``root`` as they are found.
+
+    Built on ``os.scandir``: each file is stat'ed once and its size and
+    mtime travel with the entry. Directories in ``exclude`` are pruned
+    without being listed. With ``threads > 1`` subdirectories are listed
+    concurrently, which hides per-directory latency on network
+    filesystems; the yield order is then not deterministic. Stopping the
+    generator early stops the scan.
+    """
+    top = os.path.abspath(root)
+    skip = frozenset(os.path.abspath(p) for p in exclude)
+    ext_set = set(e.lower() for e in allowed_ext) if allowed_ext else None
+    if top in skip:
+        return
+    if threads <= 1:
+        stack = [top]
+        while stack:
+            files, subdirs = _list_dir(stack.pop(), skip, ext_set, min_size)
+            yield from files
+            stack.extend(reversed(subdirs))
+        return
+
+    dirs: "queue.Queue[Optional[str]]" = queue.Queue()
+    out: "queue.Queue[Optional[List[ScanEntry]]]" = queue.Queue(maxsize=SCAN_QUEUE_BATCHES)
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = 1
+
+    def put(item: Optional[List[ScanEntry]]) -> None:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def worker() -> None:
+        nonlocal pending
+        while True:
+            path = dirs.get()
+            if path is None or stop.is_set():
+                return
+            files, subdirs = _list_dir(path, skip, ext_set, min_size)
+            with lock:
+                pending += len(subdirs)
+            for d in subdirs:
+                dirs.put(d)
+            if files:
+                put(files)
+            with lock:
+                pending -= 1
+                done = pending == 0
+            if done:
+                put(None)
+
+    dirs.put(top)
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    try:
+        while True:
+            batch = out.get()
+            if batch is None:
+                break
+            yield from batch
+    finally:
+        stop.set()
+        for _ in pool:
+            dirs.put(None)
+        for t in pool:
+            t.join()
+
+
+def discover_files(
+    input_dir: Path,
+    out_dir: Path,
+    allowed_ext: Optional[Iterable[str]],
+    probe_threshold: Optional[float] = None,
+) -> List[Path]:
+    """List candidate files; with ``probe_threshold`` set, drop files the probe deems hopeless."""
+    files: List[Path] = []
+    for entry in scan_files(input_dir, exclude=[out_dir], allowed_ext=allowed_ext):
+        src = Path(entry.path)
+        if probe_threshold is not None and probe_file(src).hopeless(probe_threshold):
+            continue
+        files.append(src)
+    return files
+
+
+def ensure_algo_map(config: AlgoConfig, enable: Iterable[str]) -> Dict[str, callable]:
+    algos: Dict[str, callable] = {}
+    for key in enable:
+        if key == "zip":
+            algos[key] = lambda s, d: compress_zip(s, d, level=config.zip_level)
+        elif key == "gzip":
+            algos[key] = lambda s, d: compress_gzip(s, d, level=config.gzip_level)
+        elif key == "xz":
+            algos[key] = lambda s, d: compress_xz(s, d, preset=config.xz_preset, extreme=config.xz_extreme)
+        elif key == "zstd" and has_zstd():
+            algos[key] = lambda s, d: compress_zstd(s, d, level=config.zstd_level)
+        elif key == "7z" and sevenzip_backend() == "cli":
+            algos[key] = lambda s, d: compress_7z(s, d, level=config.sevenzip_level)
+        elif key == "7z" and sevenzip_backend() == "py7zr":
+            algos[key] = lambda s, d: compress_7z_py(s, d, level=config.sevenzip_level)
+    return algos
+
+
+def output_path(out_dir: Path, algo: str, rel: str) -> Path:
+    """Where ``algo``'s output for the input at relative path ``rel`` goes: ``out_dir/<algo>/<rel>.<algo>``.
+
+    Keeping the relative path means same-named files in different
+    directories no longer overwrite each other. Stored copies keep their name.
+    """
+    path = out_dir / algo / rel
+    return path if algo == "store" else path.with_name(path.name + f".{algo}")
+
+
+def store_only(src: Path, out_dir: Path, force: bool = False, rel: Optional[str] = None) -> int:
+    """Copy ``src`` verbatim to ``out_dir/store/<rel>`` (default: its name) and return its size.
+
+    The per-codec parts of one file (see plan_jobs) may store it at the same
+    time, so each copy goes through its own temp file next to the target.
+    """
+    final_path = output_path(out_dir, "store", rel or src.name)
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    if force or not final_path.exists():
+        fd, tmp_name = tempfile.mkstemp(prefix=final_path.name + ".", suffix=".tmp", dir=final_path.parent)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, final_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    return final_path.stat().st_size
+
+
+def merge_resources(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, float]:
+    """Combine the resources of a file's per-codec parts (see plan_jobs): times add up, RSS is the max."""
+    return {
+        "seconds": a["seconds"] + b["seconds"],
+        "cpu_user": a["cpu_user"] + b["cpu_user"],
+        "cpu_sys": a["cpu_sys"] + b["cpu_sys"],
+        "peak_rss": max(a["peak_rss"], b["peak_rss"]),
+    }
+
+
+def compress_one(
+    src: Path,
+    input_dir: Path,
+    out_dir: Path,
+    algo_names: List[str],
+    config: AlgoConfig,
+    force: bool = False,
+    probe_threshold: Optional[float] = None,
+    probe_action: str = "skip",
+    verify: bool = False,
+) -> Dict:
+    """Compress ``src`` with ``algo_names`` into ``out_dir/<algo>/<relative path>`` and return its report row.
+
+    Each output is written to a ``.tmp`` file next to its final path and
+    renamed into place, so finishing it is a rename on the same filesystem
+    rather than a second copy from the system temp directory. With
+    ``verify``, every output written or reused is decompressed again and
+    compared with the source digest from the compression read.
+    """
+    orig_size = src.stat().st_size
+    rel = str(src.relative_to(input_dir))
+    result_row: Dict[str, object] = {"file": rel, "orig": orig_size}
+
+    def ratio(size: int) -> float:
+        return size / orig_size if orig_size else 1.0
+    started, usage = time.perf_counter(), process_usage()
+
+    def resources() -> Dict[str, float]:
+        user, system, rss = process_usage()
+        return {
+            "seconds": round(time.perf_counter() - started, 6),
+            "cpu_user": round(user - usage[0], 6),
+            "cpu_sys": round(system - usage[1], 6),
+            "peak_rss": rss,  # high-water mark of the process, not just this file
+        }
+
+    if probe_threshold is not None and orig_size > 0:
+        probe = probe_file(src)
+        result_row["probe"] = {"ratio": probe.ratio, "entropy": probe.entropy, "sampled": probe.sampled}
+        if probe.hopeless(probe_threshold):
+            if probe_action == "store":
+                try:
+                    size = store_only(src, out_dir, force, rel)
+                    cell: Dict[str, object] = {"size": size, "ratio": ratio(size), "stored": True}
+                except Exception as e:
+                    cell = {"error": str(e)}
+            else:
+                cell = {"skipped": "probe"}
+            for algo_name in algo_names:
+                result_row[algo_name] = dict(cell)
+            result_row["resources"] = resources()
+            return result_row
+
+    source_hash = new_digest() if verify else None
+    source_digest: Optional[str] = None
+
+    def expected() -> str:
+        nonlocal source_digest
+        if source_digest is None:
+            source_digest = file_digest(src)
+        return source_digest
+
+    if "store" in algo_names:  # a policy decision (see choose_codec)
+        try:
+            size = store_only(src, out_dir, force, rel)
+            result_row["store"] = {"size": size, "ratio": ratio(size), "stored": True}
+            if verify:
+                result_row["store"].update(verify_output("store", output_path(out_dir, "store", rel), expected(), orig_size))
+        except Exception as e:
+            result_row["store"] = {"error": str(e)}
+
+    algos = ensure_algo_map(config, [a for a in algo_names if a != "store"])
+    final_paths: Dict[str, Path] = {}
+    for algo_name in algos:
+        final_path = output_path(out_dir, algo_name, rel)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        if final_path.exists() and not force:
+            comp_size = final_path.stat().st_size
+            result_row[algo_name] = {"size": comp_size, "ratio": ratio(comp_size)}
+            if algo_name == "zstd" and config.zstd_dicts:
+                try:
+                    dictionary = zstd_output_dict(config, src, final_path)
+                except Exception as e:
+                    result_row[algo_name] = {"error": str(e)}
+                    continue
+                if dictionary is not None:
+                    result_row[algo_name]["dict_id"] = dictionary.dict_id()
+            else:
+                dictionary = None
+            if verify:
+                result_row[algo_name].update(verify_output(algo_name, final_path, expected(), orig_size, dictionary))
+        else:
+            final_paths[algo_name] = final_path
+
+    tmp_paths = {algo_name: path.with_name(path.name + ".tmp") for algo_name, path in final_paths.items()}
+    try:
+        # Streaming codecs share a single read of the source (see fan_out).
+        sinks: Dict[str, BinaryIO] = {}
+        for algo_name in [a for a in final_paths if a in STREAMING_ALGOS]:
+            try:
+                sinks[algo_name] = open_codec_writer(algo_name, tmp_paths[algo_name], config, src)
+            except Exception as e:
+                result_row[algo_name] = {"error": str(e)}
+        errors: Dict[str, str] = {}
+        stats: Dict[str, Dict[str, float]] = {}
+        if sinks:
+            _, errors = fan_out(src, sinks, stats=stats, digest=source_hash)
+            if source_hash is not None and len(errors) < len(sinks):  # a read failure fails every sink
+                source_digest = source_hash.hexdigest()
+        for algo_name, final_path in final_paths.items():
+            if algo_name in result_row:
+                continue
+            tmp_path = tmp_paths[algo_name]
+            try:
+                if algo_name in errors:
+                    raise RuntimeError(errors[algo_name])
+                if algo_name not in sinks:
+                    # Runs alone, so process CPU (including a 7z child) is this codec's.
+                    tmp_path.unlink(missing_ok=True)  # 7z would add to a leftover archive
+                    start, before = time.perf_counter(), process_usage()
+                    algos[algo_name](src, tmp_path)
+                    after = process_usage()
+                    stats[algo_name] = timing_cell(start, thread_cpu(), orig_size, 0)
+                    stats[algo_name].update(
+                        cpu_user=round(after[0] - before[0], 6), cpu_sys=round(after[1] - before[1], 6)
+                    )
+                os.replace(tmp_path, final_path)
+                comp_size = final_path.stat().st_size
+                result_row[algo_name] = {"size": comp_size, "ratio": ratio(comp_size)}
+                if algo_name in stats:
+                    result_row[algo_name].update(stats[algo_name], written=comp_size)
+                dictionary = zstd_dict_for(config, src, orig_size) if algo_name == "zstd" else None
+                if dictionary is not None:
+                    result_row[algo_name]["dict_id"] = dictionary.dict_id()
+                if verify:
+                    result_row[algo_name].update(verify_output(algo_name, final_path, expected(), orig_size, dictionary))
+            except Exception as e:
+                result_row[algo_name] = {"error": str(e)}
+    finally:
+        for tmp_path in tmp_paths.values():
+            tmp_path.unlink(missing_ok=True)  # outputs that failed midway
+    result_row["resources"] = resources()
+    return {k: result_row[k] for k in ["file", "orig", "probe", *algo_names, "resources"] if k in result_row}
+
+
+def algo_params(config: AlgoConfig, algo: str, src: Optional[Path] = None, size: int = 0) -> str:
+    """Stable description of the settings that determine ``algo``'s output.
+
+    For zstd with trained dictionaries, pass the file (``src``, ``size``):
+    the id of the dictionary it is compressed with is part of the result,
+    so a retrained dictionary does not match cache entries of the old one.
+    """
+    mt = f"/mt{config.threads}:{config.block_size}@{config.parallel_threshold}" if config.threads > 1 else ""
+    seek = f"/seek{config.frame_size}" if config.frame_size > 0 else ""
+    if algo == "zip":
+        return f"zip:{config.zip_level}"
+    if algo == "gzip":
+        return f"gzip:{config.gzip_level}{mt}"
+    if algo == "xz":
+        return f"xz:{config.xz_preset}{'e' if config.xz_extreme else ''}{mt}{seek}"
+    if algo == "zstd":
+        window = f"/w{config.zstd_window_log}" if config.zstd_window_log else ""
+        dictionary = zstd_dict_for(config, src, size) if src is not None else None
+        if dictionary is not None:
+            dict_tag = f"+dict{dictionary.dict_id()}"
+        else:
+            dict_tag = "+dict" if config.zstd_dicts else ""
+        return f"zstd:{config.zstd_level}{window}{mt}{seek}{dict_tag}"
+    if algo == "7z":
+        return f"7z:{config.sevenzip_level}"
+    return algo
+
+
+def quick_digest(src: Path) -> str:
+    """Cheap content fingerprint: BLAKE2b over the probe windows plus the size."""
+    size = src.stat().st_size
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(src, "rb") as fin:
+        for offset in _sample_offsets(size, PROBE_SAMPLES, PROBE_WINDOW):
+            fin.seek(offset)
+            h.update(fin.read(size if size <= PROBE_SAMPLES * PROBE_WINDOW else PROBE_WINDOW))
+    return h.hexdigest()
+
+
+class DuplicateIndex:
+    """Incremental byte-identical file finder.
+
+    Files are compared by size first, then ``quick_digest`` (a few sampled
+    windows), then the full ``file_digest``; a file is only hashed once its
+    size collides with an earlier one, and each digest is computed once.
+    """
+
+    def __init__(self) -> None:
+        self._by_size: Dict[int, List[Path]] = {}  # size -> representatives with distinct content
+        self._quick: Dict[Path, str] = {}
+        self._full: Dict[Path, str] = {}
+
+    def _quick_digest(self, path: Path) -> str:
+        if path not in self._quick:
+            self._quick[path] = quick_digest(path)
+        return self._quick[path]
+
+    def _file_digest(self, path: Path) -> str:
+        if path not in self._full:
+            self._full[path] = file_digest(path)
+        return self._full[path]
+
+    def add(self, path: Path, size: int) -> Optional[Path]:
+        """Register ``path`` and return the earlier file it duplicates, if any."""
+        if size == 0:
+            return None  # nothing to save
+        seen = self._by_size.setdefault(size, [])
+        try:
+            for other in seen:
+                if self._quick_digest(other) == self._quick_digest(path) and self._file_digest(
+                    other
+                ) == self._file_digest(path):
+                    return other
+        except OSError:
+            pass  # unreadable now; it will fail (and be reported) when compressed
+        seen.append(path)
+        return None
+
+
+def find_duplicates(files: Iterable[Tuple[Path, int]]) -> Dict[Path, Path]:
+    """Map every duplicate in ``(path, size)`` order to the first file with the same content."""
+    index = DuplicateIndex()
+    duplicates: Dict[Path, Path] = {}
+    for path, size in files:
+        original = index.add(path, size)
+        if original is not None:
+            duplicates[path] = original
+    return duplicates
+
+
+def link_output(src: Path, dst: Path, mode: str = "hardlink") -> str:
+    """Give ``dst`` the contents of output ``src``: a hard link if ``mode`` allows and the filesystem can, else a copy.
+
+    Returns the method used.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass  # another filesystem, or links unsupported
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def duplicate_row(original: Dict, rel: str, out_dir: Path, mode: str = "hardlink") -> Dict:
+    """Report row for a duplicate of the file in row ``original``, with its outputs linked or copied.
+
+    Cells keep sizes, ratios and verification but no timings, since nothing
+    was compressed. With ``mode="reference"`` (and for 7z batch members)
+    no output is written; the ``dedup`` field of each cell says which
+    applied. Errors and skips are carried over as they are. Stored cells
+    all share the one ``store/<rel>`` copy, which is linked once.
+    """
+    row: Dict[str, object] = {"file": rel, "orig": original["orig"], "dedup_of": original["file"]}
+    linked: Dict[str, str] = {}  # output algo -> link result, so store/<rel> is linked once
+    for key, cell in original.items():
+        if key in ("file", "orig", "resources", "dedup_of"):
+            continue
+        if key in META_KEYS or not isinstance(cell, dict):
+            row[key] = cell
+            continue
+        cell = {k: v for k, v in cell.items() if k not in TIMING_KEYS}
+        if "size" in cell:
+            if mode == "reference" or "archive" in cell:
+                cell["dedup"] = "reference"
+            else:
+                algo = "store" if cell.get("stored") else key
+                try:
+                    if algo not in linked:
+                        linked[algo] = link_output(
+                            output_path(out_dir, algo, original["file"]), output_path(out_dir, algo, rel), mode
+                        )
+                    cell["dedup"] = linked[algo]
+                except OSError as e:
+                    cell = {"error": f"dedup: {e}"}
+        row[key] = cell
+    return row
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    path: str  # relative to the input dir
+    size: int
+    mtime_ns: int
+    digest: str = ""  # quick_digest() when content hashing is enabled
+
+
+def output_present(out_dir: Path, algo: str, rel: str, cell: Dict) -> bool:
+    """Whether the output that cell ``cell`` of ``algo`` for input ``rel`` describes is on disk, at its size."""
+    if "archive" in cell:
+        member = rel.replace(os.sep, "/")
+        return archive_member_size(out_dir / "7z" / str(cell["archive"]), member) == cell["size"]
+    try:
+        return output_path(out_dir, algo, rel).stat().st_size == cell["size"]
+    except OSError:
+        return False
+
+
+def verify_cached(
+    out_dir: Path, files: List[Tuple[Path, str, int, Dict[str, Dict], AlgoConfig]], workers: int = 1
+) -> None:
+    """Check the outputs behind cached cells the way compress_one checks new ones.
+
+    ``files`` holds ``(src, rel, size, cells, config)``; each cell is
+    updated in place with the verify_output fields. Every source is
+    hashed once, and 7z batch members are read back once per archive.
+    """
+
+    def check(item: Tuple[Path, str, int, Dict[str, Dict], AlgoConfig]) -> str:
+        src, rel, size, cells, config = item
+        expected = file_digest(src)
+        for algo, cell in cells.items():
+            if "archive" in cell:
+                continue
+            path = output_path(out_dir, algo, rel)
+            try:
+                dictionary = zstd_output_dict(config, src, path) if algo == "zstd" else None
+            except Exception as e:
+                cell.update(verified=False, verify_error=str(e))
+                continue
+            cell.update(verify_output(algo, path, expected, size, dictionary))
+        return expected
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as tex:
+        digests = list(tex.map(check, files))
+    members: Dict[str, Dict[str, Tuple[str, int]]] = {}  # archive -> {member: (digest, size)}
+    archived: Dict[Tuple[str, str], Dict] = {}
+    for (_, rel, size, cells, _), digest in zip(files, digests):
+        cell = cells.get("7z") or {}
+        if "archive" in cell:
+            member = rel.replace(os.sep, "/")
+            members.setdefault(str(cell["archive"]), {})[member] = (digest, size)
+            archived[(str(cell["archive"]), member)] = cell
+    for archive, expected in members.items():
+        for member, checked in verify_7z_batch(out_dir / "7z" / archive, expected).items():
+            archived[(archive, member)].update(checked)
+
+
+class ResultCache:
+    """Persistent (file, codec) -> compressed size cache stored in SQLite.
+
+    A row is served only when size, mtime, digest and codec settings all match,
+    so modified sources and changed levels are recompressed. Rows are evicted
+    least-recently-used first once the table grows past ``max_entries``.
+    7z batch members also record their archive. Given the output directory,
+    lookup() also treats a row whose output (or archive member) is gone or
+    has another size as a miss.
+    """
+
+    def __init__(self, path: Path, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.run_stamp = time.time_ns()
+        self._db = sqlite3.connect(str(path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                path TEXT NOT NULL,
+                algo TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                params TEXT NOT NULL,
+                comp_size INTEGER NOT NULL,
+                ratio REAL NOT NULL,
+                last_used INTEGER NOT NULL,
+                archive TEXT,
+                PRIMARY KEY (path, algo)
+            )"""
+        )
+        if "archive" not in {column[1] for column in self._db.execute("PRAGMA table_info(results)")}:
+            self._db.execute("ALTER TABLE results ADD COLUMN archive TEXT")  # cache of an older version
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+        self._touched: List[Tuple[int, str, str]] = []
+
+    def lookup(self, key: CacheKey, params: Dict[str, str], out_dir: Optional[Path] = None) -> Dict[str, Dict]:
+        """Return cached result cells for the codecs in ``params`` that are still valid.
+
+        With ``out_dir``, a cell is only valid while its output is there (see output_present).
+        """
+        hits: Dict[str, Dict] = {}
+        cur = self._db.execute(
+            "SELECT algo, size, mtime_ns, digest, params, comp_size, ratio, archive FROM results WHERE path = ?",
+            (key.path,),
+        )
+        for algo, size, mtime_ns, digest, row_params, comp_size, ratio, archive in cur.fetchall():
+            if algo not in params or params[algo] != row_params:
+                continue
+            if (size, mtime_ns, digest) != (key.size, key.mtime_ns, key.digest):
+                continue
+            cell: Dict[str, object] = {"size": comp_size, "ratio": ratio, "cached": True}
+            if archive is not None:
+                cell["archive"] = archive
+            if out_dir is not None and not output_present(out_dir, algo, key.path, cell):
+                continue
+            hits[algo] = cell
+            self._touched.append((self.run_stamp, key.path, algo))
+        return hits
+
+    def store(self, key: CacheKey, params: Dict[str, str], row: Dict) -> None:
+        for algo, cell in row.items():
+            if algo not in params or not isinstance(cell, dict):
+                continue
+            if "ratio" not in cell or (cell.get("stored") and algo != "store") or cell.get("cached"):
+                continue
+            self._db.execute(
+                "INSERT OR REPLACE INTO results "
+                "(path, algo, size, mtime_ns, digest, params, comp_size, ratio, last_used, archive) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key.path,
+                    algo,
+                    key.size,
+                    key.mtime_ns,
+                    key.digest,
+                    params[algo],
+                    cell["size"],
+                    cell["ratio"],
+                    self.run_stamp,
+                    cell.get("archive"),
+                ),
+            )
+
+    def close(self) -> None:
+        if self._touched:
+            self._db.executemany("UPDATE results SET last_used = ? WHERE path = ? AND algo = ?", self._touched)
+            self._touched = []
+        (count,) = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self._db.commit()
+        self._db.close()
+
+
+META_KEYS = ("file", "orig", "probe", "policy", "resources", "dedup_of")
+# Per-cell measurements of the compression itself (see timing_cell and verify_output)
+TIMING_KEYS = frozenset(
+    ("seconds", "cpu_user", "cpu_sys", "read", "written", "mbps", "t0", "pid", "decompress_seconds", "decompress_mbps")
+)
+DEDUP_MODES = ("hardlink", "copy", "reference")
+REPORT_NDJSON = "report.ndjson"
+REPORT_FLUSH_ROWS = 256  # report rows buffered before they are flushed to disk ...
+REPORT_FLUSH_SECONDS = 5.0  # ... or after this long, whichever comes first
+
+
+class LatencyHistogram:
+    """Nearest-rank percentiles over log-spaced buckets 1% apart.
+
+    Memory depends on the spread of the values, not their number, and a
+    percentile is at most 1% above the exact one.
+    """
+
+    _STEP = math.log(1.01)
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.max = 0.0
+        self._zeros = 0
+        self._buckets: Counter = Counter()
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.max = max(self.max, value)
+        if value > 0:
+            self._buckets[math.ceil(math.log(value) / self._STEP)] += 1
+        else:
+            self._zeros += 1
 
-CHUNK_SIZE = 1024 * 1024  # 1 MiB
+    def percentile(self, pct: float) -> float:
+        """Upper edge of the bucket holding the ``pct``-th percentile (0 when empty)."""
+        rank = min(self.count, max(1, math.ceil(pct / 100 * self.count)))
+        seen = self._zeros
+        if seen >= rank:
+            return 0.0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(math.exp(bucket * self._STEP), self.max)
+        return self.max
 
 
-def human_size(num: int) -> str:
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if num < 1024:
-            return f"{num:.1f}{unit}"
-        num /= 1024
-    return f"{num:.1f}PB"
+def file_ext(name: str) -> str:
+    """Lower-case extension used to group report rows (``(none)`` without one)."""
+    return os.path.splitext(name)[1].lower() or "(none)"
 
 
-@dataclass
-class AlgoConfig:
-    gzip_level: int = 9
-    xz_preset: int = 9
-    xz_extreme: bool = True
-    zstd_level: int = 19
-    sevenzip_level: int = 9
+class ReportStats:
+    """Streaming aggregates of report rows.
 
+    Memory grows with the number of codecs and extensions seen, not with
+    the number of rows, so it can follow runs of millions of files.
+    """
 
-def compress_zip(src: Path, dst: Path, *, level: int = 9) -> None:
-    with zipfile.ZipFile(dst, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
-        zf.write(src, arcname=src.name)
+    def __init__(self) -> None:
+        self.rows = 0
+        self._codecs: Dict[str, Dict[str, float]] = {}  # files, ratio_sum, orig, size
+        self._extensions: Dict[str, Dict[str, Any]] = {}
+        self._timing: Dict[str, Dict[str, Any]] = {}
+        self._probed = 0
+        self._hopeless = 0
+        self._probe_errors: Dict[str, List[float]] = {}  # [count, sum of |actual - predicted|]
 
+    def add(self, row: Dict) -> None:
+        self.rows += 1
+        orig = int(row.get("orig") or 0)
+        ext = self._extensions.setdefault(file_ext(str(row["file"])), {"files": 0, "orig": 0, "codecs": {}})
+        ext["files"] += 1
+        ext["orig"] += orig
+        probe = row.get("probe")
+        if probe:
+            self._probed += 1
+        if any(isinstance(v, dict) and (v.get("skipped") or v.get("stored")) for v in row.values()):
+            self._hopeless += 1
+        for algo, cell in row.items():
+            if algo in META_KEYS or not isinstance(cell, dict):
+                continue
+            if "ratio" in cell:
+                codec = self._codecs.setdefault(algo, {"files": 0, "ratio_sum": 0.0, "orig": 0, "size": 0})
+                codec["files"] += 1
+                codec["ratio_sum"] += float(cell["ratio"])
+                codec["orig"] += orig
+                codec["size"] += int(cell.get("size", 0))
+                by_ext = ext["codecs"].setdefault(algo, {"files": 0, "orig": 0, "size": 0})
+                by_ext["files"] += 1
+                by_ext["orig"] += orig
+                by_ext["size"] += int(cell.get("size", 0))
+                if probe and not cell.get("stored"):
+                    error = self._probe_errors.setdefault(algo, [0, 0.0])
+                    error[0] += 1
+                    error[1] += abs(float(cell["ratio"]) - float(probe["ratio"]))
+            if "seconds" in cell:
+                t = self._timing.setdefault(
+                    algo,
+                    {
+                        "latency": LatencyHistogram(),
+                        "wall": 0.0,
+                        "cpu": 0.0,
+                        "read": 0,
+                        "written": 0,
+                        "checked": 0,
+                        "verified": 0,
+                        "dec_seconds": 0.0,
+                        "dec_read": 0,
+                    },
+                )
+                t["latency"].add(float(cell["seconds"]))
+                t["wall"] += cell["seconds"]
+                t["cpu"] += cell["cpu_user"] + cell["cpu_sys"]
+                t["read"] += cell["read"]
+                t["written"] += cell["written"]
+                if "verified" in cell:
+                    t["checked"] += 1
+                    t["verified"] += 1 if cell["verified"] else 0
+                    if "decompress_seconds" in cell:
+                        t["dec_seconds"] += cell["decompress_seconds"]
+                        t["dec_read"] += cell["read"]
 
-def compress_gzip(src: Path, dst: Path, *, level: int = 9) -> None:
-    with open(src, "rb") as fin, gzip.open(dst, "wb", compresslevel=level) as fout:
-        shutil.copyfileobj(fin, fout, length=CHUNK_SIZE)
+    def averages(self) -> Dict[str, float]:
+        """Mean of the per-file ratios, per codec (every file counts the same)."""
+        return {algo: c["ratio_sum"] / c["files"] for algo, c in self._codecs.items() if c["files"]}
 
+    def byte_weighted(self) -> Dict[str, float]:
+        """Total output over total input, per codec (large files count more)."""
+        return {algo: c["size"] / c["orig"] if c["orig"] else 1.0 for algo, c in self._codecs.items()}
 
-def compress_xz(src: Path, dst: Path, *, preset: int = 9, extreme: bool = True) -> None:
-    xz_level = preset | (lzma.PRESET_EXTREME if extreme else 0)
-    with open(src, "rb") as fin, lzma.open(dst, "wb", preset=xz_level) as fout:
-        shutil.copyfileobj(fin, fout, length=CHUNK_SIZE)
+    def by_extension(self) -> Dict[str, Dict[str, Any]]:
+        """Files, input bytes and byte-weighted ratio per codec, for each extension."""
+        return {
+            ext: {
+                "files": e["files"],
+                "orig": e["orig"],
+                "codecs": {
+                    algo: {**c, "ratio": c["size"] / c["orig"] if c["orig"] else 1.0}
+                    for algo, c in sorted(e["codecs"].items())
+                },
+            }
+            for ext, e in sorted(self._extensions.items())
+        }
 
+    def timing(self) -> Dict[str, Dict[str, float]]:
+        """Per-codec latency percentiles, CPU-seconds and throughput over the measured (non-cached) cells."""
+        summary: Dict[str, Dict[str, float]] = {}
+        for algo, t in self._timing.items():
+            latency: LatencyHistogram = t["latency"]
+            wall = t["wall"]
+            summary[algo] = {
+                "files": latency.count,
+                "p50_s": latency.percentile(50),
+                "p95_s": latency.percentile(95),
+                "wall_seconds": wall,
+                "cpu_seconds": t["cpu"],
+                "read": t["read"],
+                "written": t["written"],
+                "mbps": t["read"] / wall / 1e6 if wall > 0 else 0.0,
+            }
+            if t["checked"]:
+                summary[algo]["verified"] = t["verified"]
+                summary[algo]["verify_failed"] = t["checked"] - t["verified"]
+                if t["dec_seconds"] > 0:
+                    summary[algo]["decompress_mbps"] = t["dec_read"] / t["dec_seconds"] / 1e6
+        return summary
 
-def compress_zstd(src: Path, dst: Path, *, level: int = 19) -> None:
-    if not HAS_ZSTD:
-        raise RuntimeError("zstandard module not available")
-    cctx = zstd.ZstdCompressor(level=level)
-    with open(src, "rb") as fin, open(dst, "wb") as fout:
-        cctx.copy_stream(fin, fout, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+    def summary(self) -> Dict[str, object]:
+        result: Dict[str, object] = {
+            "rows": self.rows,
+            "averages": self.averages(),
+            "byte_weighted": self.byte_weighted(),
+            "by_extension": self.by_extension(),
+            "timing": self.timing(),
+        }
+        if self._probed:
+            result["probe"] = {
+                "probed": self._probed,
+                "hopeless": self._hopeless,
+                # Mean |actual - predicted| per codec, over files that were actually compressed.
+                "mean_abs_error": {algo: e[1] / e[0] for algo, e in self._probe_errors.items()},
+            }
+        return result
 
 
-def find_7z() -> Optional[str]:
-    candidates = [which("7z"), which("7z.exe")]
-    # Common Windows install path
-    candidates.append(str(Path(os.environ.get("ProgramFiles", "C:/Program Files")) / "7-Zip" / "7z.exe"))
-    for c in candidates:
-        if c and Path(c).exists():
-            return c
-    return None
+def write_trace(events: List[Dict[str, object]], path: Path) -> None:
+    """Write (file, codec) spans as a Chrome trace: one process per worker, one lane per codec."""
+    base = min((float(e["t0"]) for e in events), default=0.0)
+    lanes: Dict[str, int] = {}
+    trace: List[Dict[str, object]] = []
+    for pid in sorted({e["pid"] for e in events}):  # type: ignore[type-var]
+        trace.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {pid}"}})
+    for e in events:
+        tid = lanes.setdefault(str(e["name"]), len(lanes) + 1)
+        trace.append(
+            {
+                "name": f"{e['name']} {e['file']}",
+                "cat": e["name"],
+                "ph": "X",
+                "ts": (float(e["t0"]) - base) * 1e6,
+                "dur": float(e["seconds"]) * 1e6,
+                "pid": e["pid"],
+                "tid": tid,
+                "args": {k: e[k] for k in ("file", "read", "written", "mbps", "cpu_user", "cpu_sys") if k in e},
+            }
+        )
+    for pid in sorted({e["pid"] for e in events}):  # type: ignore[type-var]
+        for name, tid in lanes.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}))
 
 
-def compress_7z(src: Path, dst: Path, *, level: int = 9) -> None:
-    sevenzip = find_7z()
-    if not sevenzip:
-        raise RuntimeError("7z executable not found. Install 7‑Zip and ensure 7z.exe is on PATH.")
-    cmd = [sevenzip, "a", "-t7z", f"-mx={level}", str(dst), str(src)]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.returncode != 0:
-        raise RuntimeError(f"7z failed: {result.stderr.decode(errors='ignore')}")
+class ReportWriter:
+    """Writes report rows to ``out_dir`` as they complete, instead of holding them for the end.
 
+    Each row is appended to ``report.ndjson`` (the full row as JSON) and
+    ``report.csv`` (flattened), and folded into a ReportStats. Both files
+    are flushed every REPORT_FLUSH_ROWS rows or REPORT_FLUSH_SECONDS, so a
+    run that dies leaves a usable partial report that resume() can continue.
+    close() writes the aggregates to ``report.json`` and, with ``parquet``,
+    converts the CSV to ``report.parquet``.
+    """
 
-def discover_files(input_dir: Path, out_dir: Path, allowed_ext: Optional[Iterable[str]]) -> List[Path]:
-    files: List[Path] = []
-    ext_set = set(e.lower() for e in allowed_ext) if allowed_ext else None
-    for root, _, filenames in os.walk(input_dir):
-        for name in filenames:
-            src = Path(root) / name
-            if out_dir in src.parents:
-                continue
-            if ext_set is not None and src.suffix.lower() not in ext_set:
-                continue
-            if src.stat().st_size > 0:
-                files.append(src)
-    return files
+    def __init__(self, out_dir: Path, algos: Iterable[str], parquet: bool = False) -> None:
+        self.out_dir = out_dir
+        self.algos = sorted(set(algos))
+        self.parquet = parquet
+        self.stats = ReportStats()
+        self._ndjson: Optional[BinaryIO] = None
+        self._csv_file: Any = None
+        self._csv: Any = None
+        self._pending = 0
+        self._flushed = time.monotonic()
 
+    def _open(self, ndjson_mode: str) -> None:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._ndjson = open(self.out_dir / REPORT_NDJSON, ndjson_mode)  # type: ignore[assignment]
+        self._csv_file = open(self.out_dir / "report.csv", "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._csv_file)
+        header = ["file", "orig_bytes", "probe_ratio", "wall_s", "cpu_s", "peak_rss", "dedup_of"]
+        for algo in self.algos:
+            header += [f"{algo}_size", f"{algo}_ratio", f"{algo}_mbps", f"{algo}_cpu_s", f"{algo}_dec_mbps", f"{algo}_verified"]
+        self._csv.writerow(header)
 
-def ensure_algo_map(config: AlgoConfig, enable: Iterable[str]) -> Dict[str, callable]:
-    algos: Dict[str, callable] = {}
-    for key in enable:
-        if key == "zip":
-            algos[key] = lambda s, d: compress_zip(s, d, level=9)
-        elif key == "gzip":
-            algos[key] = lambda s, d: compress_gzip(s, d, level=config.gzip_level)
-        elif key == "xz":
-            algos[key] = lambda s, d: compress_xz(s, d, preset=config.xz_preset, extreme=config.xz_extreme)
-        elif key == "zstd" and HAS_ZSTD:
-            algos[key] = lambda s, d: compress_zstd(s, d, level=config.zstd_level)
-        elif key == "7z" and find_7z():
-            algos[key] = lambda s, d: compress_7z(s, d, level=config.sevenzip_level)
-    return algos
+    def _csv_row(self, row: Dict) -> None:
+        res = row.get("resources") or {}
+        line: List[object] = [
+            row.get("file"),
+            row.get("orig"),
+            (row.get("probe") or {}).get("ratio"),
+            res.get("seconds"),
+            res["cpu_user"] + res["cpu_sys"] if res else None,
+            res.get("peak_rss"),
+            row.get("dedup_of"),
+        ]
+        for algo in self.algos:
+            cell = row.get(algo) or {}
+            cpu = cell["cpu_user"] + cell["cpu_sys"] if "cpu_user" in cell else None
+            line += [cell.get("size"), cell.get("ratio"), cell.get("mbps"), cpu, cell.get("decompress_mbps"), cell.get("verified")]
+        self._csv.writerow(line)
 
+    def resume(self, on_row: Optional[Callable[[Dict], None]] = None) -> set:
+        """Take over the rows of an interrupted run's ``report.ndjson`` and return their files.
 
-def compress_one(src: Path, input_dir: Path, out_dir: Path, algo_names: List[str], config: AlgoConfig, force: bool = False) -> Dict:
-    orig_size = src.stat().st_size
-    result_row: Dict[str, object] = {"file": str(src.relative_to(input_dir)), "orig": orig_size}
+        Must be called before add(). The rows are counted again and
+        rewritten to a fresh CSV; a line cut off by the crash is dropped.
+        ``on_row`` sees every recovered row.
+        """
+        path = self.out_dir / REPORT_NDJSON
+        done: set = set()
+        if not path.exists():
+            self._open("wb")
+            return done
+        self._open("r+b")
+        assert self._ndjson is not None
+        good = 0
+        for line in self._ndjson:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                row = json.loads(line)
+            except ValueError:
+                break
+            good += len(line)
+            done.add(row["file"])
+            self.stats.add(row)
+            self._csv_row(row)
+            if on_row is not None:
+                on_row(row)
+        self._ndjson.seek(good)
+        self._ndjson.truncate()
+        return done
 
-    algos = ensure_algo_map(config, algo_names)
-    for algo_name, func in algos.items():
-        algo_dir = out_dir / algo_name
-        algo_dir.mkdir(parents=True, exist_ok=True)
-        final_path = algo_dir / (src.name + f".{algo_name}")
-        try:
-            if final_path.exists() and not force:
-                comp_size = final_path.stat().st_size
-            else:
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    tmp_path = Path(tmpdir) / (src.name + f".{algo_name}")
-                    func(src, tmp_path)
-                    shutil.move(tmp_path, final_path)
-                comp_size = final_path.stat().st_size
-            ratio = comp_size / orig_size
-            result_row[algo_name] = {"size": comp_size, "ratio": ratio}
-        except Exception as e:
-            result_row[algo_name] = {"error": str(e)}
-    return result_row
+    def add(self, row: Dict) -> None:
+        if self._ndjson is None:
+            self._open("wb")
+        assert self._ndjson is not None
+        self._ndjson.write(json.dumps(row).encode() + b"\n")
+        self._csv_row(row)
+        self.stats.add(row)
+        self._pending += 1
+        if self._pending >= REPORT_FLUSH_ROWS or time.monotonic() - self._flushed >= REPORT_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._ndjson is not None:
+            self._ndjson.flush()
+            self._csv_file.flush()
+        self._pending = 0
+        self._flushed = time.monotonic()
+
+    def close(self, extra: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+        """Finish both row files, write ``report.json`` and return its contents."""
+        if self._ndjson is None:
+            self._open("wb")
+        self._ndjson.close()  # type: ignore[union-attr]
+        self._csv_file.close()
+        report = {"rows_file": REPORT_NDJSON, **self.stats.summary(), **(extra or {})}
+        tmp = self.out_dir / "report.json.tmp"
+        tmp.write_text(json.dumps(report, indent=2))
+        os.replace(tmp, self.out_dir / "report.json")
+        if self.parquet:
+            csv_to_parquet(self.out_dir / "report.csv", self.out_dir / "report.parquet")
+        return report
+
+
+def csv_to_parquet(csv_path: Path, parquet_path: Path) -> None:
+    """Convert a report CSV to Parquet one record batch at a time (needs pyarrow)."""
+    try:
+        import pyarrow as pa  # type: ignore
+        from pyarrow import csv as pa_csv  # type: ignore
+        from pyarrow import parquet as pq  # type: ignore
+    except ImportError:
+        raise RuntimeError("pyarrow module not available") from None
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f))
+    # Explicit types: inferring them from the first block breaks on columns that start out empty.
+    types = {
+        name: pa.string() if name in ("file", "dedup_of") else pa.bool_() if name.endswith("_verified") else pa.float64()
+        for name in header
+    }
+    reader = pa_csv.open_csv(
+        csv_path, convert_options=pa_csv.ConvertOptions(column_types=types, strings_can_be_null=True)
+    )
+    tmp = parquet_path.with_name(parquet_path.name + ".tmp")
+    with pq.ParquetWriter(tmp, reader.schema) as writer:
+        for batch in reader:
+            writer.write_table(pa.Table.from_batches([batch]))
+    os.replace(tmp, parquet_path)
+
+
+# ---------------------------------------------------------------------------
+# Delta packages (``compression_backbone.py delta`` / ``restore``)
+# ---------------------------------------------------------------------------
+
+DELTA_MANIFEST = "manifest.json"
+DELTA_FRAME_SIZE = 1024 * 1024  # seekable frame size of a package's chunk pack
+CDC_MIN_SIZE = 16 * 1024
+CDC_AVG_SIZE = 64 * 1024  # must be a power of two
+CDC_MAX_SIZE = 256 * 1024
+_GEAR_MASK = (1 << 64) - 1
+_GEAR_RNG = random.Random(0x6765_6172)  # fixed seed: boundaries must not change between runs
+_GEAR = tuple(_GEAR_RNG.getrandbits(64) for _ in range(256))
+
+
+_GEAR_BLOCK = 1 << 16  # bytes per gear_candidates block
+
+
+def _cdc_masks(avg_size: int) -> Tuple[int, int]:
+    """The strict (before ``avg_size``) and loose (after) boundary masks of cdc_cut."""
+    bits = avg_size.bit_length() - 1
+    return ((1 << (bits + 1)) - 1) << (63 - bits), ((1 << (bits - 1)) - 1) << (65 - bits)
+
+
+@functools.lru_cache(maxsize=None)
+def _gear_array() -> Any:
+    return _import_optional("numpy").array(_GEAR, dtype="uint64")
+
+
+def gear_candidates(buf: bytes, avg_size: int) -> Optional[Tuple[List[int], List[int]]]:
+    """Positions in ``buf`` where a full-window Gear hash passes the strict and the loose mask.
+
+    Needs numpy (None without it). The hash of the 64 bytes ending at every
+    position is built in six vectorised passes, each doubling the window
+    (``h[i] += h[i - m] << m``), instead of one Python step per byte.
+    cdc_cut uses the result once the rolling hash has seen 64 bytes, from
+    where on the two hashes are the same value.
+    """
+    np = _import_optional("numpy")
+    if np is None:
+        return None
+    # Both masks are the top bits of the hash, so "h & mask == 0" is "h < 2**64 - mask".
+    below = [np.uint64(_GEAR_MASK + 1 - mask) for mask in _cdc_masks(avg_size)]
+    found: List[List[Any]] = [[np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]]
+    data = np.frombuffer(buf, dtype=np.uint8)
+    tmp = np.empty(_GEAR_BLOCK + 63, dtype=np.uint64)
+    # Blocks (overlapping by the 63-byte window) keep the passes in cache.
+    for lo in range(0, len(data), _GEAR_BLOCK):
+        first = max(0, lo - 63)
+        h = np.take(_gear_array(), data[first : lo + _GEAR_BLOCK])
+        m = 1
+        while m < min(64, len(h)):
+            shifted = np.left_shift(h[:-m], np.uint64(m), out=tmp[: len(h) - m])
+            h[m:] += shifted
+            m *= 2
+        h = h[lo - first :]
+        for at, limit in zip(found, below):
+            at.append(np.flatnonzero(h < limit) + lo)
+    return np.concatenate(found[0]).tolist(), np.concatenate(found[1]).tolist()
+
+
+def cdc_cut(
+    buf: bytes,
+    start: int,
+    min_size: int,
+    avg_size: int,
+    max_size: int,
+    candidates: Optional[Tuple[List[int], List[int]]] = None,
+) -> int:
+    """Length of the content-defined chunk that starts at ``buf[start]``.
+
+    Gear rolling hash with FastCDC-style normalized chunking: the first
+    ``min_size`` bytes are skipped, a stricter mask applies up to
+    ``avg_size`` and a looser one after, and chunks never exceed
+    ``max_size``. The mask tests the high bits of the hash, which depend
+    on the last 64 bytes only, so an edit moves the boundaries next to it
+    and leaves the rest of the file's chunks unchanged. With
+    ``candidates`` from gear_candidates(buf), only the first 64 bytes are
+    hashed here; the boundaries are the same either way.
+    """
+    n = min(len(buf) - start, max_size)
+    if n <= min_size:
+        return n
+    strict, loose = _cdc_masks(avg_size)
+    view = memoryview(buf)
+    gear = _GEAR
+    h = 0
+    i = start + min_size
+    normal = start + min(avg_size, n)
+    end = start + n
+    hashed = end if candidates is None else min(end, i + 64)
+    for b in view[i : min(normal, hashed)]:
+        h = ((h << 1) + gear[b]) & _GEAR_MASK
+        i += 1
+        if not h & strict:
+            return i - start
+    for b in view[i:hashed]:
+        h = ((h << 1) + gear[b]) & _GEAR_MASK
+        i += 1
+        if not h & loose:
+            return i - start
+    if candidates is not None and i < end:
+        strict_at, loose_at = candidates
+        k = bisect.bisect_left(strict_at, i)
+        if k < len(strict_at) and strict_at[k] < normal:
+            return strict_at[k] + 1 - start
+        k = bisect.bisect_left(loose_at, max(i, normal))
+        if k < len(loose_at) and loose_at[k] < end:
+            return loose_at[k] + 1 - start
+    return n
+
+
+def cdc_chunks(
+    fin: BinaryIO, min_size: int = CDC_MIN_SIZE, avg_size: int = CDC_AVG_SIZE, max_size: int = CDC_MAX_SIZE
+) -> Iterator[bytes]:
+    """Split a stream into content-defined chunks (see cdc_cut), reading CHUNK_SIZE at a time.
+
+    With numpy, the boundary candidates of each buffer are found in one
+    vectorised pass (gear_candidates); the chunks are the same without it.
+    """
+    buf = b""
+    pos = 0
+    eof = False
+    candidates = None
+    while True:
+        if not eof and len(buf) - pos < max_size:
+            data = fin.read(CHUNK_SIZE)
+            eof = not data
+            if data or pos:
+                buf = buf[pos:] + data
+                pos = 0
+                candidates = gear_candidates(buf, avg_size)
+            continue
+        if pos >= len(buf):
+            return
+        length = cdc_cut(buf, pos, min_size, avg_size, max_size, candidates)
+        yield buf[pos : pos + length]
+        pos += length
+
+
+def chunk_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def chunk_file(
+    src: Path, min_size: int = CDC_MIN_SIZE, avg_size: int = CDC_AVG_SIZE, max_size: int = CDC_MAX_SIZE
+) -> Tuple[str, List[Tuple[str, int]]]:
+    """Content digest of ``src`` and the ``(digest, length)`` of each of its content-defined chunks."""
+    h = new_digest()
+    chunks: List[Tuple[str, int]] = []
+    with open(src, "rb") as fin:
+        for chunk in cdc_chunks(fin, min_size, avg_size, max_size):
+            h.update(chunk)
+            chunks.append((chunk_digest(chunk), len(chunk)))
+    return h.hexdigest(), chunks
 
 
-def write_reports(rows: List[Dict], out_dir: Path) -> Dict[str, float]:
-    # Compute averages
-    sums: Dict[str, List[float]] = {}
-    for row in rows:
-        for k, v in row.items():
-            if k in ("file", "orig"):
+def delta_packages(root: Path) -> List[str]:
+    """Names of the complete packages under ``root``, oldest first."""
+    if not root.is_dir():
+        return []
+    return sorted(p.name for p in root.iterdir() if p.name.isdigit() and (p / DELTA_MANIFEST).is_file())
+
+
+def load_manifest(root: Path, package: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Manifest of ``package`` (default: the newest one), or None if there is none."""
+    if package is None:
+        names = delta_packages(root)
+        if not names:
+            return None
+        package = names[-1]
+    with open(root / package / DELTA_MANIFEST, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pack_delta(
+    entries: Iterable[ScanEntry],
+    input_dir: Path,
+    root: Path,
+    algo: str,
+    config: AlgoConfig,
+    *,
+    workers: int = 1,
+    check_content: bool = False,
+    min_size: int = CDC_MIN_SIZE,
+    avg_size: int = CDC_AVG_SIZE,
+    max_size: int = CDC_MAX_SIZE,
+) -> Dict[str, Any]:
+    """Write the next delta package of ``entries`` under ``root`` and return its manifest.
+
+    Files whose size and mtime match the previous manifest keep their chunk
+    list without being read (with ``check_content``, their quick_digest must
+    match too). The other files are split by chunk_file on ``workers``
+    processes, and only chunks no earlier package holds are read back and
+    appended to this package's ``chunks.<algo>``, a seekable stream of
+    DELTA_FRAME_SIZE frames. The manifest lists every file of the full set
+    with its chunks, and where each chunk lives, so restore_delta needs
+    nothing but the packages still referenced. Packages are built in a temp
+    directory and renamed into place when complete.
+    """
+    start, cpu = time.perf_counter(), process_usage()
+    base = load_manifest(root)
+    chunking = {"min": min_size, "avg": avg_size, "max": max_size}
+    if base is not None and base["chunking"] != chunking:
+        base = None  # boundaries would not line up; ship everything again
+    old_files: Dict[str, Dict[str, Any]] = base["files"] if base else {}
+    old_chunks: Dict[str, List[Any]] = base["chunks"] if base else {}
+    old_packs: Dict[str, str] = base["packs"] if base else {}
+    names = delta_packages(root)
+    package = f"{int(names[-1]) + 1 if names else 1:05d}"
+    staging = root / f".{package}.tmp"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    pack_name = f"chunks.{algo}"
+
+    files: Dict[str, Dict[str, Any]] = {}
+    chunks: Dict[str, List[Any]] = {}
+    stats = {"files": 0, "unchanged": 0, "changed": 0, "added": 0, "removed": 0, "chunks_new": 0, "chunks_reused": 0}
+    todo: List[Tuple[str, ScanEntry]] = []
+    quick: Dict[str, str] = {}  # digests already taken by the check below
+    for entry in sorted(entries, key=lambda e: e.path):
+        rel = Path(entry.path).relative_to(input_dir).as_posix()
+        stats["files"] += 1
+        old = old_files.get(rel)
+        if old is not None and old["size"] == entry.size and old["mtime_ns"] == entry.mtime_ns:
+            if check_content:
+                quick[rel] = quick_digest(Path(entry.path))
+            if not check_content or quick[rel] == old["quick"]:
+                files[rel] = old
+                for digest in old["chunks"]:
+                    chunks[digest] = old_chunks[digest]
+                stats["unchanged"] += 1
                 continue
-            if isinstance(v, dict) and "ratio" in v:
-                sums.setdefault(k, []).append(float(v["ratio"]))
-    averages = {k: (sum(v) / len(v) if v else float("nan")) for k, v in sums.items()}
-
-    # JSON
-    report_json = {"files": rows, "averages": averages}
-    (out_dir / "report.json").write_text(json.dumps(report_json, indent=2))
-
-    # CSV
-    fieldnames = ["file", "orig"] + sorted(sums.keys())
-    with open(out_dir / "report.csv", "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        header = ["file", "orig_bytes"]
-        for algo in sorted(sums.keys()):
-            header += [f"{algo}_size", f"{algo}_ratio"]
-        w.writerow(header)
-        for row in rows:
-            line: List[object] = [row.get("file"), row.get("orig")]
-            for algo in sorted(sums.keys()):
-                cell = row.get(algo) or {}
-                line += [cell.get("size"), cell.get("ratio")]
-            w.writerow(line)
-    return averages
+        stats["changed" if old is not None else "added"] += 1
+        todo.append((rel, entry))
+
+    read = new_bytes = 0
+    writer: Optional[BinaryIO] = None
+    offset = 0
+    executor = None
+    if workers > 1 and len(todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing; see _LazyModule
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        paths = [Path(entry.path) for _, entry in todo]
+        sizes = ([min_size] * len(paths), [avg_size] * len(paths), [max_size] * len(paths))
+        results = executor.map(chunk_file, paths, *sizes) if executor else map(chunk_file, paths, *sizes)
+        for (rel, entry), (file_hash, file_chunks) in zip(todo, results):
+            # Chunking is the expensive part; only the new chunks are read again, here.
+            with open(entry.path, "rb") as fin:
+                position = 0
+                for digest, length in file_chunks:
+                    read += length
+                    position += length
+                    if digest in chunks:
+                        continue
+                    if digest in old_chunks:
+                        chunks[digest] = old_chunks[digest]
+                        stats["chunks_reused"] += 1
+                        continue
+                    fin.seek(position - length)
+                    data = fin.read(length)
+                    if writer is None:
+                        writer = open_codec_writer(algo, staging / pack_name, config, Path(pack_name), size=0)
+                    writer.write(data)
+                    chunks[digest] = [package, offset, length]
+                    offset += length
+                    new_bytes += length
+                    stats["chunks_new"] += 1
+            files[rel] = {
+                "size": entry.size,
+                "mtime_ns": entry.mtime_ns,
+                "digest": file_hash,
+                "quick": quick[rel] if rel in quick else quick_digest(Path(entry.path)),
+                "chunks": [digest for digest, _ in file_chunks],
+            }
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if writer is not None:
+            writer.close()
+    stats["removed"] = sum(1 for rel in old_files if rel not in files)
+
+    packs = {p: old_packs[p] for p in {c[0] for c in chunks.values()} if p != package}
+    if writer is not None:
+        packs[package] = pack_name
+    usage = process_usage()
+    seconds = time.perf_counter() - start
+    manifest: Dict[str, Any] = {
+        "format": "delta",
+        "version": 1,
+        "package": package,
+        "base": base["package"] if base else None,
+        "algo": algo,
+        "chunking": chunking,
+        "stats": {
+            **stats,
+            "orig": sum(int(f["size"]) for f in files.values()),
+            "read": read,
+            "new_bytes": new_bytes,
+            "pack_size": (staging / pack_name).stat().st_size if writer is not None else 0,
+            "seconds": seconds,
+            "cpu_seconds": usage[0] + usage[1] - cpu[0] - cpu[1],
+        },
+        "packs": dict(sorted(packs.items())),
+        "chunks": chunks,
+        "files": files,
+    }
+    with open(staging / DELTA_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(staging, root / package)
+    return manifest
+
+
+def restore_delta(root: Path, dest: Path, package: Optional[str] = None) -> Dict[str, Any]:
+    """Rebuild the full file set of ``package`` (default: the newest) under ``dest``.
+
+    Chunks are read back through SeekableReader, one reader per pack, and
+    every file is checked against its digest. Returns the number of files
+    and bytes written and the files that did not match.
+    """
+    manifest = load_manifest(root, package)
+    if manifest is None:
+        raise FileNotFoundError(f"no delta packages in {root}")
+    readers: Dict[str, SeekableReader] = {}
+    failed: List[str] = []
+    written = 0
+    try:
+        for rel, info in sorted(manifest["files"].items()):
+            dst = dest / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            h = new_digest()
+            with open(dst, "wb") as fout:
+                for digest in info["chunks"]:
+                    name, offset, length = manifest["chunks"][digest]
+                    if name not in readers:
+                        readers[name] = SeekableReader(root / name / manifest["packs"][name])
+                    data = readers[name].read(offset, length)
+                    h.update(data)
+                    fout.write(data)
+                    written += len(data)
+            if h.hexdigest() != info["digest"]:
+                failed.append(rel)
+    finally:
+        for reader in readers.values():
+            reader.close()
+    return {"package": manifest["package"], "files": len(manifest["files"]), "bytes": written, "failed": failed}
+
+
+def delta_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="compression_backbone.py delta",
+        description="Package only what changed since the previous package of the same directory.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent(
+            """\
+            Examples:
+              python compression_backbone.py delta D:\\survey --out-dir E:\\packages\\survey
+              python compression_backbone.py restore E:\\packages\\survey D:\\restored --package 00003
+            """
+        ),
+    )
+    parser.add_argument("input_dir", type=str, help="Directory to package")
+    parser.add_argument("--out-dir", required=True, help="Directory holding the numbered packages")
+    parser.add_argument("--ext", nargs="*", default=None, help="List of extensions to include (e.g. --ext .tif .json)")
+    parser.add_argument("--algo", choices=SOLID_ALGOS, default="zstd" if has_zstd() else "xz")
+    parser.add_argument("--zstd-level", type=int, default=19, help="zstd level (1–22)")
+    parser.add_argument("--xz-preset", type=int, default=9, help="xz preset (0–9)")
+    parser.add_argument("--no-xz-extreme", action="store_true", help="Disable xz extreme mode")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Processes chunking changed files (default: one per CPU)"
+    )
+    parser.add_argument("--threads", type=int, default=1, help="Threads compressing pack frames")
+    parser.add_argument("--avg-chunk-kb", type=int, default=CDC_AVG_SIZE // 1024, help="Average chunk size (power of two)")
+    parser.add_argument(
+        "--check-content",
+        action="store_true",
+        help="Also compare a sampled content hash before trusting an unchanged size and mtime",
+    )
+    parser.add_argument(
+        "--scan-threads", type=int, default=SCAN_THREADS, help="Threads listing directories during discovery"
+    )
+    args = parser.parse_args(argv)
+
+    avg = args.avg_chunk_kb * 1024
+    if avg < 1024 or avg & (avg - 1):
+        parser.error("--avg-chunk-kb must be a power of two of at least 1")
+    if args.algo == "zstd" and not has_zstd():
+        print("ERROR: zstandard module not available (pip install zstandard).", file=sys.stderr)
+        sys.exit(1)
+    input_dir = Path(args.input_dir).resolve()
+    root = Path(args.out_dir).resolve()
+    config = AlgoConfig(
+        zstd_level=args.zstd_level,
+        xz_preset=args.xz_preset,
+        xz_extreme=not args.no_xz_extreme,
+        threads=max(1, args.threads),
+        parallel_threshold=0,
+        frame_size=DELTA_FRAME_SIZE,
+    )
+    entries = scan_files(
+        input_dir, exclude=[root], allowed_ext=args.ext, min_size=0, threads=max(1, args.scan_threads)
+    )
+    manifest = pack_delta(
+        entries,
+        input_dir,
+        root,
+        args.algo,
+        config,
+        workers=max(1, args.workers),
+        check_content=args.check_content,
+        min_size=avg // 4,
+        avg_size=avg,
+        max_size=avg * 4,
+    )
+    s = manifest["stats"]
+    print(f"Package   : {root / manifest['package']} (base: {manifest['base'] or 'none'})")
+    print(
+        f"Files     : {s['files']} ({s['unchanged']} unchanged, {s['changed']} changed, "
+        f"{s['added']} added, {s['removed']} removed)"
+    )
+    print(f"Read      : {human_size(s['read'])} of {human_size(s['orig'])}")
+    print(
+        f"Shipped   : {s['chunks_new']} new chunks, {human_size(s['new_bytes'])} -> {human_size(s['pack_size'])} "
+        f"({s['chunks_reused']} chunks reused from earlier packages)"
+    )
+    print(f"Time      : {s['seconds']:.2f}s wall, {s['cpu_seconds']:.2f}s CPU")
+
+
+def restore_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="compression_backbone.py restore", description="Rebuild the full file set of a delta package."
+    )
+    parser.add_argument("packages", type=str, help="Directory holding the numbered packages")
+    parser.add_argument("dest", type=str, help="Directory to restore into")
+    parser.add_argument("--package", default=None, help="Package to restore (default: the newest)")
+    args = parser.parse_args(argv)
+
+    result = restore_delta(Path(args.packages), Path(args.dest), args.package)
+    print(f"Restored package {result['package']}: {result['files']} files, {human_size(result['bytes'])}")
+    for rel in result["failed"]:
+        print(f"DIGEST MISMATCH: {rel}", file=sys.stderr)
+    if result["failed"]:
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# Level sweep benchmark (``compression_backbone.py bench``)
+# ---------------------------------------------------------------------------
+
+_CORPUS_WORDS = (
+    "tile raster elevation grid survey lidar point cloud band nodata projection "
+    "datum meters feet north east west south header metadata json value index "
+    "level offset scale the and of to in for with on at by from"
+).split()
+
+
+def text_bytes(rng: random.Random, size: int) -> bytes:
+    out = bytearray()
+    while len(out) < size:
+        line = " ".join(rng.choices(_CORPUS_WORDS, k=12)) + f" {rng.randint(0, 99999)}\n"
+        out += line.encode()
+    return bytes(out[:size])
+
+
+def raster_bytes(rng: random.Random, size: int) -> bytes:
+    """Smooth int16 gradient with small noise, roughly like an elevation tile."""
+    count = size // 2
+    base = rng.randint(0, 2000)
+    values = [(base + i // 256) % 32760 + rng.randint(-3, 3) for i in range(count)]  # wrap to stay in int16
+    return struct.pack(f"<{count}h", *values) + b"\0" * (size - count * 2)
+
+
+def json_bytes(rng: random.Random, size: int) -> bytes:
+    """Concatenated small metadata sidecars with the same shape and varying values."""
+    out = bytearray()
+    while len(out) < size:
+        doc = {
+            "tile": f"N{rng.randint(0, 89):02d}E{rng.randint(0, 179):03d}",
+            "projection": rng.choice(["EPSG:4326", "EPSG:3857", "EPSG:32633"]),
+            "bounds": [round(rng.uniform(-180, 180), 6) for _ in range(4)],
+            "nodata": -9999,
+        }
+        out += json.dumps(doc, indent=2).encode() + b"\n"
+    return bytes(out[:size])
+
+
+def random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.randbytes(size)
+
+
+CORPUS_KINDS: Dict[str, Callable[[random.Random, int], bytes]] = {
+    "text": text_bytes,
+    "raster": raster_bytes,
+    "json": json_bytes,
+    "random": random_bytes,
+}
+
+
+def generate_corpus(kinds: Iterable[str], size: int, seed: int = 1234) -> Dict[str, bytes]:
+    """One ``size``-byte sample per kind, identical on every machine for a given seed."""
+    rng = random.Random(seed)
+    return {kind: CORPUS_KINDS[kind](rng, size) for kind in kinds}
+
+
+def sample_corpus(root: Path, files: int, max_bytes: int, seed: int = 1234) -> Dict[str, bytes]:
+    """The first ``max_bytes`` of ``files`` files picked from ``root`` with a seeded RNG."""
+    found = sorted(e.path for e in scan_files(root))
+    picked = random.Random(seed).sample(found, min(files, len(found)))
+    samples: Dict[str, bytes] = {}
+    for path in sorted(picked):
+        with open(path, "rb") as f:
+            samples[os.path.relpath(path, root)] = f.read(max_bytes)
+    return samples
+
+
+@dataclass
+class BenchPoint:
+    algo: str
+    label: str  # e.g. "zstd:19", "xz:9e", "zstd:22+ldm/w27"
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+    memory: int  # estimated compressor memory, bytes
+
+
+def sweep_points(algos: Iterable[str], *, long_distance: bool = False, window_logs: Iterable[int] = ()) -> List[BenchPoint]:
+    """Every level of every codec in ``algos``; zstd also gets fast (negative) levels and optional LDM/window variants."""
+    points: List[BenchPoint] = []
+    for algo in algos:
+        if algo == "gzip":
+            for level in range(1, 10):
+                points.append(
+                    BenchPoint(
+                        "gzip",
+                        f"gzip:{level}",
+                        functools.partial(gzip.compress, compresslevel=level, mtime=0),
+                        gzip.decompress,
+                        384 << 10,  # zlib: 128 KiB window + 256 KiB hash chains at memLevel 8
+                    )
+                )
+        elif algo == "xz":
+            for extreme in (False, True):
+                for preset in range(10):
+                    points.append(
+                        BenchPoint(
+                            "xz",
+                            f"xz:{preset}{'e' if extreme else ''}",
+                            functools.partial(lzma.compress, preset=preset | (lzma.PRESET_EXTREME if extreme else 0)),
+                            lzma.decompress,
+                            XZ_MEMORY_MIB[preset] << 20,
+                        )
+                    )
+        elif algo == "zstd" and has_zstd():
+            variants: List[Tuple[str, Dict[str, int]]] = [("", {})]
+            if long_distance:
+                variants.append(("+ldm", {"enable_ldm": 1, "window_log": 27}))
+            variants += [(f"/w{w}", {"window_log": w}) for w in window_logs]
+            for suffix, extra in variants:
+                for level in [-7, -5, -3, -1, *range(1, 23)]:
+                    params = zstd.ZstdCompressionParameters.from_level(level, **extra)
+                    cctx = zstd.ZstdCompressor(compression_params=params)
+                    dctx = zstd.ZstdDecompressor(max_window_size=1 << 31)
+                    points.append(
+                        BenchPoint(
+                            "zstd",
+                            f"zstd:{level}{suffix}",
+                            cctx.compress,
+                            dctx.decompress,
+                            params.estimated_compression_context_size(),
+                        )
+                    )
+    return points
+
+
+def measure_point(point: BenchPoint, samples: Dict[str, bytes], repeat: int = 1) -> Dict[str, object]:
+    """Compress and decompress every sample; speeds are the best of ``repeat`` runs."""
+    orig = sum(len(d) for d in samples.values())
+    best_c = best_d = float("inf")
+    packed = 0
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        frames = [point.compress(d) for d in samples.values()]
+        best_c = min(best_c, time.perf_counter() - start)
+        start = time.perf_counter()
+        for frame, data in zip(frames, samples.values()):
+            if point.decompress(frame) != data:
+                raise RuntimeError(f"{point.label} did not round-trip")
+        best_d = min(best_d, time.perf_counter() - start)
+        packed = sum(len(f) for f in frames)
+    return {
+        "algo": point.algo,
+        "point": point.label,
+        "ratio": packed / orig if orig else 1.0,
+        "compress_mbps": orig / best_c / 1e6 if best_c > 0 else 0.0,
+        "decompress_mbps": orig / best_d / 1e6 if best_d > 0 else 0.0,
+        "memory_mb": point.memory / (1 << 20),
+        "bytes": orig,
+        "packed": packed,
+    }
+
+
+def pareto_frontier(results: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Points no other point beats on both ratio (lower) and compress MB/s (higher), fastest first."""
+    frontier: List[Dict[str, object]] = []
+    best_ratio = float("inf")
+    for r in sorted(results, key=lambda r: (-float(r["compress_mbps"]), float(r["ratio"]))):
+        if float(r["ratio"]) < best_ratio:
+            frontier.append(r)
+            best_ratio = float(r["ratio"])
+    return frontier
+
+
+def bench_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="compression_backbone.py bench",
+        description="Sweep codec levels and report speed/ratio/memory plus the Pareto frontier.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent(
+            """\
+            Examples:
+              python compression_backbone.py bench --generate text raster json --size-mb 4
+              python compression_backbone.py bench --corpus D:\\tiles --sample-files 20 --algos zstd --zstd-ldm
+            """
+        ),
+    )
+    parser.add_argument("--corpus", help="Sample real files from this directory instead of generating data")
+    parser.add_argument("--sample-files", type=int, default=20, help="Files sampled from --corpus")
+    parser.add_argument("--generate", nargs="+", choices=sorted(CORPUS_KINDS), default=["text", "raster", "json"])
+    parser.add_argument("--size-mb", type=float, default=4, help="Bytes per generated kind / per sampled file (MiB)")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for generated data and file sampling")
+    parser.add_argument("--algos", nargs="+", choices=["gzip", "xz", "zstd"], default=["gzip", "xz", "zstd"])
+    parser.add_argument("--zstd-ldm", action="store_true", help="Also sweep zstd with long-distance matching (window 2^27)")
+    parser.add_argument("--zstd-window-logs", type=int, nargs="*", default=[], help="Also sweep zstd with these window logs")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per point; the fastest is kept")
+    parser.add_argument("--out", default="bench_results", help="Directory for sweep.json and sweep.csv")
+    args = parser.parse_args(argv)
+
+    size = int(args.size_mb * 1024 * 1024)
+    if args.corpus:
+        samples = sample_corpus(Path(args.corpus), args.sample_files, size, args.seed)
+        corpus: Dict[str, object] = {"source": args.corpus, "files": sorted(samples), "seed": args.seed}
+    else:
+        samples = generate_corpus(args.generate, size, args.seed)
+        corpus = {"generated": args.generate, "bytes_each": size, "seed": args.seed}
+    if not samples:
+        print("No data to benchmark.")
+        return
+    corpus["sha256"] = hashlib.sha256(b"".join(samples.values())).hexdigest()  # same data => same digest
+
+    points = sweep_points(args.algos, long_distance=args.zstd_ldm, window_logs=args.zstd_window_logs)
+    print(f"{len(points)} points over {sum(len(d) for d in samples.values()) / 1e6:.1f} MB")
+    print(f"{'point':>18s} {'ratio':>7s} {'comp MB/s':>10s} {'dec MB/s':>9s} {'mem MiB':>8s}")
+    results: List[Dict[str, object]] = []
+    for point in points:
+        r = measure_point(point, samples, args.repeat)
+        results.append(r)
+        print(
+            f"{r['point']:>18s} {float(r['ratio']):7.1%} {float(r['compress_mbps']):10.1f} "
+            f"{float(r['decompress_mbps']):9.1f} {float(r['memory_mb']):8.1f}"
+        )
+    frontier = pareto_frontier(results)
+    on_frontier = {str(r["point"]) for r in frontier}
+    for r in results:
+        r["pareto"] = r["point"] in on_frontier
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "sweep.json").write_text(
+        json.dumps({"corpus": corpus, "points": results, "pareto": [r["point"] for r in frontier]}, indent=2)
+    )
+    with open(out / "sweep.csv", "w", newline="", encoding="utf-8") as f:
+        fields = ["algo", "point", "ratio", "compress_mbps", "decompress_mbps", "memory_mb", "bytes", "packed", "pareto"]
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(results)
+    print("\nPareto frontier (ratio vs. compress speed): " + ", ".join(r["point"] for r in frontier))  # type: ignore[misc]
+    print(f"Wrote {out / 'sweep.json'} and {out / 'sweep.csv'}")
 
 
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "delta":
+        delta_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "restore":
+        restore_main(sys.argv[2:])
+        return
     parser = argparse.ArgumentParser(
         description="Compare compression formats (zip/gzip/xz/zstd/7z) on a set of files.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -200,15 +3379,137 @@ def main() -> None:
     parser.add_argument("input_dir", type=str, help="Directory containing files to test.")
     parser.add_argument("--out-dir", type=str, default=None, help="Output directory (default: <input_dir>/_compression_test)")
     parser.add_argument("--ext", nargs="*", default=None, help="List of extensions to include (e.g. --ext .tif .json)")
-    parser.add_argument("--max-files", type=int, default=0, help="Limit number of files to test (0 = no limit)")
+    parser.add_argument("--max-files", type=int, default=0, help="Test only the first N files in path order (0 = no limit)")
     parser.add_argument("--algos", nargs="*", default=["zip", "gzip", "xz", "zstd", "7z"], help="Algorithms to run")
     parser.add_argument("--workers", type=int, default=1, help="Parallel workers (processes)")
+    parser.add_argument(
+        "--scan-threads", type=int, default=SCAN_THREADS, help="Threads listing directories during discovery"
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Cores shared by all workers and their codec threads (default: all cores)",
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=int,
+        default=0,
+        help="Memory shared by concurrently running codecs (default: 75%% of physical RAM)",
+    )
+    parser.add_argument("--threads", type=int, default=1, help="Threads per codec for files above --parallel-threshold-mb")
+    parser.add_argument("--parallel-threshold-mb", type=int, default=256, help="Split files at least this large across threads")
+    parser.add_argument("--block-size-mb", type=int, default=16, help="Block size for parallel gzip/xz (MiB)")
+    parser.add_argument(
+        "--7z-batch",
+        dest="sevenzip_batch",
+        type=int,
+        default=SEVENZIP_BATCH_FILES,
+        help="Files per 7z invocation, written to <out_dir>/7z/batch_<run>_NNNNN.7z (<= 1: one archive per file)",
+    )
+    parser.add_argument(
+        "--frame-size-kb",
+        type=int,
+        default=0,
+        help="Write seekable zstd/xz made of independent frames of this size, with a seek table (0 = off)",
+    )
+    parser.add_argument(
+        "--zstd-dict",
+        action="store_true",
+        help="Train a zstd dictionary per extension and use it for small files (needs zstandard)",
+    )
+    parser.add_argument("--dict-size-kb", type=int, default=DICT_SIZE // 1024, help="Trained dictionary size (KiB)")
+    parser.add_argument(
+        "--dict-max-file-kb",
+        type=int,
+        default=DICT_MAX_FILE // 1024,
+        help="Only files up to this size are trained on and compressed with a dictionary (KiB)",
+    )
+    parser.add_argument(
+        "--solid",
+        action="store_true",
+        help="Also pack files into one solid tar stream per extension group under <out_dir>/solid",
+    )
+    parser.add_argument(
+        "--solid-algos",
+        nargs="+",
+        choices=SOLID_ALGOS,
+        default=["zstd"],
+        help="Codecs for the solid streams",
+    )
+    parser.add_argument(
+        "--policy",
+        choices=POLICY_TARGETS,
+        help="Pick one codec and level per file instead of running all of them: smallest output, "
+        "fastest codec, or a balance of both",
+    )
+    parser.add_argument(
+        "--policy-tradeoff",
+        type=float,
+        default=POLICY_TRADEOFF,
+        help="balanced policy: ratio points one extra second per MB is worth",
+    )
+    parser.add_argument(
+        "--policy-min-mbps", type=float, default=0.0, help="Policy: ignore codec levels slower than this (MB/s)"
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Decompress every output, compare it with the source hash and record decompress MB/s",
+    )
+    parser.add_argument(
+        "--trace", help="Write a Chrome trace (chrome://tracing, ui.perfetto.dev) of per-codec work to this JSON file"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Compress byte-identical files once and fill the duplicates' results from the first copy",
+    )
+    parser.add_argument(
+        "--dedup-output",
+        choices=DEDUP_MODES,
+        default="hardlink",
+        help="Duplicates' outputs: hard links to the first copy's (copies across filesystems), copies, "
+        "or none (reference: report only)",
+    )
     parser.add_argument("--force", action="store_true", help="Overwrite existing outputs")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run: files already in <out_dir>/report.ndjson are not compressed again",
+    )
+    parser.add_argument("--parquet", action="store_true", help="Also write report.parquet (needs pyarrow)")
     parser.add_argument("--strict", action="store_true", help="Exit non-zero if any file fails")
     parser.add_argument("--zstd-level", type=int, default=19, help="zstd level (1–22)")
     parser.add_argument("--xz-preset", type=int, default=9, help="xz preset (0–9)")
     parser.add_argument("--xz-no-extreme", action="store_true", help="disable xz extreme mode")
     parser.add_argument("--gzip-level", type=int, default=9, help="gzip level (1–9)")
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=f"Reuse results for unchanged files from <out_dir>/{CACHE_FILENAME} (default: on)",
+    )
+    parser.add_argument("--cache-hash", action="store_true", help="Also match a sampled content hash, not just size+mtime")
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=CACHE_MAX_ENTRIES,
+        help="Evict least-recently-used cache rows beyond this many (file, codec) entries",
+    )
+    parser.add_argument("--probe", action="store_true", help="Sample each file first and skip hopeless ones")
+    parser.add_argument(
+        "--probe-threshold",
+        type=float,
+        default=PROBE_THRESHOLD,
+        help=f"Predicted ratio at or above which a file is hopeless (default: {PROBE_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--probe-action",
+        choices=["skip", "store"],
+        default="skip",
+        help="What to do with hopeless files: skip them or copy them store-only",
+    )
 
     args = parser.parse_args()
 
@@ -219,10 +3520,19 @@ def main() -> None:
 
     out_dir = Path(args.out_dir) if args.out_dir else input_dir / "_compression_test"
     out_dir.mkdir(parents=True, exist_ok=True)
+    if args.parquet:
+        try:
+            import pyarrow  # type: ignore  # noqa: F401
+        except ImportError:
+            print("ERROR: --parquet needs pyarrow (pip install pyarrow).", file=sys.stderr)
+            sys.exit(1)
 
-    files = discover_files(input_dir, out_dir, args.ext)
+    entries = list(scan_files(input_dir, exclude=[out_dir], allowed_ext=args.ext, threads=max(1, args.scan_threads)))
+    # Threaded scans yield in arbitrary order; sort before --max-files so every run picks the same files.
+    entries.sort(key=lambda e: e.path)
     if args.max_files > 0:
-        files = files[: args.max_files]
+        entries = entries[: args.max_files]
+    files = [Path(e.path) for e in entries]
     if not files:
         print("No files to test.")
         return
@@ -233,72 +3543,384 @@ def main() -> None:
         xz_extreme=not args.xz_no_extreme,
         zstd_level=max(1, min(22, args.zstd_level)),
         sevenzip_level=9,
+        threads=max(1, args.threads),
+        parallel_threshold=max(0, args.parallel_threshold_mb) * 1024 * 1024,
+        block_size=max(1, args.block_size_mb) * 1024 * 1024,
+        frame_size=max(0, args.frame_size_kb) * 1024,
     )
 
     # Filter algos by availability
     enabled = []
     for a in args.algos:
-        if a == "zstd" and not HAS_ZSTD:
+        if a == "zstd" and not has_zstd():
             continue
-        if a == "7z" and not find_7z():
+        if a == "7z" and not sevenzip_backend():
             continue
         enabled.append(a)
-    if not enabled:
+    solid_algos = [a for a in args.solid_algos if a != "zstd" or has_zstd()] if args.solid else []
+    if args.policy and not any(a in STREAMING_ALGOS for a in enabled):
+        parser.error(f"--policy picks among {', '.join(STREAMING_ALGOS)}; none of them is available in --algos")
+    if not enabled and not solid_algos:
         print("No available algorithms selected.")
         return
 
+    report_extra: Dict[str, object] = {}
+    if args.zstd_dict and "zstd" in enabled:
+        config.dict_max_file = max(1, args.dict_max_file_kb) * 1024
+        dictionaries = train_zstd_dictionaries(
+            ((f, e.size) for f, e in zip(files, entries)), out_dir / "zstd" / "dicts", config, max(1, args.dict_size_kb) * 1024
+        )
+        config.zstd_dicts = {ext: str(info["path"]) for ext, info in dictionaries.items()}
+        report_extra["dictionaries"] = dictionaries
+
+    # Byte-identical files are compressed once; see duplicate_row for how the others are filled in.
+    duplicates = find_duplicates(zip(files, (e.size for e in entries))) if args.dedup else {}
+    needed = {str(original.relative_to(input_dir)) for original in duplicates.values()}
+
+    # Rows go to the report (and the table) as soon as they are complete; only
+    # rows still waiting for something (a 7z batch, their duplicates) are kept.
+    algo_order = [*enabled, *(["store"] if args.policy else [])]
+    report = ReportWriter(out_dir, algo_order, parquet=args.parquet)
+    failures = 0
+    originals: Dict[str, Dict] = {}  # rows of files that have duplicates
+    solid_sizes: Dict[Tuple[str, str], List[int]] = {}  # (group, codec) -> [per-file bytes, files]
+    trace_events: List[Dict[str, object]] = []
+    policy_by_file: Dict[str, PolicyDecision] = {}
+
+    def table_line(row: Dict) -> Tuple[List[str], int]:
+        cols: List[str] = [row["file"], human_size(int(row["orig"]))]
+        failed = 0
+        for a in algo_order:
+            cell = row.get(a) or {}
+            if cell.get("verified") is False:
+                failed += 1
+                cols += [human_size(int(cell["size"])), "VERIFY FAIL"]
+            elif "size" in cell and "ratio" in cell:
+                cols.append(human_size(int(cell["size"])))
+                cols.append(f"{float(cell['ratio'])*100:.1f}%")
+            elif cell.get("skipped"):
+                cols += ["SKIP", "N/A"]
+            elif a not in row and "policy" in row:
+                cols += ["-", "-"]  # not the codec the policy picked
+            else:
+                failed += 1
+                cols += ["FAIL", "N/A"]
+        return cols, failed
+
+    def account(row: Dict) -> int:
+        """Keep what later steps need from a finished row; returns its failures."""
+        if row["file"] in needed:
+            originals[row["file"]] = row
+        if solid_algos:
+            group = ext_group(Path(row["file"]))
+            for algo in solid_algos:
+                cell = row.get(algo) or {}
+                if "size" in cell:
+                    sizes = solid_sizes.setdefault((group, algo), [0, 0])
+                    sizes[0] += int(cell["size"])
+                    sizes[1] += 1
+        return table_line(row)[1]
+
+    def record(row: Dict) -> None:
+        nonlocal failures
+        decision = policy_by_file.get(row["file"])
+        if decision is not None:
+            row["policy"] = decision.report()
+        # Timeline positions only matter for the trace; they are not part of the report.
+        for algo, cell in row.items():
+            if algo in META_KEYS or not isinstance(cell, dict) or "t0" not in cell:
+                continue
+            t0, pid = cell.pop("t0"), cell.pop("pid")
+            if args.trace:
+                trace_events.append({"name": algo, "file": row["file"], "t0": t0, "pid": pid, **cell})
+        failures += account(row)
+        print("\t".join(table_line(row)[0]))
+        report.add(row)
+
+    resumed: set = set()
+    if args.resume:
+
+        def recovered(row: Dict) -> None:
+            nonlocal failures
+            failures += account(row)
+
+        resumed = report.resume(recovered)
+        duplicates = {f: o for f, o in duplicates.items() if str(f.relative_to(input_dir)) not in resumed}
+    work = [
+        (f, e) for f, e in zip(files, entries) if f not in duplicates and str(f.relative_to(input_dir)) not in resumed
+    ]
+
     print("=== Compression Backbone ===")
     print(f"Input dir : {input_dir}")
     print(f"Output dir: {out_dir}")
     print(f"Files     : {len(files)}")
-    print(f"Algos     : {', '.join(enabled)}")
+    if args.resume:
+        print(f"Resumed   : {len(resumed)} files already in {REPORT_NDJSON}")
+    if args.dedup:
+        print(f"Dedup     : {len(duplicates)} duplicates of {len(set(duplicates.values()))} files")
+    print(f"Algos     : {', '.join(enabled) or '-'}")
+    if solid_algos:
+        print(f"Solid     : {', '.join(solid_algos)}")
     print()
 
-    rows: List[Dict] = []
-    failures = 0
+    probe_threshold = args.probe_threshold if args.probe else None
+
+    # Serve unchanged files from the cache; only the remaining codecs are compressed.
+    # With the cache on, whatever reaches compress_one is a miss (the source, the
+    # settings or the output changed), so the outputs it finds there are stale and
+    # are rewritten. Cached cells are checked with verify_cached instead.
+    cache = ResultCache(out_dir / CACHE_FILENAME, args.cache_max_entries) if args.cache else None
+    force = args.force or cache is not None
+
+    # Policy mode: one codec and level per file, chosen up front from the
+    # extension, size and a probe (see choose_codec).
+    decisions: List[Optional[PolicyDecision]] = [None] * len(work)
+    if args.policy:
+        candidates = [a for a in enabled if a in STREAMING_ALGOS]
+
+        def decide(item: Tuple[Path, ScanEntry]) -> PolicyDecision:
+            f, entry = item
+            return choose_codec(
+                f,
+                entry.size,
+                candidates,
+                config,
+                args.policy,
+                tradeoff=args.policy_tradeoff,
+                min_mbps=args.policy_min_mbps,
+                threshold=args.probe_threshold,
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, args.cpu_budget)) as tex:
+            decisions = list(tex.map(decide, work))
+        choices = Counter(d.report()["choice"] for d in decisions if d is not None)
+        report_extra["policy"] = {"target": args.policy, "choices": dict(choices.most_common())}
+        policy_by_file = {str(f.relative_to(input_dir)): d for (f, _), d in zip(work, decisions) if d is not None}
+
+    header = ["File", "Orig"] + [f"{a} size\t{a} ratio" for a in algo_order]
+    print("\t".join(header))
 
-    if args.workers and args.workers > 1:
-        with ProcessPoolExecutor(max_workers=args.workers) as ex:
-            futures = [
-                ex.submit(
+    jobs: List[Tuple[Path, int, List[str], Optional[CacheKey], Dict[str, Dict], AlgoConfig]] = []
+    # With the 7z binary, 7z runs once per batch of files instead of once per file.
+    batch_7z = "7z" in enabled and args.sevenzip_batch > 1 and sevenzip_backend() == "cli"
+    sevenzip_todo: List[Tuple[Path, int, Optional[CacheKey]]] = []
+    waiting_7z: Dict[str, Optional[Dict]] = {}  # rows done except for their 7z batch
+    served = 0
+    cached_cells: List[Tuple[Path, str, int, Dict[str, Dict], AlgoConfig]] = []  # for --verify
+    cached_rows: List[Tuple[Dict, Dict[str, Dict], AlgoConfig]] = []  # rows with nothing left to compress
+
+    def finish(row: Dict, key: Optional[CacheKey], hits: Dict[str, Dict], file_config: AlgoConfig) -> None:
+        if cache is not None and key is not None:
+            params = {a: algo_params(file_config, a, Path(row["file"]), int(row["orig"])) for a in row if a not in META_KEYS}
+            cache.store(key, params, row)
+        row.update(hits)
+        if row["file"] in waiting_7z:
+            waiting_7z[row["file"]] = row
+        else:
+            record(row)
+
+    for (f, entry), decision in zip(work, decisions):
+        wanted = enabled
+        file_config = config
+        if decision is not None:
+            wanted = [decision.algo]
+            if decision.level is not None:
+                file_config = config_with_level(config, decision.algo, decision.level)
+        params = {a: algo_params(file_config, a, f, entry.size) for a in wanted}
+        key: Optional[CacheKey] = None
+        hits: Dict[str, Dict] = {}
+        if cache is not None:
+            key = CacheKey(str(f.relative_to(input_dir)), entry.size, entry.mtime_ns, quick_digest(f) if args.cache_hash else "")
+            if not args.force:
+                hits = cache.lookup(key, params, out_dir)
+        missing = [a for a in wanted if a not in hits]
+        if batch_7z and "7z" in missing:
+            missing.remove("7z")
+            sevenzip_todo.append((f, entry.size, key))
+            waiting_7z[str(f.relative_to(input_dir))] = None
+        if missing:
+            jobs.append((f, entry.size, missing, key, hits, file_config))
+        else:
+            cached_rows.append(({"file": str(f.relative_to(input_dir)), "orig": entry.size}, hits, file_config))
+        if len(hits) == len(wanted):
+            served += 1
+        if hits and args.verify:
+            cached_cells.append((f, str(f.relative_to(input_dir)), entry.size, hits, file_config))
+
+    if cached_cells:
+        verify_cached(out_dir, cached_cells, args.cpu_budget)
+    for row, hits, file_config in cached_rows:
+        finish(row, None, hits, file_config)
+
+    try:
+        if args.workers and args.workers > 1:
+            # Longest jobs go first and share a core/memory budget (see plan_jobs);
+            # a file split per codec is reported once all of its parts are back.
+            cpu_budget = max(1, args.cpu_budget)
+            ram = physical_memory()
+            memory_budget = args.memory_budget_mb << 20 if args.memory_budget_mb > 0 else (ram * 3 // 4 if ram else None)
+            planned = plan_jobs(
+                ((f, size, missing, i) for i, (f, size, missing, *_) in enumerate(jobs)),
+                config,
+                cpu_budget,
+                {i: job[5] for i, job in enumerate(jobs)} if args.policy else None,
+            )
+            parts_left: Dict[int, int] = {}
+            partial: Dict[int, Dict] = {}
+            for job in planned:
+                parts_left[job.tag] = parts_left.get(job.tag, 0) + 1
+
+            def submit(ex: Executor, job: Job) -> Future:
+                return ex.submit(
                     compress_one,
-                    f,
+                    job.src,
                     input_dir,
                     out_dir,
-                    enabled,
-                    config,
-                    args.force,
+                    job.algos,
+                    jobs[job.tag][5],
+                    force,
+                    probe_threshold,
+                    args.probe_action,
+                    args.verify,
+                )
+
+            from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing; see _LazyModule
+
+            with ProcessPoolExecutor(max_workers=args.workers) as ex:
+                for job, fut in run_budgeted(ex, planned, submit, cpu_budget, memory_budget):
+                    part = fut.result()
+                    row = partial.setdefault(job.tag, {})
+                    if "resources" in row and "resources" in part:
+                        part["resources"] = merge_resources(row["resources"], part["resources"])
+                    row.update(part)
+                    parts_left[job.tag] -= 1
+                    if not parts_left[job.tag]:
+                        _, _, missing, key, hits, file_config = jobs[job.tag]
+                        row = partial.pop(job.tag)
+                        keep = ["file", "orig", "probe", *missing, "resources"]
+                        finish({k: row[k] for k in keep if k in row}, key, hits, file_config)
+        else:
+            for f, _, missing, key, hits, file_config in jobs:
+                row = compress_one(
+                    f, input_dir, out_dir, missing, file_config, force, probe_threshold, args.probe_action, args.verify
                 )
-                for f in files
+                finish(row, key, hits, file_config)
+
+        if sevenzip_todo:
+            batches = [
+                sevenzip_todo[i : i + args.sevenzip_batch] for i in range(0, len(sevenzip_todo), args.sevenzip_batch)
             ]
-            for fut in as_completed(futures):
-                row = fut.result()
-                rows.append(row)
-    else:
+            concurrent = max(1, min(args.workers, len(batches)))
+            threads = max(1, args.cpu_budget // concurrent)
+            run = f"{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+
+            def run_batch(index: int) -> Tuple[Dict[str, int], Dict[str, Dict[str, object]]]:
+                archive = out_dir / "7z" / batch_archive_name(run, index)
+                sizes = compress_7z_batch(
+                    [f for f, _, _ in batches[index]], input_dir, archive, level=config.sevenzip_level, threads=threads
+                )
+                checks: Dict[str, Dict[str, object]] = {}
+                if args.verify:
+                    # 7z read the sources itself, so hashing them is an extra read here.
+                    checks = verify_7z_batch(
+                        archive,
+                        {f.relative_to(input_dir).as_posix(): (file_digest(f), size) for f, size, _ in batches[index]},
+                    )
+                return sizes, checks
+
+            # Each batch is one 7z process, so threads are enough to overlap them.
+            with ThreadPoolExecutor(max_workers=concurrent) as tex:
+                futures = {tex.submit(run_batch, i): i for i in range(len(batches))}
+                for fut in wait(futures).done:
+                    index = futures[fut]
+                    try:
+                        (sizes, checks), error = fut.result(), None
+                    except Exception as e:
+                        sizes, checks, error = {}, {}, str(e)
+                    for f, size, key in batches[index]:
+                        rel = str(f.relative_to(input_dir))
+                        packed = sizes.get(rel.replace(os.sep, "/"))
+                        if packed is None:
+                            cell: Dict[str, object] = {"error": error or "missing from 7z listing"}
+                        else:
+                            cell = {"size": packed, "ratio": packed / size, "archive": batch_archive_name(run, index)}
+                            if cache is not None and key is not None:
+                                cache.store(key, {"7z": algo_params(config, "7z")}, {"7z": cell})
+                            cell.update(checks.get(rel.replace(os.sep, "/"), {}))
+                        row = waiting_7z.pop(rel)
+                        row["7z"] = cell  # type: ignore[index]
+                        record(row)  # type: ignore[arg-type]
+    finally:
+        if cache is not None:
+            cache.close()
+        report.flush()
+    dedup_stats: Dict[str, Any] = {}
+    if duplicates:
+        saved = 0
+        for f, original in duplicates.items():
+            row = duplicate_row(
+                originals[str(original.relative_to(input_dir))], str(f.relative_to(input_dir)), out_dir, args.dedup_output
+            )
+            saved += sum(
+                int(c["size"]) for c in row.values() if isinstance(c, dict) and c.get("dedup") in ("hardlink", "reference")
+            )
+            record(row)
+        dedup_stats = report_extra["dedup"] = {
+            "output": args.dedup_output,
+            "groups": len(set(duplicates.values())),
+            "duplicates": len(duplicates),
+            "bytes_not_compressed": sum(e.size for f, e in zip(files, entries) if f in duplicates),
+            "output_bytes_saved": saved,
+        }
+
+    if cache is not None:
+        print()
+        print(f"Cache     : {served} of {len(work)} files served from cache")
+
+    if solid_algos:
+        # One solid stream per group; the per-file numbers for the same codec, when
+        # that codec also ran per file, show what cross-file redundancy is worth.
+        groups: Dict[str, List[Path]] = {}
         for f in files:
-            rows.append(compress_one(f, input_dir, out_dir, enabled, config, args.force))
+            groups.setdefault(ext_group(f), []).append(f)
+        solid_report: Dict[str, object] = {}
+        for group, members in sorted(groups.items()):
+            stats = pack_solid(solid_order(members, input_dir), input_dir, out_dir / "solid", group, solid_algos, config)
+            for algo, cell in stats["algos"].items():  # type: ignore[union-attr]
+                per_file, cells = solid_sizes.get((group, algo), [0, 0])
+                if cells and cells == len(members):
+                    cell["per_file_size"] = per_file
+                    cell["per_file_ratio"] = per_file / stats["orig"] if stats["orig"] else 1.0
+            solid_report[group] = stats
+        report_extra["solid"] = solid_report
 
-    # Summarize, print table, and write reports
-    algo_order = [a for a in enabled if a in rows[0].keys()]
-    header = ["File", "Orig"] + [f"{a} size\t{a} ratio" for a in algo_order]
-    print("\t".join(header))
-    for row in rows:
-        cols: List[str] = [row["file"], human_size(int(row["orig"]))]
-        for a in algo_order:
-            cell = row.get(a) or {}
-            if "size" in cell and "ratio" in cell:
-                cols.append(human_size(int(cell["size"])));
-                cols.append(f"{float(cell['ratio'])*100:.1f}%")
-            else:
-                failures += 1
-                cols += ["FAIL", "N/A"]
-        print("\t".join(cols))
+    if args.trace:
+        write_trace(trace_events, Path(args.trace))
 
-    averages = write_reports(rows, out_dir)
-    print("\n=== Average Compression Ratios (lower is better) ===")
-    for algo, avg in averages.items():
-        if avg == avg:  # not NaN
-            print(f"{algo}: {avg*100:.1f}% of original size")
+    summary = report.close(report_extra)
+    weighted: Dict[str, float] = summary["byte_weighted"]  # type: ignore[assignment]
+    print("\n=== Average Compression Ratios (lower is better; per-file mean, byte-weighted) ===")
+    for algo, avg in summary["averages"].items():  # type: ignore[attr-defined]
+        print(f"{algo}: {avg*100:.1f}% / {weighted[algo]*100:.1f}% of original size")
+    if dedup_stats:
+        print(
+            f"\nDedup: {dedup_stats['duplicates']} duplicates of {dedup_stats['groups']} files, "
+            f"{human_size(dedup_stats['bytes_not_compressed'])} not compressed, "
+            f"{human_size(dedup_stats['output_bytes_saved'])} of output not written ({dedup_stats['output']})"
+        )
+    if "solid" in report_extra:
+        print("\n=== Solid Streams (ratio = total packed / total original) ===")
+        for group, stats in report_extra["solid"].items():  # type: ignore[union-attr]
+            for algo, cell in stats["algos"].items():
+                if "error" in cell:
+                    failures += 1
+                    print(f"{group} [{algo}]: FAIL ({cell['error']})")
+                    continue
+                vs = f", per-file {cell['per_file_ratio']*100:.1f}%" if "per_file_ratio" in cell else ""
+                print(
+                    f"{group} [{algo}]: {stats['files']} files, {cell['ratio']*100:.1f}%{vs}, "
+                    f"{stats['mbps']:.1f} MB/s -> solid/{cell['archive']}"
+                )
 
     if args.strict and failures:
         sys.exit(1)
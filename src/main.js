@@ -53,60 +53,119 @@ ipcMain.handle('select-directory', async () => {
   return null;
 });
 
+// Persistent compression worker
+// compress_worker.py is started once and reused for every job, so repeat runs skip the
+// Python start, dependency check and 7z probe. It speaks NDJSON JSON-RPC over stdio:
+// replies carry the request "id"; while a compress job runs, each compress.py --stream
+// message arrives as {"job": id, "message": {...}} and is forwarded to the renderer.
+let worker = null;
+let workerBuffer = '';
+let nextRequestId = 1;
+const pendingRequests = new Map();
+
+function routeJobMessage(request, message) {
+  if (message.type === 'result') {
+    request.sender.send('compression-result', message);
+  } else if (message.type === 'progress') {
+    request.sender.send('compression-stats', message);
+  }
+}
+
+function handleWorkerLine(line) {
+  if (!line.trim()) return;
+  let message;
+  try {
+    message = JSON.parse(line);
+  } catch (e) {
+    return;
+  }
+  if (message.job !== undefined) {
+    const request = pendingRequests.get(message.job);
+    if (request && request.sender) routeJobMessage(request, message.message);
+  } else if (message.id !== undefined && pendingRequests.has(message.id)) {
+    const request = pendingRequests.get(message.id);
+    pendingRequests.delete(message.id);
+    if (message.error) {
+      request.reject(new Error(message.error));
+    } else {
+      request.resolve(message.result);
+    }
+  }
+}
+
+function startWorker() {
+  const pythonScript = path.join(__dirname, '..', 'compress_worker.py');
+  
+  // Use python3 as default, will fail gracefully if not available
+  const pythonExe = process.platform === 'win32' ? 'python' : 'python3';
+  
+  const child = spawn(pythonExe, [pythonScript]);
+  workerBuffer = '';
+  
+  child.stdout.on('data', (data) => {
+    workerBuffer += data.toString();
+    const lines = workerBuffer.split('\n');
+    workerBuffer = lines.pop();
+    for (const line of lines) {
+      handleWorkerLine(line);
+    }
+  });
+  
+  child.stderr.on('data', (data) => {
+    // Library warnings and per-file errors; show them to whoever has a job running
+    for (const request of pendingRequests.values()) {
+      if (request.sender) request.sender.send('compression-progress', data.toString());
+    }
+  });
+  
+  const fail = (error) => {
+    if (worker === child) worker = null;
+    for (const request of pendingRequests.values()) {
+      request.reject(error);
+    }
+    pendingRequests.clear();
+  };
+  child.on('close', (code) => fail(new Error(`Compression worker exited with code ${code}`)));
+  child.on('error', (error) => fail(new Error(`Failed to start Python process: ${error.message}`)));
+  
+  worker = child;
+  return child;
+}
+
+function callWorker(method, params, sender) {
+  const child = worker || startWorker();
+  const id = nextRequestId++;
+  return {
+    id,
+    promise: new Promise((resolve, reject) => {
+      pendingRequests.set(id, { method, resolve, reject, sender });
+      child.stdin.write(JSON.stringify({ id, method, params }) + '\n');
+    })
+  };
+}
+
 // Handle compression process
 ipcMain.handle('compress-files', async (event, inputDir, outputDir) => {
-  return new Promise((resolve, reject) => {
-    const pythonScript = path.join(__dirname, '..', 'compress.py');
-    
-    // Use python3 as default, will fail gracefully if not available
-    const pythonExe = process.platform === 'win32' ? 'python' : 'python3';
-    
-    const process = spawn(pythonExe, [pythonScript, inputDir, outputDir]);
-    
-    let outputData = '';
-    let errorData = '';
-    
-    process.stdout.on('data', (data) => {
-      const dataStr = data.toString();
-      outputData += dataStr;
-      
-      // Send progress updates to renderer
-      const lines = dataStr.split('\n');
-      for (const line of lines) {
-        if (line.trim() && !line.startsWith('{') && !line.startsWith('[')) {
-          event.sender.send('compression-progress', line);
-        }
-      }
-    });
-    
-    process.stderr.on('data', (data) => {
-      errorData += data.toString();
-      event.sender.send('compression-progress', data.toString());
-    });
-    
-    process.on('close', (code) => {
-      if (code === 0) {
-        try {
-          // Extract JSON from output
-          const jsonMatch = outputData.match(/\{[\s\S]*\}/);
-          if (jsonMatch) {
-            const results = JSON.parse(jsonMatch[0]);
-            resolve(results);
-          } else {
-            resolve({ error: 'No results returned', output: outputData });
-          }
-        } catch (e) {
-          reject(new Error(`Failed to parse results: ${e.message}\n${outputData}`));
-        }
-      } else {
-        reject(new Error(`Process exited with code ${code}\n${errorData}`));
-      }
-    });
-    
-    process.on('error', (error) => {
-      reject(new Error(`Failed to start Python process: ${error.message}`));
-    });
-  });
+  const { promise } = callWorker('compress', { input_dir: inputDir, output_dir: outputDir }, event.sender);
+  const summary = await promise;
+  return { streamed: true, ...summary };
+});
+
+// Cancel this window's running compression jobs
+ipcMain.handle('cancel-compression', async (event) => {
+  const jobs = [...pendingRequests.entries()]
+    .filter(([, request]) => request.method === 'compress' && request.sender === event.sender)
+    .map(([id]) => id);
+  await Promise.all(jobs.map((job) => callWorker('cancel', { job }).promise));
+  return { cancelled: jobs.length };
+});
+
+app.on('will-quit', () => {
+  if (worker) {
+    worker.stdin.write(JSON.stringify({ id: 0, method: 'shutdown' }) + '\n');
+    worker.stdin.end();
+    worker = null;
+  }
 });
 
 // Check if Python is installed
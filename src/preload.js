@@ -5,11 +5,22 @@ const { contextBridge, ipcRenderer } = require('electron');
 contextBridge.exposeInMainWorld('electronAPI', {
   selectDirectory: () => ipcRenderer.invoke('select-directory'),
   compressFiles: (inputDir, outputDir) => ipcRenderer.invoke('compress-files', inputDir, outputDir),
+  cancelCompression: () => ipcRenderer.invoke('cancel-compression'),
   checkPython: () => ipcRenderer.invoke('check-python'),
   onCompressionProgress: (callback) => {
     const subscription = (event, message) => callback(message);
     ipcRenderer.on('compression-progress', subscription);
     // Return unsubscribe function
     return () => ipcRenderer.removeListener('compression-progress', subscription);
+  },
+  onCompressionResult: (callback) => {
+    const subscription = (event, result) => callback(result);
+    ipcRenderer.on('compression-result', subscription);
+    return () => ipcRenderer.removeListener('compression-result', subscription);
+  },
+  onCompressionStats: (callback) => {
+    const subscription = (event, stats) => callback(stats);
+    ipcRenderer.on('compression-stats', subscription);
+    return () => ipcRenderer.removeListener('compression-stats', subscription);
   }
 });
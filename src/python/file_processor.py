@@ -2,46 +2,113 @@
 """
 File optimization script for FORMATnPACKAGE
 Handles image optimization, PDF compression, etc.
+
+Pillow and PyPDF2 are imported on first use, so commands that don't need
+them (and batch workers that only touch images) don't pay for both. PDFs
+are read with the small object reader below, with PyPDF2 as a fallback.
 """
 
 import sys
 import os
+import io
+import re
 import json
+import mmap
+import time
+import zlib
+import hashlib
+import argparse
+import importlib
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
-try:
-    from PIL import Image
-except ImportError:
-    print("Warning: Pillow not installed. Image optimization disabled.")
+# Extensions the batch commands pick up when given a directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.tif', '.tiff', '.bmp', '.gif')
+
+# Seconds between progress lines in the batch commands
+PROGRESS_INTERVAL = 0.5
+
+# Files in flight per batch worker; scanning pauses while the window is full
+BATCH_WINDOW = 4
+
+_modules = {}
 
-try:
-    import PyPDF2
-except ImportError:
-    print("Warning: PyPDF2 not installed. PDF optimization disabled.")
+
+def _load(name):
+    """
+    Import an optional dependency once per process; None if it is missing
+    """
+    if name not in _modules:
+        try:
+            _modules[name] = importlib.import_module(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
 
 
-def optimize_image(image_path, output_path=None, quality=85):
+def optimize_image(image_path, output_path=None, quality=85, max_size=None):
     """
     Optimize an image file
+    
+    The result is written next to output_path (default: over image_path)
+    under a temporary name and renamed into place only if it is smaller
+    than the original; otherwise the original is kept and the result says
+    "skipped". With max_size, images larger than max_size pixels on their
+    longest side are scaled down, and JPEGs are decoded at reduced size
+    (Image.draft) instead of decoding every pixel first.
     """
     try:
-        if 'Image' not in globals():
+        Image = _load('PIL.Image')
+        if Image is None:
             return {"success": False, "error": "Pillow not installed"}
         
         if output_path is None:
             output_path = image_path
         
-        img = Image.open(image_path)
-        
-        # Convert RGBA to RGB if saving as JPEG
-        if img.mode == 'RGBA' and output_path.lower().endswith(('.jpg', '.jpeg')):
-            img = img.convert('RGB')
-        
-        # Optimize and save
-        img.save(output_path, optimize=True, quality=quality)
-        
         original_size = os.path.getsize(image_path)
-        optimized_size = os.path.getsize(output_path)
+        with Image.open(image_path) as img:
+            fmt = img.format
+            info = img.info
+            if max_size and max(img.size) > max_size:
+                img.draft(img.mode, (max_size, max_size))
+                img.thumbnail((max_size, max_size), reducing_gap=2.0)
+            
+            # Convert RGBA to RGB if saving as JPEG
+            if img.mode == 'RGBA' and output_path.lower().endswith(('.jpg', '.jpeg')):
+                img = img.convert('RGB')
+            
+            # Optimize and save to a temp file in the destination directory,
+            # so the rename below is atomic and never crosses filesystems
+            directory = os.path.dirname(os.path.abspath(output_path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix=Path(output_path).suffix + '.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    extra = {k: info[k] for k in ('exif', 'icc_profile') if info.get(k)}
+                    img.save(f, format=fmt, optimize=True, quality=quality, **extra)
+                optimized_size = os.path.getsize(tmp_path)
+                if optimized_size >= original_size:
+                    if os.path.abspath(output_path) == os.path.abspath(image_path):
+                        os.unlink(tmp_path)
+                    else:
+                        # Writing elsewhere: the output is the original, unchanged
+                        shutil.copyfile(image_path, tmp_path)
+                        os.replace(tmp_path, output_path)
+                    return {
+                        "success": True,
+                        "skipped": True,
+                        "original_size": original_size,
+                        "optimized_size": original_size,
+                        "savings_percent": 0.0
+                    }
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        
         savings = ((original_size - optimized_size) / original_size) * 100
         
         return {
@@ -54,12 +121,568 @@ def optimize_image(image_path, output_path=None, quality=85):
         return {"success": False, "error": str(e)}
 
 
+# ---------------------------------------------------------------------------
+# Minimal PDF object reader/writer
+#
+# Enough of the file structure to count pages and read metadata from the
+# trailer, catalog and page tree alone, and to rewrite a file object by
+# object. Classic xref tables, xref streams and object streams are read;
+# the output always uses a classic xref table.
+# ---------------------------------------------------------------------------
+
+PDF_WHITESPACE = b'\x00\t\n\x0c\r '
+PDF_DELIMITERS = b'()<>[]{}/%'
+PDF_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+PDF_XREF_SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)')
+PDF_XREF_ENTRY = re.compile(rb'\s*(\d{1,10})\s+(\d{1,5})\s+([nf])')
+
+# Streams the optimizer never touches: readers expect XMP metadata unfiltered
+PDF_KEEP_TYPES = ('Metadata', 'XRef', 'ObjStm')
+
+
+class PdfError(Exception):
+    """The file uses PDF structure this reader does not handle."""
+
+
+class Name(str):
+    """A PDF name (/Foo), stored without the slash."""
+
+
+class Real(bytes):
+    """A PDF real number, kept as its original text so rewriting never changes it."""
+
+
+class Ref(tuple):
+    """An indirect reference (num gen R)."""
+
+    def __new__(cls, num, gen):
+        return tuple.__new__(cls, (num, gen))
+
+
+class PdfParser:
+    """Parse PDF values from data (bytes or an mmap) starting at pos."""
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def skip_ws(self):
+        data = self.data
+        while self.pos < len(data):
+            c = data[self.pos]
+            if c in PDF_WHITESPACE:
+                self.pos += 1
+            elif c == 0x25:  # % comment to end of line
+                while self.pos < len(data) and data[self.pos] not in b'\r\n':
+                    self.pos += 1
+            else:
+                break
+
+    def token(self):
+        """The next run of regular characters (a keyword or number), without consuming it."""
+        self.skip_ws()
+        end = self.pos
+        while end < len(self.data) and self.data[end] not in PDF_WHITESPACE and self.data[end] not in PDF_DELIMITERS:
+            end += 1
+        return bytes(self.data[self.pos:end])
+
+    def value(self):
+        self.skip_ws()
+        data = self.data
+        c = data[self.pos:self.pos + 2]
+        if c == b'<<':
+            self.pos += 2
+            result = {}
+            while True:
+                self.skip_ws()
+                if data[self.pos:self.pos + 2] == b'>>':
+                    self.pos += 2
+                    return result
+                key = self.value()
+                if not isinstance(key, Name):
+                    raise PdfError(f'dictionary key is not a name at {self.pos}')
+                result[key] = self.value()
+        if c[:1] == b'[':
+            self.pos += 1
+            result = []
+            while True:
+                self.skip_ws()
+                if data[self.pos:self.pos + 1] == b']':
+                    self.pos += 1
+                    return result
+                result.append(self.value())
+        if c[:1] == b'/':
+            self.pos += 1
+            name = self.token()
+            self.pos += len(name)
+            return Name(re.sub(rb'#([0-9A-Fa-f]{2})', lambda m: bytes([int(m.group(1), 16)]), name).decode('latin-1'))
+        if c[:1] == b'(':
+            return self.literal_string()
+        if c[:1] == b'<':
+            end = data.find(b'>', self.pos)
+            hexdigits = re.sub(rb'\s', b'', bytes(data[self.pos + 1:end]))
+            self.pos = end + 1
+            return bytes.fromhex((hexdigits + b'0' * (len(hexdigits) % 2)).decode('ascii'))
+        word = self.token()
+        if not word:
+            raise PdfError(f'unexpected {c!r} at {self.pos}')
+        self.pos += len(word)
+        if word == b'true':
+            return True
+        if word == b'false':
+            return False
+        if word == b'null':
+            return None
+        if not PDF_NUMBER.fullmatch(word):
+            raise PdfError(f'unexpected keyword {word!r} at {self.pos}')
+        if b'.' in word:
+            return Real(word)
+        number = int(word)
+        # "num gen R" is a reference; look ahead without consuming otherwise
+        saved = self.pos
+        gen = self.token()
+        if gen.isdigit():
+            self.pos += len(gen)
+            if self.token() == b'R':
+                self.pos += 1
+                return Ref(number, int(gen))
+        self.pos = saved
+        return number
+
+    def literal_string(self):
+        data = self.data
+        self.pos += 1
+        out = bytearray()
+        depth = 1
+        escapes = {0x6E: b'\n', 0x72: b'\r', 0x74: b'\t', 0x62: b'\b', 0x66: b'\f'}
+        while True:
+            c = data[self.pos]
+            self.pos += 1
+            if c == 0x5C:  # backslash
+                c = data[self.pos]
+                self.pos += 1
+                if c in escapes:
+                    out += escapes[c]
+                elif 0x30 <= c <= 0x37:
+                    digits = bytes([c])
+                    while len(digits) < 3 and 0x30 <= data[self.pos] <= 0x37:
+                        digits += bytes([data[self.pos]])
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif c == 0x0D:  # line continuation
+                    if data[self.pos] == 0x0A:
+                        self.pos += 1
+                elif c != 0x0A:
+                    out.append(c)
+            elif c == 0x28:
+                depth += 1
+                out.append(c)
+            elif c == 0x29:
+                depth -= 1
+                if not depth:
+                    return bytes(out)
+                out.append(c)
+            else:
+                out.append(c)
+
+
+def serialize_pdf(value):
+    """Write a parsed PDF value back out."""
+    if value is True:
+        return b'true'
+    if value is False:
+        return b'false'
+    if value is None:
+        return b'null'
+    if isinstance(value, Name):
+        raw = value.encode('latin-1')
+        return b'/' + b''.join(
+            bytes([c]) if 0x21 <= c <= 0x7E and c not in PDF_DELIMITERS and c != 0x23 else b'#%02X' % c for c in raw
+        )
+    if isinstance(value, Ref):
+        return b'%d %d R' % value
+    if isinstance(value, Real):
+        return bytes(value)
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, bytes):
+        return b'(' + value.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r') + b')'
+    if isinstance(value, list):
+        return b'[' + b' '.join(serialize_pdf(v) for v in value) + b']'
+    if isinstance(value, dict):
+        return b'<<' + b''.join(serialize_pdf(Name(k)) + b' ' + serialize_pdf(v) for k, v in value.items()) + b'>>'
+    raise PdfError(f'cannot write {type(value).__name__}')
+
+
+def _unpredict(data, columns):
+    """Undo PNG row predictors (/Predictor >= 10), as used by xref streams."""
+    out = bytearray()
+    previous = bytearray(columns)
+    for start in range(0, len(data), columns + 1):
+        kind, row = data[start], bytearray(data[start + 1:start + 1 + columns])
+        for i in range(len(row)):
+            left = row[i - 1] if i else 0
+            up = previous[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                upleft = previous[i - 1] if i else 0
+                p = left + up - upleft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upleft)
+                row[i] = (row[i] + (left if pa <= pb and pa <= pc else up if pb <= pc else upleft)) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+
+class PdfFile:
+    """Random access to a PDF's objects through its cross-reference data.
+
+    Only the xref sections and the objects actually asked for are parsed,
+    so on an mmap only those pages of the file are read.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.xref = {}  # num -> (offset, gen) or (objstm num, index) for compressed objects
+        self.compressed = set()
+        self.trailer = {}
+        self._cache = {}
+        tail = bytes(data[-2048:])
+        at = tail.rfind(b'startxref')
+        if at < 0:
+            raise PdfError('no startxref')
+        offset = int(tail[at + 9:].split()[0])
+        seen = set()
+        while offset is not None and offset not in seen:
+            seen.add(offset)
+            section = self._read_xref(offset)
+            for key, value in section.items():
+                self.trailer.setdefault(key, value)
+            if 'XRefStm' in section and section['XRefStm'] not in seen:
+                seen.add(section['XRefStm'])
+                self._read_xref(section['XRefStm'])
+            offset = section.get('Prev')
+
+    def _read_xref(self, offset):
+        """Add one xref section's entries (newer sections were read first) and return its trailer."""
+        parser = PdfParser(self.data, offset)
+        if parser.token() == b'xref':
+            parser.pos += 4
+            while True:
+                parser.skip_ws()
+                if parser.token() == b'trailer':
+                    parser.pos += 7
+                    return parser.value()
+                m = PDF_XREF_SUBSECTION.match(self.data[parser.pos:parser.pos + 32])
+                if not m:
+                    raise PdfError(f'bad xref subsection at {parser.pos}')
+                parser.pos += m.end()
+                first, count = int(m.group(1)), int(m.group(2))
+                for num in range(first, first + count):
+                    e = PDF_XREF_ENTRY.match(self.data[parser.pos:parser.pos + 24])
+                    if not e:
+                        raise PdfError(f'bad xref entry at {parser.pos}')
+                    parser.pos += e.end()
+                    if e.group(3) == b'n' and num not in self.xref:
+                        self.xref[num] = (int(e.group(1)), int(e.group(2)))
+                    elif num not in self.xref:
+                        self.xref[num] = None
+        # Cross-reference stream (PDF 1.5+)
+        _, _, value, raw = self._object_at(offset)
+        if not isinstance(value, dict) or value.get('Type') != 'XRef':
+            raise PdfError(f'no xref at {offset}')
+        data = self.decode_stream(value, raw)
+        widths = value['W']
+        index = value.get('Index', [0, value['Size']])
+        row = sum(widths)
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(data[pos:pos + width], 'big') if width else None)
+                    pos += width
+                kind = 1 if fields[0] is None else fields[0]
+                if num in self.xref:
+                    continue
+                if kind == 1:
+                    self.xref[num] = (fields[1], fields[2] or 0)
+                elif kind == 2:
+                    self.xref[num] = (fields[1], fields[2])
+                    self.compressed.add(num)
+                else:
+                    self.xref[num] = None
+        return value
+
+    def _object_at(self, offset):
+        """(num, gen, value, raw stream bytes or None) of the object at offset."""
+        parser = PdfParser(self.data, offset)
+        num, gen = parser.value(), parser.value()
+        if parser.token() != b'obj':
+            raise PdfError(f'no object at {offset}')
+        parser.pos += 3
+        value = parser.value()
+        raw = None
+        if parser.token() == b'stream':
+            parser.pos += 6
+            if self.data[parser.pos:parser.pos + 2] == b'\r\n':
+                parser.pos += 2
+            elif self.data[parser.pos:parser.pos + 1] in (b'\n', b'\r'):
+                parser.pos += 1
+            length = value.get('Length')
+            if isinstance(length, Ref):
+                length = self.get(length)
+            end = parser.pos + length if isinstance(length, int) else -1
+            after = PdfParser(self.data, end)
+            if end < 0 or after.token() != b'endstream':
+                # Wrong /Length: fall back to the endstream keyword
+                end = self.data.find(b'endstream', parser.pos)
+                while end > parser.pos and self.data[end - 1] in b'\r\n':
+                    end -= 1
+            raw = bytes(self.data[parser.pos:end])
+        return num, gen, value, raw
+
+    def get_object(self, num):
+        """(value, raw stream bytes or None) of object num; (None, None) if it is free or missing."""
+        if num in self._cache:
+            return self._cache[num]
+        entry = self.xref.get(num)
+        if entry is None:
+            result = (None, None)
+        elif num in self.compressed:
+            result = (self._from_object_stream(*entry), None)
+        else:
+            result = self._object_at(entry[0])[2:]
+        self._cache[num] = result
+        return result
+
+    def _from_object_stream(self, stream_num, index):
+        value, raw = self.get_object(stream_num)
+        data = self.decode_stream(value, raw)
+        header = data[:value['First']].split()
+        parser = PdfParser(data, value['First'] + int(header[2 * index + 1]))
+        return parser.value()
+
+    def get(self, value):
+        """Resolve value if it is a reference."""
+        seen = 0
+        while isinstance(value, Ref) and seen < 32:
+            value = self.get_object(value[0])[0]
+            seen += 1
+        return value
+
+    def decode_stream(self, value, raw):
+        """Decode a FlateDecode (or unfiltered) stream; other filters raise PdfError."""
+        filters = self.get(value.get('Filter'))
+        filters = [] if filters is None else filters if isinstance(filters, list) else [filters]
+        if any(f != 'FlateDecode' for f in filters):
+            raise PdfError(f'unsupported filter {filters}')
+        data = zlib.decompress(raw) if filters else raw
+        params = self.get(value.get('DecodeParms')) or {}
+        if isinstance(params, list):
+            params = params[0] or {}
+        if params.get('Predictor', 1) >= 10:
+            data = _unpredict(data, params.get('Columns', 1) * params.get('Colors', 1))
+        return data
+
+    def page_count(self):
+        root = self.get(self.trailer.get('Root'))
+        pages = self.get(root.get('Pages')) if isinstance(root, dict) else None
+        if not isinstance(pages, dict):
+            raise PdfError('no page tree')
+        return self.get(pages.get('Count'))
+
+    def metadata(self):
+        info = self.get(self.trailer.get('Info'))
+        if not isinstance(info, dict) or 'Encrypt' in self.trailer:
+            return {}
+        result = {}
+        for key, value in info.items():
+            value = self.get(value)
+            if isinstance(value, bytes):
+                value = value[2:].decode('utf-16-be', 'replace') if value[:2] == b'\xfe\xff' else value.decode('latin-1')
+                result[key] = value
+        return result
+
+
+def read_pdf_info(pdf_path):
+    """
+    Page count and document info read from the cross-reference data, the
+    trailer, the catalog and the page tree root only
+    """
+    with open(pdf_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pdf = PdfFile(data)
+            return {
+                "success": True,
+                "pages": pdf.page_count(),
+                "size": os.path.getsize(pdf_path),
+                "encrypted": 'Encrypt' in pdf.trailer,
+                "metadata": pdf.metadata()
+            }
+
+
+def _remap(value, moved):
+    """Point references at merged objects; every object is written as generation 0, so every Ref becomes one."""
+    if isinstance(value, Ref):
+        return moved.get(value[0], Ref(value[0], 0))
+    if isinstance(value, list):
+        return [_remap(v, moved) for v in value]
+    if isinstance(value, dict):
+        return {k: _remap(v, moved) for k, v in value.items()}
+    return value
+
+
+def rewrite_pdf(data):
+    """
+    Rewrite a PDF with its streams recompressed and duplicate images and
+    font programs merged; returns (new bytes, stats)
+
+    Unfiltered streams are deflated and single-filter FlateDecode streams
+    are re-deflated at level 9, each only when it gets smaller. Image and
+    embedded font streams with identical dictionaries and data are kept
+    once and every reference points to that copy. Object and xref streams
+    are unpacked, so the result uses plain objects and a classic xref table.
+    Objects are renumbered to generation 0 and references follow them. The
+    linearization dictionary and its hint stream are dropped, since the
+    rewritten layout no longer matches them.
+    """
+    pdf = PdfFile(data)
+    if 'Encrypt' in pdf.trailer:
+        raise PdfError('encrypted')
+    objects = {}
+    for num in sorted(pdf.xref):
+        value, raw = pdf.get_object(num)
+        if value is None and raw is None:
+            continue
+        if isinstance(value, dict) and value.get('Type') in ('XRef', 'ObjStm') and raw is not None:
+            continue  # containers; their contents are written as plain objects
+        objects[num] = [value, raw]
+    for num, (value, raw) in list(objects.items()):
+        if isinstance(value, dict) and 'Linearized' in value:
+            del objects[num]
+            hint = value.get('H')
+            if isinstance(hint, list) and hint:
+                objects.pop(next((n for n, e in pdf.xref.items()
+                                  if e and n not in pdf.compressed and e[0] == hint[0]), None), None)
+
+    stats = {"pages": pdf.page_count(), "streams_recompressed": 0, "duplicates_removed": 0}
+    seen = {}
+    moved = {}
+    for num, entry in objects.items():
+        value, raw = entry
+        if raw is None:
+            continue
+        value = dict(value)
+        value['Length'] = pdf.get(value.get('Length'))
+        filters = pdf.get(value.get('Filter'))
+        if value.get('Type') not in PDF_KEEP_TYPES and value.get('Subtype') != 'XML' and 'DecodeParms' not in value:
+            packed = None
+            if filters is None:
+                packed = zlib.compress(raw, 9)
+            elif filters in ('FlateDecode', ['FlateDecode']):
+                try:
+                    packed = zlib.compress(zlib.decompress(raw), 9)
+                except zlib.error:
+                    packed = None
+            if packed is not None and len(packed) < len(raw):
+                raw = packed
+                value['Filter'] = Name('FlateDecode')
+                stats["streams_recompressed"] += 1
+        value['Length'] = len(raw)
+        entry[0], entry[1] = value, raw
+        if value.get('Subtype') in ('Image', 'Type1C', 'CIDFontType0C', 'OpenType') or 'Length1' in value:
+            key = hashlib.sha256(serialize_pdf(value) + raw).digest()
+            if key in seen:
+                moved[num] = Ref(seen[key], 0)
+            else:
+                seen[key] = num
+    for num in moved:
+        del objects[num]
+    stats["duplicates_removed"] = len(moved)
+
+    out = io.BytesIO()
+    # The version line may end in CR, LF or CRLF, and may follow up to 1 KiB of junk
+    version = re.search(rb'%PDF-\d+\.\d+', bytes(data[:1024]))
+    out.write((version.group() if version else b'%PDF-1.7') + b'\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for num, (value, raw) in objects.items():
+        offsets[num] = out.tell()
+        out.write(b'%d 0 obj\n' % num + serialize_pdf(_remap(value, moved)))
+        if raw is not None:
+            out.write(b'\nstream\n' + raw + b'\nendstream')
+        out.write(b'\nendobj\n')
+    size = max(offsets, default=0) + 1
+    xref_at = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f\r\n' % size)
+    for num in range(1, size):
+        out.write(b'%010d 00000 n\r\n' % offsets[num] if num in offsets else b'0000000000 00000 f\r\n')
+    trailer = {k: v for k, v in pdf.trailer.items() if k not in ('Prev', 'XRefStm', 'Type', 'W', 'Index', 'Filter',
+                                                                   'DecodeParms', 'Length')}
+    trailer['Size'] = size
+    out.write(b'trailer\n' + serialize_pdf(_remap(trailer, moved)) + b'\nstartxref\n%d\n%%%%EOF\n' % xref_at)
+    return out.getvalue(), stats
+
+
+def optimize_pdf(pdf_path, output_path=None):
+    """
+    Recompress a PDF's streams (see rewrite_pdf)
+
+    Like optimize_image, the result goes to a temp file next to output_path
+    (default: over pdf_path) and replaces it only if it is smaller.
+    """
+    try:
+        if output_path is None:
+            output_path = pdf_path
+        original_size = os.path.getsize(pdf_path)
+        with open(pdf_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                rewritten, stats = rewrite_pdf(data)
+        result = {"success": True, "original_size": original_size, **stats}
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.pdf.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if len(rewritten) < original_size:
+                    f.write(rewritten)
+                else:
+                    result["skipped"] = True
+                    if os.path.abspath(output_path) == os.path.abspath(pdf_path):
+                        return {**result, "optimized_size": original_size, "savings_percent": 0.0}
+                    with open(pdf_path, 'rb') as original:
+                        shutil.copyfileobj(original, f)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        optimized_size = os.path.getsize(output_path) if not result.get("skipped") else original_size
+        result["optimized_size"] = optimized_size
+        result["savings_percent"] = round((original_size - optimized_size) / original_size * 100, 2)
+        return result
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 def get_pdf_info(pdf_path):
     """
     Get information about a PDF file
+    
+    The fast path (read_pdf_info) parses only the objects it needs; PyPDF2
+    is the fallback for files it cannot read.
     """
     try:
-        if 'PyPDF2' not in globals():
+        return read_pdf_info(pdf_path)
+    except Exception:
+        pass
+    try:
+        PyPDF2 = _load('PyPDF2')
+        if PyPDF2 is None:
             return {"success": False, "error": "PyPDF2 not installed"}
         
         with open(pdf_path, 'rb') as file:
@@ -75,6 +698,133 @@ def get_pdf_info(pdf_path):
         return {"success": False, "error": str(e)}
 
 
+def iter_files(source, extensions):
+    """
+    Yield paths from a directory (recursively, files with one of extensions),
+    a file list ("@list.txt", one path per line) or stdin ("-")
+    """
+    if source == '-' or source.startswith('@'):
+        lines = sys.stdin if source == '-' else open(source[1:], encoding='utf-8')
+        with lines:
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield line
+        return
+    stack = [source]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(extensions):
+                    yield entry.path
+
+
+def _run_task(task):
+    function, path, output_path, args = task
+    result = function(path, output_path, *args)
+    result["path"] = path
+    if output_path != path:
+        result["output_path"] = output_path
+    return result
+
+
+def run_batch(function, source, extensions, args=(), output_dir=None, workers=None, stream=sys.stdout, unit="files"):
+    """
+    Run function(path, output_path, *args) for every file from source (see
+    iter_files) on a process pool
+    
+    Writes one {"type": "result"} JSON line per file as it finishes,
+    {"type": "progress"} lines every PROGRESS_INTERVAL seconds, and a final
+    {"type": "summary"} line with bytes saved and <unit>/sec (plus pages and
+    pages/sec when results count pages), which is also returned. Files are
+    optimized in place unless output_dir is given, in which case results keep
+    their path relative to source (a directory).
+    
+    At most BATCH_WINDOW files per worker are in flight, so the scan and the
+    work overlap, the first results appear before the scan is done, and
+    memory does not grow with the number of files. Results are written in
+    the order they finish.
+    """
+    def tasks():
+        for path in iter_files(source, extensions):
+            if output_dir:
+                target = os.path.join(output_dir, os.path.relpath(path, source))
+            else:
+                target = path
+            yield function, path, target, args
+    
+    totals = {unit: 0, "optimized": 0, "skipped": 0, "failed": 0, "original_bytes": 0, "bytes_saved": 0}
+    started = time.monotonic()
+    last_progress = started
+    
+    def rates():
+        elapsed = time.monotonic() - started
+        result = {"elapsed": elapsed, f"{unit}_per_s": totals[unit] / elapsed if elapsed > 0 else 0}
+        if "pages" in totals:
+            result["pages_per_s"] = totals["pages"] / elapsed if elapsed > 0 else 0
+        return result
+    
+    def emit(message):
+        stream.write(json.dumps(message) + '\n')
+        stream.flush()
+    
+    def record(result):
+        nonlocal last_progress
+        totals[unit] += 1
+        if not result["success"]:
+            totals["failed"] += 1
+        else:
+            totals["original_bytes"] += result["original_size"]
+            if "pages" in result:
+                totals["pages"] = totals.get("pages", 0) + result["pages"]
+            if result.get("skipped"):
+                totals["skipped"] += 1
+            else:
+                totals["optimized"] += 1
+                totals["bytes_saved"] += result["original_size"] - result["optimized_size"]
+        emit({"type": "result", **result})
+        if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = time.monotonic()
+            emit({"type": "progress", **totals, **rates()})
+    
+    workers = workers or os.cpu_count() or 1
+    pending = tasks()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        exhausted = False
+        while not exhausted or in_flight:
+            while not exhausted and len(in_flight) < BATCH_WINDOW * workers:
+                task = next(pending, None)
+                if task is None:
+                    exhausted = True
+                else:
+                    in_flight.add(executor.submit(_run_task, task))
+            if in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future.result())
+    
+    summary = {"type": "summary", **totals, **rates()}
+    emit(summary)
+    return summary
+
+
+def optimize_images(source, quality=85, max_size=None, output_dir=None, workers=None, stream=sys.stdout):
+    """
+    Optimize every image from source on a process pool (see run_batch)
+    """
+    return run_batch(optimize_image, source, IMAGE_EXTENSIONS, (quality, max_size), output_dir, workers, stream, "images")
+
+
+def optimize_pdfs(source, output_dir=None, workers=None, stream=sys.stdout):
+    """
+    Recompress every PDF from source on a process pool (see run_batch)
+    """
+    return run_batch(optimize_pdf, source, ('.pdf',), (), output_dir, workers, stream, "pdfs")
+
+
 def main():
     """
     Main entry point for the script
@@ -91,6 +841,26 @@ def main():
         result = optimize_image(image_path, quality=quality)
         print(json.dumps(result))
     
+    elif command == "optimize_pdf" and len(sys.argv) >= 3:
+        print(json.dumps(optimize_pdf(sys.argv[2])))
+    
+    elif command in ("optimize_images", "optimize_pdfs") and len(sys.argv) >= 3:
+        parser = argparse.ArgumentParser(prog=f"file_processor.py {command}")
+        parser.add_argument("source", help="Directory, @file list (one path per line) or - for stdin")
+        if command == "optimize_images":
+            parser.add_argument("--quality", type=int, default=85)
+            parser.add_argument("--max-size", type=int, default=None, help="Scale images down to this many pixels on the longest side")
+        parser.add_argument("--out", default=None, help="Write optimized files here instead of in place")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+        args = parser.parse_args(sys.argv[2:])
+        if args.out and (args.source == '-' or args.source.startswith('@')):
+            print(json.dumps({"error": "--out needs a directory source"}))
+            sys.exit(1)
+        if command == "optimize_images":
+            optimize_images(args.source, args.quality, args.max_size, args.out, args.workers)
+        else:
+            optimize_pdfs(args.source, args.out, args.workers)
+    
     elif command == "pdf_info" and len(sys.argv) >= 3:
         pdf_path = sys.argv[2]
         result = get_pdf_info(pdf_path)
@@ -0,0 +1,55 @@
+"""Shared helpers for the Python tests.
+
+Tests run the entry points the way users do: as scripts in a subprocess,
+from a temporary working directory and with relative paths where it matters.
+"""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _private_cache_dir(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep the capability cache out of the real home directory."""
+    cache = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache))
+    monkeypatch.setenv("LOCALAPPDATA", str(cache))
+
+
+def run_script(script: str, *args: str, cwd: Path, check: bool = True) -> subprocess.CompletedProcess:
+    """Run one of the repo's scripts with the test interpreter."""
+    proc = subprocess.run(
+        [sys.executable, str(ROOT / script), *args], cwd=cwd, capture_output=True, text=True
+    )
+    if check and proc.returncode != 0:
+        raise AssertionError(f"{script} {' '.join(args)} exited {proc.returncode}:\n{proc.stdout}\n{proc.stderr}")
+    return proc
+
+
+def report_rows(out_dir: Path) -> Dict[str, Dict]:
+    """Rows of ``report.ndjson`` by file."""
+    rows: List[Dict] = [json.loads(line) for line in (out_dir / "report.ndjson").read_text().splitlines()]
+    return {row["file"]: row for row in rows}
+
+
+def write_text_files(root: Path, count: int, prefix: str = "f", ext: str = ".txt", seed: int = 0) -> List[Path]:
+    """``count`` small compressible files with distinct content."""
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = root / f"{prefix}{i:03d}{ext}"
+        body = " ".join(f"{prefix}-{seed}-{i}-{j} value {j * (i + seed + 1)}" for j in range(40 + i))
+        path.write_text(body)
+        paths.append(path)
+    return paths
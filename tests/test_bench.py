@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import run_script
+
+
+def test_pareto_frontier_drops_dominated_points() -> None:
+    results = [
+        {"point": "a", "ratio": 0.5, "compress_mbps": 100.0},
+        {"point": "b", "ratio": 0.4, "compress_mbps": 50.0},
+        {"point": "c", "ratio": 0.45, "compress_mbps": 40.0},  # b is smaller and faster
+        {"point": "d", "ratio": 0.3, "compress_mbps": 5.0},
+        {"point": "e", "ratio": 0.6, "compress_mbps": 90.0},  # a is smaller and faster
+    ]
+    assert [r["point"] for r in cb.pareto_frontier(results)] == ["a", "b", "d"]
+
+
+def test_sweep_points_cover_every_level() -> None:
+    labels = [p.label for p in cb.sweep_points(["gzip", "xz"])]
+    assert labels[:9] == [f"gzip:{level}" for level in range(1, 10)]
+    assert "xz:0" in labels and "xz:9e" in labels and len(labels) == 29
+    point = cb.sweep_points(["gzip"])[0]
+    result = cb.measure_point(point, {"x": b"abc" * 1000})
+    assert result["bytes"] == 3000 and 0 < result["ratio"] < 1
+
+
+def test_bench_writes_reproducible_results(tmp_path: Path) -> None:
+    args = ["bench", "--generate", "text", "--size-mb", "0.05", "--algos", "gzip", "--out", "results"]
+    run_script("compression_backbone.py", *args, cwd=tmp_path)
+    first = json.loads((tmp_path / "results" / "sweep.json").read_text())
+    run_script("compression_backbone.py", *args, cwd=tmp_path)
+    second = json.loads((tmp_path / "results" / "sweep.json").read_text())
+    assert first["corpus"]["sha256"] == second["corpus"]["sha256"]
+    assert [p["packed"] for p in first["points"]] == [p["packed"] for p in second["points"]]
+    assert first["pareto"] and set(first["pareto"]) <= {p["point"] for p in first["points"]}
+    with open(tmp_path / "results" / "sweep.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["point"] for r in rows] == [f"gzip:{level}" for level in range(1, 10)]
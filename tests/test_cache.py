@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+ARGS = ["in", "--out-dir", "out", "--algos", "gzip", "xz", "--verify", "--strict"]
+
+
+def test_rerun_recompresses_only_changed_files(tmp_path: Path) -> None:
+    files = write_text_files(tmp_path / "in", 3)
+    run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    assert all("cached" not in row["gzip"] for row in report_rows(tmp_path / "out").values())
+
+    files[1].write_text(files[1].read_text() + " edited")
+    stat = files[1].stat()
+    os.utime(files[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    proc = run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    assert "2 of 3 files served from cache" in proc.stdout
+    rows = report_rows(tmp_path / "out")
+    assert rows["f000.txt"]["gzip"]["cached"] and rows["f002.txt"]["xz"]["cached"]
+    edited = rows["f001.txt"]["gzip"]
+    assert "cached" not in edited and edited["verified"] is True
+    assert edited["size"] == (tmp_path / "out" / "gzip" / "f001.txt.gzip").stat().st_size
+
+    # A changed level is a different codec setting, so nothing is served.
+    proc = run_script("compression_backbone.py", *ARGS, "--gzip-level", "1", cwd=tmp_path)
+    assert "0 of 3 files served from cache" in proc.stdout
+
+
+def test_cache_checks_key_and_params(tmp_path: Path) -> None:
+    cache = cb.ResultCache(tmp_path / "cache.sqlite")
+    key = cb.CacheKey("a.txt", 100, 5)
+    cache.store(key, {"gzip": "9", "xz": "6"}, {"gzip": {"size": 40, "ratio": 0.4}, "xz": {"skipped": "probe"}})
+    assert cache.lookup(key, {"gzip": "9"}) == {"gzip": {"size": 40, "ratio": 0.4, "cached": True}}
+    assert cache.lookup(key, {"gzip": "1"}) == {}
+    assert cache.lookup(cb.CacheKey("a.txt", 100, 6), {"gzip": "9"}) == {}
+    assert cache.lookup(cb.CacheKey("a.txt", 100, 5, "abc"), {"gzip": "9"}) == {}
+    assert cache.lookup(key, {"xz": "6"}) == {}
+    cache.close()
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite"
+    params = {"gzip": "9"}
+    cell = {"gzip": {"size": 1, "ratio": 1.0}}
+    cache = cb.ResultCache(path, max_entries=2)
+    for name in ("a", "b"):
+        cache.store(cb.CacheKey(name, 1, 1), params, cell)
+    cache.close()
+    cache = cb.ResultCache(path, max_entries=2)
+    assert cache.lookup(cb.CacheKey("a", 1, 1), params)  # used again in this run, so b is the oldest
+    cache.store(cb.CacheKey("c", 1, 1), params, cell)
+    cache.close()
+    cache = cb.ResultCache(path, max_entries=2)
+    kept = [name for name in "abc" if cache.lookup(cb.CacheKey(name, 1, 1), params)]
+    cache.close()
+    assert kept == ["a", "c"]
+
+
+def test_deleted_output_is_rebuilt(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 3)
+    run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    gzip_out = tmp_path / "out" / "gzip" / "f001.txt.gzip"
+    gzip_out.unlink()
+    (tmp_path / "out" / "xz" / "f002.txt.xz").write_bytes(b"truncated")
+
+    proc = run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    assert "1 of 3 files served from cache" in proc.stdout
+    rows = report_rows(tmp_path / "out")
+    assert "cached" not in rows["f001.txt"]["gzip"] and rows["f001.txt"]["xz"]["cached"]
+    assert gzip_out.stat().st_size == rows["f001.txt"]["gzip"]["size"]
+    assert "cached" not in rows["f002.txt"]["xz"]
+    assert cb.decompressed_digest("xz", tmp_path / "out" / "xz" / "f002.txt.xz")[0] == cb.file_digest(
+        tmp_path / "in" / "f002.txt"
+    )
+
+
+def test_cached_cells_are_verified(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 2)
+    run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    proc = run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    assert "2 of 2 files served from cache" in proc.stdout
+    rows = report_rows(tmp_path / "out")
+    assert all(row[a]["cached"] and row[a]["verified"] is True for row in rows.values() for a in ("gzip", "xz"))
+
+    # Same size, different content: served from the cache, but verification catches it.
+    out = tmp_path / "out" / "gzip" / "f000.txt.gzip"
+    out.write_bytes(bytes(out.stat().st_size))
+    proc = run_script("compression_backbone.py", *ARGS, cwd=tmp_path, check=False)
+    assert proc.returncode == 1 and "VERIFY FAIL" in proc.stdout
+    assert report_rows(tmp_path / "out")["f000.txt"]["gzip"]["verified"] is False
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import gzip
+import json
+import lzma
+import zipfile
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import run_script, write_text_files
+
+
+def _decompress(algo: str, path: Path) -> bytes:
+    if algo == "ZIP":
+        with zipfile.ZipFile(path) as zf:
+            return zf.read(zf.namelist()[0])
+    if algo == "GZIP":
+        return gzip.decompress(path.read_bytes())
+    if algo == "XZ":
+        return lzma.decompress(path.read_bytes())
+    return cb.zstd.ZstdDecompressor().stream_reader(path.read_bytes(), read_across_frames=True).read()
+
+
+def test_relative_dirs_round_trip(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in" / "sub", 3)
+    (tmp_path / "in" / "empty.dat").write_bytes(b"")
+    proc = run_script("compress.py", "in", "out", "--verify", "--workers", "1", cwd=tmp_path)
+    results = json.loads(proc.stdout[proc.stdout.index("{") :])["results"]
+    assert len(results) == 4
+    for result in results:
+        source = Path(result["path"]).read_bytes()
+        for algo, cell in result["compressions"].items():
+            if algo == "Zstd" and not cb.has_zstd():
+                continue
+            assert "error" not in cell, (result["filename"], algo, cell)
+            assert cell["verified"] is True
+            output = Path(cell["output_file"])
+            assert output.is_relative_to(tmp_path / "out")
+            assert _decompress(algo, output) == source
+    assert (tmp_path / "out" / "report.json").exists()
+
+
+def test_stream_mode_ends_with_a_summary(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 2)
+    proc = run_script("compress.py", "in", "out", "--stream", "--workers=1", "--memory-mb=64", cwd=tmp_path)
+    messages = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+    assert sum(1 for m in messages if m["type"] == "result") == 2 * len(messages[-1]["averages"])
+    assert messages[-1]["type"] == "summary" and messages[-1]["total_files"] == 2
+
+
+def test_bad_arguments_are_usage_errors(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 1)
+    for args in (["in", "out", "--memory-mb=abc"], ["in", "out", "--workers", "0"], ["in"]):
+        proc = run_script("compress.py", *args, cwd=tmp_path, check=False)
+        assert proc.returncode == 2
+        assert "usage:" in proc.stderr and "Traceback" not in proc.stderr
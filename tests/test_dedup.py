@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import os
+import random
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+ALGOS = ["zip", "gzip", "xz"]
+
+
+def _tree(root: Path) -> bytes:
+    originals = write_text_files(root / "a", 2)
+    (root / "b").mkdir(parents=True)
+    for path in originals:
+        (root / "b" / path.name).write_bytes(path.read_bytes())
+    noise = random.Random(7).randbytes(256 * 1024)
+    (root / "a" / "rand.bin").write_bytes(noise)
+    (root / "b" / "rand.bin").write_bytes(noise)
+    return noise
+
+
+def test_duplicates_link_the_original_outputs(tmp_path: Path) -> None:
+    _tree(tmp_path / "in")
+    run_script(
+        "compression_backbone.py", "in", "--out-dir", "out", "--algos", *ALGOS, "--dedup", "--verify", "--strict",
+        cwd=tmp_path,
+    )
+    rows = report_rows(tmp_path / "out")
+    duplicate = rows[os.path.join("b", "f000.txt")]
+    assert duplicate["dedup_of"] == os.path.join("a", "f000.txt")
+    for algo in ALGOS:
+        assert duplicate[algo]["dedup"] in ("hardlink", "copy")
+        copy = cb.output_path(tmp_path / "out", algo, duplicate["file"])
+        assert copy.read_bytes() == cb.output_path(tmp_path / "out", algo, duplicate["dedup_of"]).read_bytes()
+
+
+def test_duplicates_of_stored_files_link_the_stored_copy(tmp_path: Path) -> None:
+    noise = _tree(tmp_path / "in")
+    run_script(
+        "compression_backbone.py", "in", "--out-dir", "out", "--algos", *ALGOS,
+        "--dedup", "--probe", "--probe-action", "store", "--strict",
+        cwd=tmp_path,
+    )
+    duplicate = report_rows(tmp_path / "out")[os.path.join("b", "rand.bin")]
+    for algo in ALGOS:
+        assert "error" not in duplicate[algo], duplicate[algo]
+        assert duplicate[algo]["stored"] and duplicate[algo]["dedup"] in ("hardlink", "copy")
+        assert not cb.output_path(tmp_path / "out", algo, duplicate["file"]).exists()
+    assert (tmp_path / "out" / "store" / "b" / "rand.bin").read_bytes() == noise
+
+
+def test_gui_dedup_fills_duplicates_from_the_original(tmp_path: Path) -> None:
+    import compress
+
+    _tree(tmp_path / "in")
+    summary = compress.process_files(str(tmp_path / "in"), str(tmp_path / "out"), workers=1, dedup=True, verify=True)
+    assert summary["dedup"]["duplicates"] == 3
+    by_path = {r["path"]: r for r in summary["results"]}
+    # The scan order decides which copy is the original.
+    duplicates = [r for r in summary["results"] if "dedup_of" in r]
+    assert len(duplicates) == 3
+    for duplicate in duplicates:
+        original = by_path[duplicate["dedup_of"]]
+        assert Path(duplicate["path"]).name == Path(original["path"]).name
+        for algo, cell in duplicate["compressions"].items():
+            if "error" in original["compressions"][algo]:
+                continue
+            assert cell["dedup"] in ("hardlink", "copy")
+            assert Path(cell["output_file"]).read_bytes() == Path(original["compressions"][algo]["output_file"]).read_bytes()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import compression_backbone as cb
+from conftest import run_script
+
+ALGO = "zstd" if cb.has_zstd() else "xz"
+
+
+def _snapshot(root: Path) -> Dict[str, bytes]:
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob("*")) if p.is_file()}
+
+
+def test_delta_packages_restore_every_version(tmp_path: Path) -> None:
+    rng = random.Random(14)
+    src = tmp_path / "in"
+    (src / "sub").mkdir(parents=True)
+    for i in range(4):
+        (src / "sub" / f"t{i}.txt").write_bytes(cb.text_bytes(rng, 96 * 1024))
+    (src / "empty.dat").write_bytes(b"")
+    args = ["delta", "in", "--out-dir", "pk", "--algo", ALGO, "--avg-chunk-kb", "8", "--workers", "2"]
+    run_script("compression_backbone.py", *args, cwd=tmp_path)
+    first = _snapshot(src)
+
+    edited = src / "sub" / "t1.txt"
+    data = edited.read_bytes()
+    edited.write_bytes(data[:5000] + b"inserted line\n" + data[5000:])
+    stat = edited.stat()
+    os.utime(edited, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    (src / "sub" / "t3.txt").unlink()
+    (src / "new.txt").write_bytes(b"brand new\n")
+    proc = run_script("compression_backbone.py", *args, cwd=tmp_path)
+    assert "3 unchanged, 1 changed, 1 added, 1 removed" in proc.stdout
+    second = _snapshot(src)
+
+    manifest = cb.load_manifest(tmp_path / "pk")
+    assert manifest["base"] == cb.delta_packages(tmp_path / "pk")[0]
+    assert manifest["stats"]["chunks_reused"] > manifest["stats"]["chunks_new"]  # an insert moves few boundaries
+    assert manifest["stats"]["read"] < sum(len(v) for v in second.values())
+
+    run_script("compression_backbone.py", "restore", "pk", "latest", cwd=tmp_path)
+    assert _snapshot(tmp_path / "latest") == second
+    first_package = cb.delta_packages(tmp_path / "pk")[0]
+    run_script("compression_backbone.py", "restore", "pk", "older", "--package", first_package, cwd=tmp_path)
+    assert _snapshot(tmp_path / "older") == first
+
+
+def test_restore_reports_digest_mismatches(tmp_path: Path) -> None:
+    src = tmp_path / "in"
+    src.mkdir()
+    (src / "a.txt").write_bytes(cb.text_bytes(random.Random(15), 40 * 1024))
+    run_script("compression_backbone.py", "delta", "in", "--out-dir", "pk", "--algo", ALGO, cwd=tmp_path)
+    manifest = cb.load_manifest(tmp_path / "pk")
+    assert cb.restore_delta(tmp_path / "pk", tmp_path / "good")["failed"] == []
+
+    manifest["files"]["a.txt"]["digest"] = "0" * 64
+    (tmp_path / "pk" / manifest["package"] / cb.DELTA_MANIFEST).write_text(json.dumps(manifest))
+    proc = run_script("compression_backbone.py", "restore", "pk", "bad", cwd=tmp_path, check=False)
+    assert proc.returncode == 1 and "DIGEST MISMATCH: a.txt" in proc.stderr
+
+
+def test_chunk_boundaries_follow_content() -> None:
+    assert len(set(cb._GEAR)) == 256
+    data = cb.text_bytes(random.Random(16), 512 * 1024)
+    before = list(cb.cdc_chunks(io.BytesIO(data), 2048, 8192, 32768))
+    after = list(cb.cdc_chunks(io.BytesIO(data[:1000] + b"x" + data[1000:]), 2048, 8192, 32768))
+    assert b"".join(before) == data
+    assert all(2048 <= len(c) <= 32768 for c in before[:-1])
+    shared = set(before) & set(after)
+    assert len(shared) >= len(before) - 2
+    assert 16 <= len(before) <= 256  # about avg_size on average, not all max_size
+
+
+def test_vectorised_boundaries_match_the_rolling_hash(monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("numpy")
+    rng = random.Random(17)
+    for data in (rng.randbytes(300 * 1024), cb.text_bytes(rng, 300 * 1024), bytes(100 * 1024), b"abc"):
+        fast = list(cb.cdc_chunks(io.BytesIO(data), 2048, 8192, 32768))
+        with monkeypatch.context() as m:
+            m.setattr(cb, "gear_candidates", lambda buf, avg_size: None)
+            assert list(cb.cdc_chunks(io.BytesIO(data), 2048, 8192, 32768)) == fast
+
+
+def test_changed_files_are_digested_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    src = tmp_path / "in"
+    src.mkdir()
+    target = src / "a.txt"
+    target.write_bytes(b"a" * 20000)
+    config = cb.AlgoConfig(frame_size=cb.DELTA_FRAME_SIZE)
+    cb.pack_delta(cb.scan_files(src, min_size=0), src, tmp_path / "pk", ALGO, config, check_content=True)
+    stat = target.stat()
+    target.write_bytes(b"b" * 20000)  # same size and mtime: only the digest tells
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    digested: List[Path] = []
+    quick_digest = cb.quick_digest
+    monkeypatch.setattr(cb, "quick_digest", lambda path: digested.append(path) or quick_digest(path))
+    manifest = cb.pack_delta(cb.scan_files(src, min_size=0), src, tmp_path / "pk", ALGO, config, check_content=True)
+    assert manifest["stats"]["changed"] == 1
+    assert digested == [target]
+    assert manifest["files"]["a.txt"]["quick"] == quick_digest(target)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import io
+import random
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+import compression_backbone as cb
+
+
+class _Broken(io.BytesIO):
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        raise OSError("disk full")
+
+
+def _source(path: Path) -> Path:
+    rng = random.Random(3)
+    path.write_bytes(cb.text_bytes(rng, 2 * cb.CHUNK_SIZE + 12345))
+    return path
+
+
+def test_one_read_feeds_every_codec(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "in").mkdir()
+    src = _source(tmp_path / "in" / "big.txt")
+    reads: List[Path] = []
+    original = cb.read_ahead
+
+    def counting(fin, chunk_size: int = cb.CHUNK_SIZE) -> Iterator[bytes]:
+        reads.append(Path(fin.name))
+        return original(fin, chunk_size)
+
+    monkeypatch.setattr(cb, "read_ahead", counting)
+    algos = [a for a in cb.STREAMING_ALGOS if a != "zstd" or cb.has_zstd()]
+    row = cb.compress_one(src, tmp_path / "in", tmp_path / "out", algos, cb.AlgoConfig(xz_preset=1, xz_extreme=False),
+                          verify=True)
+    assert reads == [src]  # the digest for --verify comes from the same read
+    for algo in algos:
+        assert row[algo]["verified"] is True, row[algo]
+        assert row[algo]["read"] == src.stat().st_size
+
+
+def test_failing_sink_does_not_stop_the_others(tmp_path: Path) -> None:
+    src = _source(tmp_path / "big.txt")
+    good = io.BytesIO()
+    good.close = lambda: None  # type: ignore[method-assign]
+    read, errors = cb.fan_out(src, {"good": good, "bad": _Broken()}, queue_depth=1)
+    assert read == src.stat().st_size
+    assert errors == {"bad": "disk full"}
+    assert good.getvalue() == src.read_bytes()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import Dict, Tuple
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "src" / "python"))
+import file_processor as fp  # noqa: E402
+
+IMAGE = b"<</Type/XObject/Subtype/Image/Width 8/Height 8/BitsPerComponent 8/ColorSpace/DeviceGray/Length 64>>"
+
+
+def _pdf(objects: Dict[Tuple[int, int], bytes], header: bytes = b"%PDF-1.4\n") -> Tuple[bytes, Dict[int, int]]:
+    """A classic-xref PDF from (num, gen) -> object body, and the offset of each object."""
+    out = bytearray(header)
+    offsets: Dict[int, Tuple[int, int]] = {}
+    for (num, gen), body in sorted(objects.items()):
+        offsets[num] = (len(out), gen)
+        out += b"%d %d obj\n" % (num, gen) + body + b"\nendobj\n"
+    size = max(offsets) + 1
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f\r\n" % size
+    for num in range(1, size):
+        offset, gen = offsets.get(num, (0, 0))
+        out += b"%010d %05d %s\r\n" % (offset, gen, b"n" if num in offsets else b"f")
+    out += b"trailer\n<</Size %d/Root 2 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (size, xref)
+    return bytes(out), {num: offset for num, (offset, _) in offsets.items()}
+
+
+def _sample(header: bytes = b"%PDF-1.4\n") -> bytes:
+    """One page whose contents are object 4 generation 1, two identical images, and linearization data."""
+    content = b"BT /F1 12 Tf 72 720 Td (hello) Tj ET " * 20
+    objects = {
+        (1, 0): b"<</Linearized 1/L 0/H[0000000000 4]/O 5/E 0/N 1/T 0>>",
+        (2, 0): b"<</Type/Catalog/Pages 3 0 R>>",
+        (3, 0): b"<</Type/Pages/Kids[5 0 R]/Count 1>>",
+        (4, 1): b"<</Length %d>>\nstream\n" % len(content) + content + b"\nendstream",
+        (5, 0): b"<</Type/Page/Parent 3 0 R/MediaBox[0 0 612 792]/Contents 4 1 R"
+        b"/Resources<</XObject<</A 7 0 R/B 8 0 R>>>>>>",
+        (6, 0): b"<</Length 4/S 0>>\nstream\nhint\nendstream",
+        (7, 0): IMAGE + b"\nstream\n" + bytes(range(64)) + b"\nendstream",
+        (8, 0): IMAGE + b"\nstream\n" + bytes(range(64)) + b"\nendstream",
+    }
+    # The hint offset has a fixed width, so filling it in moves nothing.
+    _, offsets = _pdf(objects, header)
+    objects[(1, 0)] = objects[(1, 0)].replace(b"0000000000", b"%010d" % offsets[6])
+    return _pdf(objects, header)[0]
+
+
+def test_rewrite_keeps_references_resolvable() -> None:
+    rewritten, stats = fp.rewrite_pdf(_sample())
+    pdf = fp.PdfFile(rewritten)
+    page = pdf.get(pdf.get(pdf.get(pdf.trailer["Root"])["Pages"])["Kids"][0])
+    contents = page["Contents"]
+    assert contents == fp.Ref(4, 0) and pdf.xref[4][1] == 0
+    value, raw = pdf.get_object(contents[0])
+    assert b"(hello) Tj" in pdf.decode_stream(value, raw)
+    xobjects = page["Resources"]["XObject"]
+    assert xobjects["A"] == xobjects["B"] and stats["duplicates_removed"] == 1
+    assert stats["pages"] == 1
+
+
+def test_rewrite_drops_linearization() -> None:
+    data = _sample()
+    original = fp.PdfFile(data)
+    assert "Linearized" in original.get_object(1)[0]
+    rewritten, _ = fp.rewrite_pdf(data)
+    pdf = fp.PdfFile(rewritten)
+    assert b"/Linearized" not in rewritten
+    written = {num for num, entry in pdf.xref.items() if entry}
+    assert 1 not in written and 6 not in written
+    assert pdf.page_count() == 1
+
+
+def test_optimize_pdf_round_trip(tmp_path: Path) -> None:
+    source = tmp_path / "in.pdf"
+    source.write_bytes(_sample())
+    result = fp.optimize_pdf(str(source), str(tmp_path / "out.pdf"))
+    assert result["success"], result
+    info = fp.read_pdf_info(str(tmp_path / "out.pdf"))
+    assert info["pages"] == 1
+
+
+def _xref_stream_pdf() -> bytes:
+    """Catalog, page tree and info inside a compressed object stream, indexed by an xref stream."""
+    members = [
+        (2, b"<</Type/Catalog/Pages 3 0 R>>"),
+        (3, b"<</Type/Pages/Kids[4 0 R]/Count 1>>"),
+        (5, b"<</Title(Survey \\(2024\\))/Producer<FEFF0041>>>"),
+    ]
+    body = b""
+    header = b""
+    for num, obj in members:
+        header += b"%d %d " % (num, len(body))
+        body += obj + b" "
+    objstm = zlib.compress(header + body)
+    out = bytearray(b"%PDF-1.5\n")
+    offsets = {1: len(out)}
+    out += b"1 0 obj\n<</Type/ObjStm/N 3/First %d/Filter/FlateDecode/Length %d>>\nstream\n" % (len(header), len(objstm))
+    out += objstm + b"\nendstream\nendobj\n"
+    offsets[4] = len(out)
+    out += b"4 0 obj\n<</Type/Page/Parent 3 0 R/MediaBox[0 0 10 10]>>\nendobj\n"
+    offsets[6] = len(out)
+    entries = [(0, 0, 65535), (1, offsets[1], 0), (2, 1, 0), (2, 1, 1), (1, offsets[4], 0), (2, 1, 2), (1, offsets[6], 0)]
+    rows = b"".join(struct.pack(">BIH", *entry) for entry in entries)
+    out += b"6 0 obj\n<</Type/XRef/Size 7/W[1 4 2]/Root 2 0 R/Info 5 0 R/Length %d>>\nstream\n" % len(rows)
+    out += rows + b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % offsets[6]
+    return bytes(out)
+
+
+def test_reader_follows_xref_and_object_streams(tmp_path: Path) -> None:
+    path = tmp_path / "modern.pdf"
+    path.write_bytes(_xref_stream_pdf())
+    info = fp.read_pdf_info(str(path))
+    assert info["pages"] == 1 and not info["encrypted"]
+    assert info["metadata"] == {"Title": "Survey (2024)", "Producer": "A"}
+
+    rewritten, stats = fp.rewrite_pdf(path.read_bytes())
+    assert stats["pages"] == 1 and b"/ObjStm" not in rewritten and b"/XRef" not in rewritten
+    assert fp.PdfFile(rewritten).metadata()["Title"] == "Survey (2024)"
+
+
+def test_rewrite_keeps_the_version_whatever_the_line_ending() -> None:
+    for eol in (b"\r", b"\r\n", b"\n"):
+        rewritten, _ = fp.rewrite_pdf(_sample(b"%PDF-1.5" + eol))
+        assert rewritten.startswith(b"%PDF-1.5\n%"), eol
+        assert fp.PdfFile(rewritten).page_count() == 1
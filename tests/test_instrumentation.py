@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+
+def test_reports_carry_per_codec_timing_and_a_trace(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 4)
+    run_script("compression_backbone.py", "in", "--out-dir", "out", "--algos", "gzip", "xz",
+               "--trace", "trace.json", cwd=tmp_path)
+    rows = report_rows(tmp_path / "out")
+    for name, row in rows.items():
+        for algo in ("gzip", "xz"):
+            cell = row[algo]
+            assert cell["read"] == row["orig"] and cell["written"] == cell["size"]
+            assert cell["seconds"] >= 0 and cell["cpu_user"] >= 0
+            assert "t0" not in cell and "pid" not in cell  # trace-only fields
+        assert row["resources"]["peak_rss"] > 0
+
+    timing = json.loads((tmp_path / "out" / "report.json").read_text())["timing"]
+    assert timing["gzip"]["files"] == 4 and timing["gzip"]["read"] == sum(r["orig"] for r in rows.values())
+    assert timing["xz"]["p50_s"] <= timing["xz"]["p95_s"]
+
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    assert len(spans) == 8 and {e["cat"] for e in spans} == {"gzip", "xz"}
+    assert all(e["dur"] >= 0 and e["ts"] >= 0 for e in spans)
+
+
+def test_latency_histogram_is_within_one_percent() -> None:
+    histogram = cb.LatencyHistogram()
+    values = [0.001 * (i + 1) for i in range(1000)]
+    for value in values:
+        histogram.add(value)
+    for pct, exact in ((50, values[499]), (95, values[949]), (99, values[989])):
+        assert exact <= histogram.percentile(pct) <= 1.01 * exact
+    assert histogram.percentile(100) == values[-1]
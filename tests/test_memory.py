@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+
+import compress
+import compression_backbone as cb
+
+MB = 1 << 20
+
+
+@pytest.mark.parametrize("limit_mb", [48, 256])
+def test_clamped_config_fits_the_limit(limit_mb: int) -> None:
+    size = 512 * MB
+    config = compress.clamp_config(["ZIP", "GZIP", "XZ", "Zstd"], size, limit_mb * MB)
+    fixed = sum(cb.estimate_memory(config, c, size) for c in ("zip", "gzip"))
+    share = (limit_mb * MB - fixed) // 2
+    assert cb.estimate_memory(config, "xz", size) <= share
+    if cb.has_zstd():
+        assert cb.estimate_memory(config, "zstd", size) <= share
+        assert config.zstd_level <= compress.GUI_CONFIG.zstd_level
+
+
+def test_fit_memory_prefers_the_window_over_the_level() -> None:
+    if not cb.has_zstd():
+        pytest.skip("zstandard not installed")
+    config = cb.AlgoConfig(zstd_level=19)
+    full = cb.estimate_memory(config, "zstd", 1 << 30)
+    fitted = cb.fit_memory(config, "zstd", 1 << 30, full // 4)
+    assert fitted.zstd_level == 19 and 0 < fitted.zstd_window_log
+    assert cb.estimate_memory(fitted, "zstd", 1 << 30) <= full // 4
+    assert cb.fit_memory(config, "zstd", 1 << 30, full) is config
+
+
+def test_compress_file_reports_clamped_settings(tmp_path: Path) -> None:
+    src = tmp_path / "in" / "data.txt"
+    src.parent.mkdir()
+    src.write_bytes(cb.text_bytes(random.Random(11), 2 * MB))
+    row, result = compress.compress_file(str(src), str(tmp_path / "in"), str(tmp_path / "out"),
+                                         ["GZIP", "XZ", "Zstd"], verify=True, memory_limit=48 * MB)
+    xz = result["compressions"]["XZ"]
+    assert xz["verified"] is True and xz["clamped"]["level"] < compress.GUI_CONFIG.xz_preset
+    if cb.has_zstd():
+        assert result["compressions"]["Zstd"]["verified"] is True
+        assert "clamped" in result["compressions"]["Zstd"]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import io
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "src" / "python"))
+import file_processor as fp  # noqa: E402
+
+
+def _tree(root: Path) -> None:
+    (root / "a" / "b").mkdir(parents=True)
+    for name in ("one.jpg", "a/two.PNG", "a/b/three.webp", "a/notes.txt"):
+        (root / name).write_bytes(b"x")
+
+
+def test_iter_files_walks_directories_and_lists(tmp_path: Path) -> None:
+    _tree(tmp_path / "src")
+    paths = fp.iter_files(str(tmp_path / "src"), fp.IMAGE_EXTENSIONS)
+    found = sorted(Path(p).relative_to(tmp_path / "src").as_posix() for p in paths)
+    assert found == ["a/b/three.webp", "a/two.PNG", "one.jpg"]
+    listing = tmp_path / "list.txt"
+    listing.write_text("first.png\n\n  second.jpg  \n")
+    assert list(fp.iter_files(f"@{listing}", fp.IMAGE_EXTENSIONS)) == ["first.png", "second.jpg"]
+
+
+def test_batch_reports_every_file_and_a_summary(tmp_path: Path) -> None:
+    _tree(tmp_path / "src")
+    stream = io.StringIO()
+    summary = fp.optimize_images(str(tmp_path / "src"), output_dir=str(tmp_path / "out"), workers=2, stream=stream)
+    messages = [json.loads(line) for line in stream.getvalue().splitlines()]
+    results = [m for m in messages if m["type"] == "result"]
+    assert len(results) == 3 and messages[-1] == {**summary, "type": "summary"}
+    assert summary["images"] == 3 and summary["failed"] == 3  # the files are not real images
+    assert all(r["output_path"].startswith(str(tmp_path / "out")) for r in results)
+
+
+def test_images_shrink_or_are_kept(tmp_path: Path) -> None:
+    Image = pytest.importorskip("PIL.Image")
+    rng = random.Random(12)
+    big = tmp_path / "big.png"
+    Image.frombytes("L", (600, 400), bytes(rng.randrange(4) * 60 for _ in range(600 * 400))).save(big, compress_level=0)
+    result = fp.optimize_image(str(big), str(tmp_path / "out" / "big.png"), max_size=300)
+    assert result["success"] and result["optimized_size"] < result["original_size"]
+    with Image.open(tmp_path / "out" / "big.png") as img:
+        assert max(img.size) == 300
+
+    noise = tmp_path / "noise.png"
+    Image.frombytes("L", (64, 64), rng.randbytes(64 * 64)).save(noise, optimize=True)
+    before = noise.read_bytes()
+    result = fp.optimize_image(str(noise))
+    assert result["success"] and (result.get("skipped") or result["optimized_size"] < len(before))
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_batch_results_overlap_the_scan(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    scanned = []
+
+    def slow_scan(source: str, extensions: tuple):
+        for i in range(200):
+            scanned.append(i)
+            yield str(tmp_path / f"missing{i}.pdf")
+
+    class Stream(io.StringIO):
+        def write(self, text: str) -> int:
+            if '"type": "result"' in text:
+                results.append(len(scanned))
+            return super().write(text)
+
+    results: list = []
+    monkeypatch.setattr(fp, "iter_files", slow_scan)
+    summary = fp.optimize_pdfs(str(tmp_path), workers=2, stream=Stream())
+    assert summary["pdfs"] == summary["failed"] == 200
+    # The first result arrives long before the scan ends, and the scan never runs far ahead.
+    assert results[0] <= fp.BATCH_WINDOW * 2 + 1
+    assert all(seen - done <= fp.BATCH_WINDOW * 2 + 1 for done, seen in enumerate(results))
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import gzip
+import lzma
+import random
+from pathlib import Path
+from typing import Dict
+
+import compression_backbone as cb
+
+BLOCK = 64 * 1024
+
+
+def _compress(src: Path, out: Path, threads: int) -> Dict[str, bytes]:
+    config = cb.AlgoConfig(xz_preset=1, xz_extreme=False, zstd_level=3, threads=threads, parallel_threshold=1,
+                           block_size=BLOCK)
+    algos = ["gzip", "xz", *(["zstd"] if cb.has_zstd() else [])]
+    row = cb.compress_one(src, src.parent, out, algos, config, verify=True)
+    assert all(row[a]["verified"] is True for a in algos), row
+    return {a: cb.output_path(out, a, src.name).read_bytes() for a in algos}
+
+
+def test_block_parallel_output_is_standard_and_deterministic(tmp_path: Path) -> None:
+    src = tmp_path / "big.txt"
+    data = cb.text_bytes(random.Random(4), 5 * BLOCK + 999)
+    src.write_bytes(data)
+    four = _compress(src, tmp_path / "four", 4)
+    # Stock decoders read the concatenated members / streams.
+    assert gzip.decompress(four["gzip"]) == data
+    assert lzma.decompress(four["xz"]) == data
+    with open(tmp_path / "four" / "xz" / "big.txt.xz", "rb") as f:
+        assert len(cb._xz_streams(f, len(four["xz"]))) == 6
+    # Blocks are cut by size, not by thread count, so the bytes do not depend on it.
+    two = _compress(src, tmp_path / "two", 2)
+    assert two["gzip"] == four["gzip"] and two["xz"] == four["xz"]
+
+
+def test_threads_apply_above_the_threshold() -> None:
+    config = cb.AlgoConfig(threads=4, parallel_threshold=1024 * 1024)
+    assert config.threads_for(1024) == 1 and config.threads_for(2 * 1024 * 1024) == 4
+    assert config.cores_for(2 * 1024 * 1024, ["zip", "gzip", "xz"]) == 9
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+import compress
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+ALGOS = ["zip", "gzip", "xz", "zstd"]
+
+
+@pytest.fixture
+def text(tmp_path: Path) -> Path:
+    path = tmp_path / "notes.txt"
+    path.write_bytes(cb.text_bytes(random.Random(8), 256 * 1024))
+    return path
+
+
+def test_store_decisions(tmp_path: Path) -> None:
+    config = cb.AlgoConfig()
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"not read at all")
+    assert cb.choose_codec(photo, 15, ALGOS, config).reason == "extension"
+    noise = tmp_path / "noise.bin"
+    noise.write_bytes(random.Random(9).randbytes(64 * 1024))
+    decision = cb.choose_codec(noise, 64 * 1024, ALGOS, config)
+    assert (decision.algo, decision.reason) == ("store", "probe")
+    # Compressible, but every container costs more than it saves.
+    tiny = tmp_path / "tiny.txt"
+    tiny.write_bytes(b"a" * 24)
+    assert not cb.probe_file(tiny).hopeless()
+    decision = cb.choose_codec(tiny, 24, ALGOS, config)
+    assert (decision.algo, decision.reason) == ("store", "overhead") and decision.predicted
+
+
+def test_targets_trade_size_for_speed(text: Path) -> None:
+    config = cb.AlgoConfig()
+    size = text.stat().st_size
+    smallest = cb.choose_codec(text, size, ALGOS, config, "size")
+    fastest = cb.choose_codec(text, size, ALGOS, config, "speed")
+    predicted = smallest.predicted
+    key = lambda d: f"{d.algo}:{d.level}"  # noqa: E731
+    assert predicted[key(smallest)]["ratio"] == min(p["ratio"] for p in predicted.values())
+    assert predicted[key(fastest)]["mbps"] == max(p["mbps"] for p in predicted.values())
+    floor = cb.choose_codec(text, size, ALGOS, config, "size", min_mbps=50)
+    assert predicted[key(floor)]["mbps"] >= 50
+    assert cb.choose_codec(text, size, ["gzip"], config, "balanced").algo == "gzip"
+    with pytest.raises(ValueError):
+        cb.choose_codec(text, size, ["7z"], config)
+
+
+def test_policy_run_writes_one_output_per_file(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 2)
+    (tmp_path / "in" / "noise.bin").write_bytes(random.Random(10).randbytes(64 * 1024))
+    run_script("compression_backbone.py", "in", "--out-dir", "out", "--algos", "gzip", "xz",
+               "--policy", "balanced", "--verify", "--strict", cwd=tmp_path)
+    rows = report_rows(tmp_path / "out")
+    for name, row in rows.items():
+        choice = row["policy"]["choice"].split(":")[0]
+        cells = [k for k in row if k not in cb.META_KEYS]
+        assert cells == [choice] and row[choice]["verified"] is True, row
+    assert rows["noise.bin"]["policy"]["choice"] == "store"
+    assert (tmp_path / "out" / "store" / "noise.bin").read_bytes() == (tmp_path / "in" / "noise.bin").read_bytes()
+
+
+def test_policy_without_a_streaming_codec_is_a_usage_error(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 1)
+    proc = run_script("compression_backbone.py", "in", "--algos", "7z", "--policy", "size", cwd=tmp_path, check=False)
+    assert proc.returncode == 2
+    assert "usage:" in proc.stderr and "--policy" in proc.stderr and "Traceback" not in proc.stderr
+
+
+def test_gui_policy_reports_the_chosen_codec(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 2)
+    (tmp_path / "in" / "noise.bin").write_bytes(random.Random(11).randbytes(64 * 1024))
+    proc = run_script("compress.py", "in", "out", "--policy", "size", "--verify", "--workers", "1", cwd=tmp_path)
+    results = {r["filename"]: r for r in json.loads(proc.stdout[proc.stdout.index("{") :])["results"]}
+    assert results["noise.bin"]["policy"] == {"choice": "store", "reason": "probe"}
+    assert list(results["noise.bin"]["compressions"]) == ["Store"]
+    for name in ("f000.txt", "f001.txt"):
+        (algo, cell), = results[name]["compressions"].items()
+        assert compress.CODECS[algo] == results[name]["policy"]["choice"].split(":")[0]
+        assert cell["verified"] is True and Path(cell["output_file"]).exists()
+    rows = report_rows(tmp_path / "out")
+    assert rows["noise.bin"]["policy"]["choice"] == "store" and rows["noise.bin"]["store"]["stored"]
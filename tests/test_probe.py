@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+
+def test_probe_reads_a_bounded_sample(tmp_path: Path) -> None:
+    noise = tmp_path / "noise.bin"
+    noise.write_bytes(random.Random(1).randbytes(4 * 1024 * 1024))
+    result = cb.probe_file(noise)
+    assert result.hopeless() and result.entropy > 7.9
+    assert result.sampled == cb.PROBE_SAMPLES * cb.PROBE_WINDOW
+
+    text = write_text_files(tmp_path, 1)[0]
+    result = cb.probe_file(text)
+    assert not result.hopeless() and result.sampled == text.stat().st_size
+    (tmp_path / "empty").touch()
+    assert cb.probe_file(tmp_path / "empty").sampled == 0
+
+
+def test_probe_skips_hopeless_files(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 2)
+    (tmp_path / "in" / "noise.bin").write_bytes(random.Random(2).randbytes(512 * 1024))
+    run_script("compression_backbone.py", "in", "--out-dir", "out", "--algos", "gzip", "xz", "--probe", cwd=tmp_path)
+    rows = report_rows(tmp_path / "out")
+    assert rows["noise.bin"]["gzip"] == {"skipped": "probe"} and rows["noise.bin"]["probe"]["ratio"] >= 0.97
+    assert not (tmp_path / "out" / "gzip" / "noise.bin.gzip").exists()
+    text = rows["f000.txt"]
+    assert text["gzip"]["ratio"] < 1 and "skipped" not in text["xz"]
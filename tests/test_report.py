@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+ARGS = ["in", "--out-dir", "out", "--algos", "gzip", "xz", "--no-cache", "--workers", "1"]
+
+
+def test_resume_continues_an_interrupted_run(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 6)
+    run_script("compression_backbone.py", *ARGS, cwd=tmp_path)
+    full = json.loads((tmp_path / "out" / "report.json").read_text())
+
+    # Keep two complete rows and half of the third, as a crash would.
+    ndjson = tmp_path / "out" / cb.REPORT_NDJSON
+    lines = ndjson.read_bytes().splitlines(keepends=True)
+    ndjson.write_bytes(b"".join(lines[:2]) + lines[2][: len(lines[2]) // 2])
+    (tmp_path / "out" / "report.json").unlink()
+    kept = [json.loads(line)["file"] for line in lines[:2]]
+
+    proc = run_script("compression_backbone.py", *ARGS, "--resume", cwd=tmp_path)
+    assert "Resumed   : 2 files" in proc.stdout
+    rows = [json.loads(line) for line in ndjson.read_text().splitlines()]
+    assert sorted(r["file"] for r in rows) == [f"f{i:03d}.txt" for i in range(6)]
+    assert [r["file"] for r in rows[:2]] == kept
+    with open(tmp_path / "out" / "report.csv", newline="") as f:
+        assert len(list(csv.reader(f))) == 7
+    resumed = json.loads((tmp_path / "out" / "report.json").read_text())
+    assert resumed["rows"] == full["rows"] == 6
+    assert resumed["averages"] == full["averages"]
+
+
+def test_stats_aggregate_without_keeping_rows(tmp_path: Path) -> None:
+    writer = cb.ReportWriter(tmp_path, ["gzip"])
+    for i in range(1, 5):
+        timing = cb.timing_cell(0.0, (0.0, 0.0), 100 * i, 10 * i)
+        writer.add({"file": f"x{i}.txt", "orig": 100 * i, "gzip": {"size": 10 * i, "ratio": 0.1, **timing}})
+    writer.add({"file": "y.bin", "orig": 50, "gzip": {"error": "boom"}})
+    report = writer.close()
+    assert report["rows"] == 5
+    assert report["byte_weighted"]["gzip"] == 0.1 and report["averages"]["gzip"] == 0.1
+    assert report["by_extension"][".txt"]["files"] == 4
+    assert report["timing"]["gzip"]["files"] == 4 and report["timing"]["gzip"]["read"] == 1000
+    assert len(report_rows(tmp_path)) == 5
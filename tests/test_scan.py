@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+
+def _tree(root: Path) -> None:
+    for d in range(6):
+        write_text_files(root / f"d{d}" / "sub", 4, prefix=f"x{d}_")
+        write_text_files(root / f"d{d}", 3, prefix=f"y{d}_")
+
+
+def test_scan_files_finds_every_file_and_prunes_excluded(tmp_path: Path) -> None:
+    _tree(tmp_path / "in")
+    out = tmp_path / "in" / "d0" / "out"
+    write_text_files(out, 2)
+    found = {Path(e.path) for e in cb.scan_files(tmp_path / "in", exclude=[out], threads=8)}
+    expected = {p for p in (tmp_path / "in").rglob("*.txt") if out not in p.parents}
+    assert found == expected
+    assert len(found) == 6 * 7
+
+
+def test_max_files_picks_the_same_files_every_run(tmp_path: Path) -> None:
+    _tree(tmp_path / "in")
+    expected = sorted(str(p.relative_to(tmp_path / "in")) for p in (tmp_path / "in").rglob("*.txt"))[:5]
+    for run in range(3):
+        out = f"out{run}"
+        run_script(
+            "compression_backbone.py", "in", "--out-dir", out, "--algos", "gzip", "--max-files", "5",
+            "--scan-threads", "8", "--no-cache", cwd=tmp_path,
+        )
+        assert sorted(report_rows(tmp_path / out)) == expected
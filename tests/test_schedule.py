@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import compression_backbone as cb
+
+MB = 1024 * 1024
+
+
+def test_plan_is_longest_first_and_splits_a_dominant_file() -> None:
+    config = cb.AlgoConfig()
+    entries = [(Path(f"f{i}"), size, ["gzip", "xz"], i) for i, size in enumerate([1 * MB, 2 * MB, 1 * MB])]
+    entries.append((Path("huge"), 500 * MB, ["gzip", "xz"], "huge"))
+    jobs = cb.plan_jobs(entries, config, cpu_budget=4)
+    seconds = [job.seconds for job in jobs]
+    assert seconds == sorted(seconds, reverse=True)
+    assert [(job.tag, job.algos) for job in jobs[:2]] == [("huge", ["xz"]), ("huge", ["gzip"])]
+    assert jobs[2].tag == 1 and {job.tag for job in jobs[3:]} == {0, 2}
+
+
+def test_dispatch_stays_within_the_budgets() -> None:
+    jobs = [cb.Job(Path(str(i)), 1, ["gzip"], cores=cores, memory=memory, seconds=1.0, tag=i)
+            for i, (cores, memory) in enumerate([(3, 10), (2, 10), (2, 60), (1, 10), (1, 10), (8, 10)])]
+    lock = threading.Lock()
+    cores_in_use = [0]
+    memory_in_use = [0]
+    peaks: List[tuple] = []
+    alone: List[bool] = []
+
+    def run(job: cb.Job) -> None:
+        with lock:
+            cores_in_use[0] += job.cores
+            memory_in_use[0] += job.memory
+            peaks.append((cores_in_use[0], memory_in_use[0]))
+            if job.cores > 4:
+                alone.append(cores_in_use[0] == job.cores)
+        time.sleep(0.02)
+        with lock:
+            cores_in_use[0] -= job.cores
+            memory_in_use[0] -= job.memory
+
+    def submit(ex: Executor, job: cb.Job) -> Future:
+        return ex.submit(run, job)
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        finished = [job.tag for job, fut in cb.run_budgeted(ex, jobs, submit, cpu_budget=4, memory_budget=64)
+                    if fut.result() is None]
+    assert sorted(finished) == list(range(len(jobs)))
+    assert alone == [True]  # wider than the budget: runs, but by itself
+    assert all(memory <= 64 for cores, memory in peaks)
+    assert all(cores <= 4 for cores, memory in peaks if cores != 8)
+
+
+def test_parts_of_one_file_can_store_it_at_once(tmp_path: Path) -> None:
+    src = tmp_path / "in" / "noise.bin"
+    src.parent.mkdir()
+    src.write_bytes(bytes(range(256)) * 4096)
+    out = tmp_path / "out"
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        sizes = list(ex.map(lambda _: cb.store_only(src, out, True, "noise.bin"), range(32)))
+    assert sizes == [src.stat().st_size] * 32
+    assert (out / "store" / "noise.bin").read_bytes() == src.read_bytes()
+    assert [p.name for p in (out / "store").iterdir()] == ["noise.bin"]  # no temp files left
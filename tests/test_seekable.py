@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import lzma
+import random
+from pathlib import Path
+
+import pytest
+
+import compression_backbone as cb
+
+FRAME = 16 * 1024
+
+
+@pytest.fixture(scope="module")
+def data() -> bytes:
+    return cb.text_bytes(random.Random(6), 10 * FRAME + 777)
+
+
+needs_zstd = pytest.mark.skipif(not cb.has_zstd(), reason="zstandard not installed")
+
+
+@pytest.mark.parametrize("algo", ["xz", pytest.param("zstd", marks=needs_zstd)])
+def test_random_reads_match_the_source(tmp_path: Path, data: bytes, algo: str) -> None:
+    src = tmp_path / "data.txt"
+    src.write_bytes(data)
+    config = cb.AlgoConfig(xz_preset=1, xz_extreme=False, zstd_level=3, frame_size=FRAME)
+    row = cb.compress_one(src, tmp_path, tmp_path / "out", [algo], config, verify=True)
+    assert row[algo]["verified"] is True  # stock decoders still read the whole file
+    path = cb.output_path(tmp_path / "out", algo, "data.txt")
+    with cb.SeekableReader(path) as reader:
+        assert reader.format == algo and reader.size == len(data)
+        assert len(reader.frames) == 11
+        rng = random.Random(7)
+        for _ in range(50):
+            offset = rng.randrange(len(data))
+            length = rng.randrange(1, 3 * FRAME)
+            assert reader.read(offset, length) == data[offset : offset + length]
+        assert reader.read(len(data) - 5, 100) == data[-5:]
+        assert reader.read(len(data) + 10, 10) == b""
+
+
+def test_single_stream_xz_is_one_frame(tmp_path: Path, data: bytes) -> None:
+    path = tmp_path / "plain.xz"
+    path.write_bytes(lzma.compress(data, preset=1))
+    with cb.SeekableReader(path) as reader:
+        assert len(reader.frames) == 1 and reader.read(FRAME, 10) == data[FRAME : FRAME + 10]
+
+
+@needs_zstd
+def test_zstd_without_seek_table_is_rejected(tmp_path: Path, data: bytes) -> None:
+    path = tmp_path / "plain.zst"
+    path.write_bytes(cb.zstd.ZstdCompressor(level=1).compress(data))
+    with pytest.raises(ValueError, match="seek table"):
+        cb.SeekableReader(path)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+LISTING = """\
+7-Zip 23.01 (x64) : Copyright (c) 1999-2023 Igor Pavlov : 2023-06-20
+
+Listing archive: batch_00000.7z
+
+--
+Path = batch_00000.7z
+Type = 7z
+Physical Size = 812
+Headers Size = 230
+Method = LZMA2:24
+Solid = -
+Blocks = 2
+
+----------\r
+Path = sub\\a.txt\r
+Size = 1200\r
+Packed Size = 301\r
+Folder = -\r
+\r
+Path = sub\r
+Size = 0\r
+Packed Size = 0\r
+Folder = +\r
+\r
+Path = b.txt
+Size = 900
+Packed Size = 281
+Folder = -
+"""
+
+
+def test_listing_gives_each_member_its_own_size() -> None:
+    assert cb._parse_7z_listing(LISTING) == {"sub/a.txt": 301, "b.txt": 281}
+    assert cb._parse_7z_listing(LISTING, field="Size") == {"sub/a.txt": 1200, "b.txt": 900}
+
+
+@pytest.mark.skipif(cb.find_7z() is None, reason="7z not installed")
+def test_batch_archive_round_trips(tmp_path: Path) -> None:
+    files = write_text_files(tmp_path / "in" / "sub", 3) + write_text_files(tmp_path / "in", 2, prefix="g")
+    archive = tmp_path / "batch.7z"
+    sizes = cb.compress_7z_batch(files, tmp_path / "in", archive, level=5)
+    names = [f.relative_to(tmp_path / "in").as_posix() for f in files]
+    assert sorted(sizes) == sorted(names) and all(size > 0 for size in sizes.values())
+    checks = cb.verify_7z_batch(archive, {n: (cb.file_digest(f), f.stat().st_size) for n, f in zip(names, files)})
+    assert all(cell["verified"] for cell in checks.values())
+
+
+@pytest.mark.skipif(cb.sevenzip_backend() is None, reason="neither 7z nor py7zr available")
+def test_cli_7z_cells_verify(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 3)
+    run_script("compression_backbone.py", "in", "--out-dir", "out", "--algos", "7z", "--verify", "--strict", cwd=tmp_path)
+    assert all(row["7z"]["verified"] for row in report_rows(tmp_path / "out").values())
+
+
+def test_batch_names_are_unique_per_run() -> None:
+    assert cb.batch_archive_name("run1", 0) != cb.batch_archive_name("run2", 0)
+    assert cb.batch_archive_name("run1", 3) == "batch_run1_00003.7z"
+
+
+def test_cached_batch_member_needs_its_archive(tmp_path: Path) -> None:
+    cache = cb.ResultCache(tmp_path / "cache.sqlite")
+    key = cb.CacheKey("a.txt", 100, 5)
+    cell = {"size": 40, "ratio": 0.4, "archive": cb.batch_archive_name("r", 0)}
+    cache.store(key, {"7z": "7z:9"}, {"7z": cell})
+    assert cache.lookup(key, {"7z": "7z:9"}) == {"7z": {**cell, "cached": True}}
+    assert cache.lookup(key, {"7z": "7z:9"}, tmp_path / "out") == {}  # the archive is gone
+    cache.close()
+
+
+def test_cache_of_an_older_version_gains_the_archive_column(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite"
+    db = cb.sqlite3.connect(str(path))
+    db.execute(
+        "CREATE TABLE results (path TEXT NOT NULL, algo TEXT NOT NULL, size INTEGER NOT NULL, "
+        "mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL, params TEXT NOT NULL, comp_size INTEGER NOT NULL, "
+        "ratio REAL NOT NULL, last_used INTEGER NOT NULL, PRIMARY KEY (path, algo))"
+    )
+    db.execute("INSERT INTO results VALUES ('a.txt', 'gzip', 100, 5, '', 'gzip:9', 40, 0.4, 1)")
+    db.commit()
+    db.close()
+    cache = cb.ResultCache(path)
+    assert cache.lookup(cb.CacheKey("a.txt", 100, 5), {"gzip": "gzip:9"}) == {
+        "gzip": {"size": 40, "ratio": 0.4, "cached": True}
+    }
+    cache.close()
+
+
+@pytest.mark.skipif(cb.find_7z() is None, reason="7z not installed")
+def test_batch_archive_is_never_replaced(tmp_path: Path) -> None:
+    files = write_text_files(tmp_path / "in", 2)
+    archive = tmp_path / "batch.7z"
+    cb.compress_7z_batch(files[:1], tmp_path / "in", archive, level=1)
+    before = archive.read_bytes()
+    with pytest.raises(FileExistsError):
+        cb.compress_7z_batch(files[1:], tmp_path / "in", archive, level=1)
+    assert archive.read_bytes() == before
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import io
+import json
+import lzma
+import random
+import tarfile
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+import compression_backbone as cb
+from conftest import write_text_files
+
+CONFIG = cb.AlgoConfig(xz_preset=1, xz_extreme=False, zstd_level=3)
+needs_zstd = pytest.mark.skipif(not cb.has_zstd(), reason="zstandard not installed")
+
+
+def test_solid_stream_and_index_round_trip(tmp_path: Path) -> None:
+    root = tmp_path / "in"
+    files = write_text_files(root / "b", 3) + write_text_files(root / "a", 2, ext=".csv")
+    ordered = cb.solid_order(files, root)
+    assert [f.suffix for f in ordered] == [".csv", ".csv", ".txt", ".txt", ".txt"]
+    algos = ["xz", *(["zstd"] if cb.has_zstd() else [])]
+    result = cb.pack_solid(ordered, root, tmp_path / "solid", "compressible", algos, CONFIG)
+    assert result["files"] == 5 and result["orig"] == sum(f.stat().st_size for f in files)
+    assert all(result["algos"][a]["ratio"] < 1 for a in algos)
+
+    raw = lzma.decompress((tmp_path / "solid" / "compressible.tar.xz").read_bytes())
+    with tarfile.open(fileobj=io.BytesIO(raw)) as tar:
+        assert tar.getnames() == [f.relative_to(root).as_posix() for f in ordered]
+    index = json.loads((tmp_path / "solid" / result["index"]).read_text())
+    assert index["archives"]["xz"] == "compressible.tar.xz"
+    assert index["frame_size"] == cb.SOLID_FRAME_SIZE  # seekable even without --frame-size-kb
+    for member in index["members"]:
+        start = member["offset"]
+        assert raw[start : start + member["size"]] == (root / member["path"]).read_bytes()
+
+
+@pytest.mark.parametrize("algo", ["xz", pytest.param("zstd", marks=needs_zstd)])
+def test_one_member_is_read_from_its_own_frames(tmp_path: Path, algo: str) -> None:
+    root = tmp_path / "in"
+    files = write_text_files(root, 12)
+    cb.pack_solid(files, root, tmp_path / "solid", "compressible", [algo], replace(CONFIG, frame_size=4096))
+    index = json.loads((tmp_path / "solid" / "compressible.index.json").read_text())
+    member = index["members"][7]
+    frames = member["frames"][algo]
+
+    with cb.SeekableReader(tmp_path / "solid" / index["archives"][algo]) as reader:
+        assert len(reader.frames) > frames["count"]
+        wanted = reader.frames[frames["first"] : frames["first"] + frames["count"]]
+        assert (wanted[0][0], sum(f[1] for f in wanted)) == (frames["offset"], frames["length"])
+        decompressed = []
+        frame = reader._frame
+        reader._frame = lambda i: decompressed.append(i) or frame(i)  # type: ignore[assignment]
+        assert reader.read(member["offset"], member["size"]) == files[7].read_bytes()
+    assert decompressed == list(range(frames["first"], frames["first"] + frames["count"]))
+    assert cb.read_solid_member(tmp_path / "solid", "compressible", member["path"], algo) == files[7].read_bytes()
+
+
+def test_compressed_group_is_stored_as_plain_tar(tmp_path: Path) -> None:
+    root = tmp_path / "in"
+    root.mkdir()
+    jpeg = root / "photo.jpg"
+    jpeg.write_bytes(random.Random(5).randbytes(4096))
+    assert cb.ext_group(jpeg) == "compressed"
+    result = cb.pack_solid([jpeg], root, tmp_path / "solid", "compressed", ["xz"], CONFIG)
+    assert list(result["algos"]) == ["tar"] and (tmp_path / "solid" / "compressed.tar").exists()
+    with tarfile.open(tmp_path / "solid" / "compressed.tar") as tar:
+        assert tar.extractfile("photo.jpg").read() == jpeg.read_bytes()  # type: ignore[union-attr]
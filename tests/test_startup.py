@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import compression_backbone as cb
+from conftest import ROOT
+
+CODEC_MODULES = ("zstandard", "lzma", "py7zr", "bz2", "gzip", "zipfile", "tarfile", "sqlite3")
+# Not codecs, but each imports lzma and bz2 (multiprocessing through tempfile).
+CODEC_IMPORTERS = ("shutil", "tempfile", "multiprocessing")
+
+
+def imported_modules(code: str) -> List[str]:
+    """Modules ``python -X importtime -c code`` reports loading, in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return [
+        line.rsplit("|", 1)[1].strip()
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:") and "cumulative" not in line
+    ]
+
+
+@pytest.mark.parametrize("module", ["compression_backbone", "compress", "compress_worker"])
+def test_codec_modules_are_not_imported_at_startup(module: str) -> None:
+    modules = imported_modules(f"import {module}")
+    assert module in modules
+    assert [m for m in (*CODEC_MODULES, *CODEC_IMPORTERS) if m in modules] == []
+
+
+def test_cached_capabilities_import_no_codec(tmp_path: Path) -> None:
+    code = f"import compression_backbone as cb; cb.capabilities(cb.Path({str(tmp_path / 'caps.json')!r}))"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)  # probes and writes the cache
+    modules = imported_modules(code)
+    assert [m for m in (*CODEC_MODULES, *CODEC_IMPORTERS) if m in modules] == []
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses POSIX execute bits")
+def test_which_matches_shutil(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import shutil
+
+    tool = tmp_path / "bin" / "7z"
+    tool.parent.mkdir()
+    tool.write_text("#!/bin/sh\n")
+    monkeypatch.setenv("PATH", f"{tmp_path / 'empty'}{cb.os.pathsep}{tool.parent}")
+    assert cb._which("7z") is None  # not executable
+    tool.chmod(0o755)
+    assert cb._which("7z") == shutil.which("7z") == str(tool)
+    assert cb._which("7z.exe") is None
+
+
+@pytest.fixture
+def probes(monkeypatch: pytest.MonkeyPatch) -> List[Dict[str, object]]:
+    """Count probe_capabilities() calls, with the in-process memo cleared around the test."""
+    calls: List[Dict[str, object]] = []
+
+    def probe() -> Dict[str, object]:
+        caps: Dict[str, object] = {"zstd": False, "run": len(calls)}
+        calls.append(caps)
+        return caps
+
+    monkeypatch.setattr(cb, "probe_capabilities", probe)
+    cb.capabilities.cache_clear()
+    yield calls
+    cb.capabilities.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda mp: mp.setenv("PATH", "/nonexistent"),
+        lambda mp: mp.setattr(sys, "executable", "/opt/other/python3"),
+        lambda mp: mp.setattr(sys, "version", sys.version + " (rebuilt)"),
+    ],
+    ids=["PATH", "interpreter", "version"],
+)
+def test_capability_cache_is_invalidated(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, probes, change) -> None:
+    cache = tmp_path / "caps.json"
+    assert cb.capabilities(cache)["run"] == 0
+    cb.capabilities.cache_clear()
+    assert cb.capabilities(cache)["run"] == 0  # same key: served from the file
+    assert len(probes) == 1
+
+    with monkeypatch.context() as mp:
+        change(mp)
+        cb.capabilities.cache_clear()
+        assert cb.capabilities(cache)["run"] == 1
+        assert json.loads(cache.read_text())["key"] == cb._capability_key()
+    assert len(probes) == 2
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import io
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+import compress
+from conftest import write_text_files
+
+
+def _messages(stream: io.StringIO) -> List[Dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_stream_is_one_json_message_per_line(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 3)
+    stream = io.StringIO()
+    summary = compress.process_files(str(tmp_path / "in"), str(tmp_path / "out"), stream=stream, workers=1)
+    messages = _messages(stream)
+    algorithms = compress.get_algorithms()
+    results = [m for m in messages if m["type"] == "result"]
+    assert len(results) == 3 * len(algorithms)
+    assert {(m["filename"], m["algorithm"]) for m in results} == {
+        (f"f{i:03d}.txt", a) for i in range(3) for a in algorithms
+    }
+    assert all(m["compressed_size"] < m["original_size"] for m in results if "error" not in m)
+    assert messages[-2]["type"] == "progress" and messages[-2]["files_done"] == 3 and not messages[-2]["scanning"]
+    assert messages[-1] == {"type": "summary", "averages": summary["averages"], "total_files": 3}
+    assert summary["results"] == []
+
+
+def test_cancelled_run_still_ends_with_a_summary(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in", 3)
+    cancel = threading.Event()
+    cancel.set()
+    stream = io.StringIO()
+    compress.process_files(str(tmp_path / "in"), str(tmp_path / "out"), stream=stream, workers=1, cancel=cancel)
+    messages = _messages(stream)
+    assert not [m for m in messages if m["type"] == "result"]
+    assert messages[-1]["type"] == "summary" and messages[-1]["cancelled"] is True
+
+
+def test_empty_directory_reports_an_error_summary(tmp_path: Path) -> None:
+    (tmp_path / "in").mkdir()
+    stream = io.StringIO()
+    assert "error" in compress.process_files(str(tmp_path / "in"), str(tmp_path / "out"), stream=stream)
+    assert _messages(stream) == [{"type": "summary", "error": "No files found in directory"}]
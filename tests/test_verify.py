@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+
+import pytest
+
+import compression_backbone as cb
+from conftest import report_rows, run_script, write_text_files
+
+ALGOS = ["zip", "gzip", "xz", *(["zstd"] if cb.has_zstd() else [])]
+
+
+def test_relative_round_trip_verifies_every_output(tmp_path: Path) -> None:
+    write_text_files(tmp_path / "in" / "sub", 3)
+    (tmp_path / "in" / "empty.dat").write_bytes(b"")  # empty files are not tested, as before
+    run_script("compression_backbone.py", "in", "--out-dir", "out", "--algos", *ALGOS, "--verify", "--strict",
+               cwd=tmp_path)
+    rows = report_rows(tmp_path / "out")
+    assert sorted(rows) == [str(Path("sub", f"f{i:03d}.txt")) for i in range(3)]
+    for row in rows.values():
+        for algo in ALGOS:
+            assert row[algo]["verified"] is True, (row["file"], algo, row[algo])
+            assert row[algo]["decompress_mbps"] >= 0
+
+
+@pytest.mark.parametrize("algo", ["gzip", "xz"])
+def test_corrupt_output_fails_verification(tmp_path: Path, algo: str) -> None:
+    write_text_files(tmp_path / "in", 2)
+    args = ["in", "--out-dir", "out", "--algos", algo, "--no-cache", "--verify", "--strict"]
+    run_script("compression_backbone.py", *args, cwd=tmp_path)
+    output = cb.output_path(tmp_path / "out", algo, "f001.txt")
+    if algo == "gzip":
+        # Still a valid gzip file, but of different content.
+        output.write_bytes(gzip.compress(b"something else"))
+    else:
+        data = bytearray(output.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        output.write_bytes(bytes(data))
+    proc = run_script("compression_backbone.py", *args, cwd=tmp_path, check=False)
+    assert proc.returncode != 0
+    rows = report_rows(tmp_path / "out")
+    assert rows["f000.txt"][algo]["verified"] is True
+    assert rows["f001.txt"][algo]["verified"] is False
+    assert algo != "xz" or rows["f001.txt"][algo]["verify_error"]
+
+
+def test_verify_output_compares_digest_and_size(tmp_path: Path) -> None:
+    src = write_text_files(tmp_path, 1)[0]
+    packed = tmp_path / "f.gz"
+    packed.write_bytes(gzip.compress(src.read_bytes()))
+    digest = cb.file_digest(src)
+    assert cb.verify_output("gzip", packed, digest, src.stat().st_size)["verified"] is True
+    assert cb.verify_output("gzip", packed, digest, src.stat().st_size + 1)["verified"] is False
+    assert cb.verify_output("gzip", packed, "0" * 64, src.stat().st_size)["verified"] is False
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Iterator
+
+import pytest
+
+from conftest import ROOT, write_text_files
+
+
+class _Client:
+    def __init__(self, cwd: Path) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, str(ROOT / "compress_worker.py")],
+            cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+
+    def send(self, request: Dict) -> None:
+        self.proc.stdin.write(json.dumps(request) + "\n")  # type: ignore[union-attr]
+        self.proc.stdin.flush()  # type: ignore[union-attr]
+
+    def messages(self) -> Iterator[Dict]:
+        for line in self.proc.stdout:  # type: ignore[union-attr]
+            yield json.loads(line)
+
+    def reply(self, req_id: int) -> Dict:
+        return next(m for m in self.messages() if m.get("id") == req_id)
+
+
+@pytest.fixture
+def client(tmp_path: Path) -> Iterator[_Client]:
+    worker = _Client(tmp_path)
+    yield worker
+    if worker.proc.poll() is None:
+        worker.proc.kill()
+    worker.proc.wait(timeout=30)
+
+
+def test_worker_runs_jobs_over_json_rpc(tmp_path: Path, client: _Client) -> None:
+    write_text_files(tmp_path / "in", 2)
+    ready = next(client.messages())
+    assert ready["ready"] is True and "zstd" in ready["capabilities"]
+
+    client.send({"id": 1, "method": "ping"})
+    assert client.reply(1) == {"id": 1, "result": "pong"}
+
+    client.send({"id": 2, "method": "compress", "params": {"input_dir": "in", "output_dir": "out", "verify": True}})
+    streamed = []
+    for message in client.messages():
+        if message.get("id") == 2:
+            summary = message["result"]
+            break
+        assert message["job"] == 2
+        streamed.append(message["message"])
+    results = [m for m in streamed if m["type"] == "result"]
+    assert results and all(m.get("verified") is True for m in results)
+    assert streamed[-1]["type"] == "summary" and summary["total_files"] == 2
+    assert (tmp_path / "out" / "report.json").exists()
+
+    client.send({"id": 3, "method": "compress", "params": {"input_dir": "missing", "output_dir": "out"}})
+    assert "does not exist" in client.reply(3)["error"]
+    client.send({"id": 4, "method": "nope"})
+    assert client.reply(4)["error"] == "Unknown method: nope"
+    client.send({"id": 5, "method": "shutdown"})
+    assert client.reply(5)["result"] == "bye"
+    assert client.proc.wait(timeout=30) == 0
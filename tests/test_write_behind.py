@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import io
+import random
+from pathlib import Path
+
+import pytest
+
+import compression_backbone as cb
+
+
+class _Failing(io.BytesIO):
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        raise OSError("no space left on device")
+
+
+def test_write_behind_keeps_order_and_copies_buffers() -> None:
+    sink = io.BytesIO()
+    sink_close = sink.close
+    sink.close = lambda: None  # type: ignore[method-assign]
+    writer = cb._WriteBehind(sink, depth=2)
+    buf = bytearray(b"a" * 10)
+    for i in range(50):
+        buf[:] = bytes([65 + i % 26]) * 10
+        writer.write(buf)
+    writer.close()
+    assert sink.getvalue() == b"".join(bytes([65 + i % 26]) * 10 for i in range(50))
+    sink_close()
+
+
+def test_write_behind_reports_errors() -> None:
+    writer = cb._WriteBehind(_Failing(), depth=1)
+    writer.write(b"x")
+    with pytest.raises(OSError, match="no space"):
+        writer.flush()
+    with pytest.raises(OSError, match="no space"):
+        writer.close()
+
+
+@pytest.mark.parametrize("depth", [0, 4])
+def test_outputs_are_finished_in_place(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, depth: int) -> None:
+    monkeypatch.setattr(cb, "WRITE_BEHIND_DEPTH", depth)
+    monkeypatch.setattr(cb, "READAHEAD_SIZE", 2 * cb.CHUNK_SIZE)
+    src = tmp_path / "in" / "data.txt"
+    src.parent.mkdir()
+    src.write_bytes(cb.text_bytes(random.Random(13), 3 * cb.CHUNK_SIZE))
+    row = cb.compress_one(src, src.parent, tmp_path / "out", ["gzip", "xz"],
+                          cb.AlgoConfig(xz_preset=1, xz_extreme=False), verify=True)
+    assert row["gzip"]["verified"] is True and row["xz"]["verified"] is True
+    assert not list((tmp_path / "out").rglob("*.tmp"))
+
+
+def test_failed_output_leaves_no_temp_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    src = tmp_path / "in" / "data.txt"
+    src.parent.mkdir()
+    src.write_bytes(b"hello " * 1000)
+
+    def broken(dst: Path) -> io.BytesIO:
+        open(dst, "wb").close()
+        return _Failing()
+
+    monkeypatch.setattr(cb, "open_output", broken)
+    row = cb.compress_one(src, src.parent, tmp_path / "out", ["gzip", "xz"], cb.AlgoConfig())
+    assert "no space" in row["gzip"]["error"] and "no space" in row["xz"]["error"]
+    assert not [p for p in (tmp_path / "out").rglob("*") if p.is_file()]